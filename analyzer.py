@@ -45,8 +45,16 @@ from typing import Dict, Any, Optional, List, Tuple, Callable
 from functools import lru_cache
 from concurrent.futures import ThreadPoolExecutor
 import threading
+import sys
 import matplotlib.font_manager as fm
 
+# Normalização de deals compartilhada com o backend (backend/app/services)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from app.services.deal_dtypes import compact_deals
+from app.services.history_chunks import records_frame, split_range
+from app.services.kernels import run_statistics
+from app.services.normalization import EXIT_ENTRIES, normalize_deals
+
 # ===========================
 # CONFIGURAÇÃO DE LOGGING
 # ===========================
@@ -76,6 +84,7 @@ CONFIG_FILE = "config.json"
 CONFIG_VERSION = "1.0"
 MAX_PERIOD_DAYS = 365 * 5  # 5 anos
 MIN_DAYS_FOR_SHARPE = 30  # Mínimo de dias para Sharpe confiável
+FETCH_CHUNK_DAYS = 31  # Janela de cada history_deals_get em períodos longos
 COMMON_MT5_PATHS = [
     r"C:\Program Files\MetaTrader 5\terminal64.exe",
     r"C:\Program Files (x86)\MetaTrader 5\terminal.exe",
@@ -298,31 +307,43 @@ class MT5DataManager:
 
         try:
             logger.info(f"Buscando deals de {date_from} até {date_to}")
-            deals = mt5.history_deals_get(date_from, date_to)
             
-            if deals is None or len(deals) == 0:
+            # Busca em janelas de FETCH_CHUNK_DAYS: cada janela vira um DataFrame tipado
+            # (apenas saídas) antes da próxima, sem manter todas as namedtuples em memória
+            windows = split_range(
+                int(pd.Timestamp(date_from).timestamp()),
+                int(pd.Timestamp(date_to).timestamp()),
+                FETCH_CHUNK_DAYS * 24 * 3600,
+            )
+            chunks = []
+            for window_from, window_to in windows:
+                deals = mt5.history_deals_get(
+                    pd.Timestamp(window_from, unit="s").to_pydatetime(),
+                    pd.Timestamp(window_to, unit="s").to_pydatetime(),
+                )
+                if deals is None:
+                    error_code, error_desc = mt5.last_error()
+                    logger.error(f"Erro ao buscar deals (código {error_code}): {error_desc}")
+                    return pd.DataFrame()
+                chunk = records_frame(deals)
+                del deals
+                if not chunk.empty:
+                    chunks.append(chunk[chunk["entry"].isin(EXIT_ENTRIES)])
+            
+            if not chunks:
                 logger.warning("Nenhum deal encontrado no período especificado")
                 return pd.DataFrame()
 
-            df = pd.DataFrame(list(deals), columns=deals[0]._asdict().keys())
-            df["time"] = pd.to_datetime(df["time"], unit="s")
-            
-            # Filtra apenas operações que representam saídas (fechamento de posição)
-            df = df[df["entry"].isin([1, 2, 3])].copy()
-            
-            # Calcula o net_profit por trade
-            df["net_profit"] = df["profit"] + df["commission"] + df["swap"]
+            # Janelas vizinhas compartilham o segundo de fronteira
+            df = pd.concat(chunks, ignore_index=True).drop_duplicates("ticket")
             
-            # CORREÇÃO CRÍTICA: ea_id agora agrupa apenas por Magic Number
-            def create_ea_id(row):
-                if row["magic"] != 0:
-                    # Robô: usa apenas magic number
-                    return f"M:{int(row['magic'])}"
-                else:
-                    # Manual: todas agrupadas
-                    return "Manual"
+            # Normalização vetorizada compartilhada com o backend: filtra saídas
+            # (fechamento de posição), calcula net_profit e agrupa ea_id por Magic Number
+            df = normalize_deals(df, ea_prefix="M:")
             
-            df["ea_id"] = df.apply(create_ea_id, axis=1)
+            # Tipos compactos (categorias, inteiros pequenos, float32 sem perda):
+            # self.all_deals fica residente durante toda a sessão
+            df = compact_deals(df)
             
             # Log detalhado para debug
             unique_magics = df["magic"].nunique()
@@ -476,12 +497,11 @@ class MT5DataManager:
             # Recovery Factor
             recovery_factor: float = res_liquido / max_drawdown if max_drawdown > 1e-10 else 0.0
             
-            # Z-Score
-            z_score: float = self._calculate_z_score(returns)
+            # Runs e sequências em uma única passada
+            num_runs, max_wins_seq, max_losses_seq = run_statistics(returns.values)
             
-            # Sequências
-            max_wins_seq = self._max_consecutive(returns, True)
-            max_losses_seq = self._max_consecutive(returns, False)
+            # Z-Score
+            z_score: float = self._calculate_z_score(returns, num_runs)
 
             self.metrics = {
                 "--- GERAL ---": "",
@@ -515,10 +535,11 @@ class MT5DataManager:
             self.metrics = self._get_empty_metrics()
             return self.metrics
 
-    def _calculate_z_score(self, data: pd.Series) -> float:
+    def _calculate_z_score(self, data: pd.Series, num_runs: Optional[int] = None) -> float:
         """
         Calcula Z-Score para teste de sequenciamento aleatório.
         :param data: Série com os retornos.
+        :param num_runs: Número de runs já calculado (evita nova passada pelos dados).
         :return: Z-Score ou np.nan se não aplicável.
         """
         if len(data) < 2:
@@ -535,10 +556,8 @@ class MT5DataManager:
                 logger.debug("Z-Score não aplicável: apenas wins ou apenas losses")
                 return np.nan
             
-            num_runs: int = 1
-            for i in range(1, n):
-                if wins_bin[i] != wins_bin[i-1]:
-                    num_runs += 1
+            if num_runs is None:
+                num_runs = run_statistics(wins_bin)[0]
             
             expected_runs: float = ((2 * n_wins_seq * n_losses_seq) / n) + 1
             
@@ -570,18 +589,8 @@ class MT5DataManager:
         :param is_win_sequence: True para vitórias, False para derrotas.
         :return: Número máximo de sequências.
         """
-        max_seq: int = 0
-        current_seq: int = 0
-        
-        for val in data:
-            is_win: bool = val > 0
-            if is_win == is_win_sequence:
-                current_seq += 1
-                max_seq = max(max_seq, current_seq)
-            else:
-                current_seq = 0
-        
-        return max_seq
+        _, max_wins, max_losses = run_statistics(data.values)
+        return max_wins if is_win_sequence else max_losses
 
     def clear_cache(self) -> None:
         """Limpa o cache de métricas."""
@@ -0,0 +1,100 @@
+"""
+Content negotiation for tabular responses.
+
+Besides the default JSON list of objects, endpoints returning frames can answer with
+- a compact columnar JSON (one array per column, repetitive text columns dictionary-encoded), or
+- an Apache Arrow IPC stream (needs `pyarrow`, listed in requirements.txt).
+"""
+import io
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMNAR_MEDIA_TYPE = "application/vnd.ea-analyzer.columnar+json"
+
+
+def negotiate(accept: Optional[str], allow_arrow: bool = True) -> str:
+    """Picks "arrow", "columnar" or "json" from an Accept header."""
+    if not accept:
+        return "json"
+    if allow_arrow and ARROW_MEDIA_TYPE in accept:
+        if pa is None:
+            raise HTTPException(status_code=406, detail="Arrow responses require the pyarrow package")
+        return "arrow"
+    if COLUMNAR_MEDIA_TYPE in accept:
+        return "columnar"
+    return "json"
+
+
+def _encode_column(column: pd.Series) -> Any:
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return {
+            "dictionary": [str(c) for c in column.cat.categories],
+            "codes": column.cat.codes.to_numpy().tolist(),
+        }
+    if pd.api.types.is_datetime64_any_dtype(column):
+        values = column.to_numpy().astype("datetime64[s]")
+        text = values.astype(str).tolist()
+        missing = np.isnat(values)
+        if missing.any():
+            # NaT would otherwise go out as the string "NaT"
+            return [None if gap else t for gap, t in zip(missing.tolist(), text)]
+        return text
+    if column.dtype == object or pd.api.types.is_string_dtype(column):
+        if pd.api.types.infer_dtype(column, skipna=True) in ("floating", "integer", "mixed-integer-float"):
+            column = pd.to_numeric(column)
+        else:
+            codes, uniques = pd.factorize(column.astype(str))
+            # Mostly unique text (e.g. the ISO periods of aggregate series) would only grow
+            # with a dictionary, so it is sent as a plain array
+            if len(uniques) * 2 > len(codes):
+                return column.astype(str).tolist()
+            return {"dictionary": uniques.tolist(), "codes": codes.tolist()}
+    values = column.to_numpy()
+    if values.dtype.kind == "f":
+        # JSON has no NaN/±inf (the encoder rejects them), so every non-finite value is null
+        finite = np.isfinite(values)
+        if not finite.all():
+            return [v if ok else None for ok, v in zip(finite.tolist(), values.tolist())]
+    return values.tolist()
+
+
+def frame_to_columnar(df: pd.DataFrame) -> Dict[str, Any]:
+    return {
+        "length": len(df),
+        "columns": {name: _encode_column(df[name]) for name in df.columns},
+    }
+
+
+def records_to_columnar(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Columnar form of a list of flat dicts (aggregate series)."""
+    return frame_to_columnar(pd.DataFrame.from_records(records))
+
+
+def columnar_response(payload: Dict[str, Any]) -> Response:
+    body = json.dumps(payload, separators=(",", ":"), allow_nan=False)
+    return Response(content=body, media_type=COLUMNAR_MEDIA_TYPE)
+
+
+def arrow_response(df: pd.DataFrame) -> Response:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(content=sink.getvalue(), media_type=ARROW_MEDIA_TYPE)
+
+
+def frame_response(df: pd.DataFrame, fmt: str) -> Response:
+    if fmt == "arrow":
+        return arrow_response(df)
+    return columnar_response(frame_to_columnar(df))
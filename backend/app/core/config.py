@@ -1,7 +1,7 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 import os
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
@@ -9,10 +9,46 @@ class Settings(BaseSettings):
     
     # MT5 Configuration
     MT5_PATH: Optional[str] = None
+    MT5_MODULE: str = "MetaTrader5"  # import name of the terminal API (a fake one for checks)
+    
+    # Terminal pool: account name -> terminal path, one worker process per terminal
+    # (JSON in .env, e.g. MT5_TERMINALS={"prop-a": "C:\\MT5-A\\terminal64.exe"})
+    MT5_TERMINALS: Dict[str, Optional[str]] = {}
+    
+    # Local deal history store (SQLite)
+    DEAL_STORE_PATH: str = "data/deal_store.sqlite3"
+    SYNC_INTERVAL_SECONDS: float = 5.0
+    FETCH_CHUNK_DAYS: int = 31  # history_deals_get window size for long ranges
+    
+    # Filtered deal query cache
+    QUERY_CACHE_SIZE: int = 32
+    QUERY_CACHE_TTL_SECONDS: float = 300.0
+    QUERY_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    
+    # Streaming export
+    EXPORT_CHUNK_SIZE: int = 50_000
+    
+    # Background poller / push events
+    POLL_INTERVAL_SECONDS: float = 2.0
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    
+    # Open positions snapshot (shared by all clients polling live P/L)
+    POSITIONS_REFRESH_SECONDS: float = 0.25
+    
+    # Metrics cache
+    METRICS_CACHE_SIZE: int = 256
+    METRICS_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
     
     # Analysis Configuration
     MIN_DAYS_FOR_SHARPE: int = 30
     
+    # MAE/MFE of round-trip trades (copy_rates_range bars)
+    EXCURSION_TIMEFRAME: str = "M1"
+    EXCURSION_CHUNK_DAYS: int = 31  # bar request window size
+    
+    # Monte Carlo risk simulations (0 = run in the API process)
+    RISK_WORKERS: int = 0
+    
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -1,13 +1,30 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router
 from app.core.config import get_settings
+from app.services.mt5_service import mt5_service
+from app.services.poller import history_poller
+from app.services.risk import shutdown_pool
+from app.services.terminal_pool import terminal_pool
 
 settings = get_settings()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    history_poller.start()
+    yield
+    await history_poller.stop()
+    # Closes the terminal connection and stops the MT5 worker thread
+    mt5_service.shutdown()
+    # One process per configured terminal
+    terminal_pool.shutdown()
+    shutdown_pool()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # CORS configuration for frontend
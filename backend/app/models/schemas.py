@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any, Union
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Optional, Dict, Any, Union, Literal
 from datetime import datetime
 
 class Deal(BaseModel):
@@ -27,6 +27,9 @@ class Deal(BaseModel):
     net_profit: float
     ea_id: str
 
+class PortfolioDeal(Deal):
+    account: str
+
 class Position(BaseModel):
     ticket: int
     time: Optional[datetime] = None
@@ -42,20 +45,229 @@ class Position(BaseModel):
     ea_id: str
     comment: Optional[str] = None
 
+class PositionsDiff(BaseModel):
+    version: int
+    full: bool  # `opened` holds the whole snapshot; replace the local state
+    opened: List[Position]
+    modified: List[Position]
+    closed: List[int]
+
 class MetricsResponse(BaseModel):
     general: Dict[str, Any]
     advanced: Dict[str, Any]
     sequences: Dict[str, Any]
     extremes: Dict[str, Any]
 
+class CubeMetricsResponse(MetricsResponse):
+    source: Literal["cube", "deals"]  # "cube" leaves the order-dependent metrics as None
+
 class AnalysisRequest(BaseModel):
     date_from: datetime
     date_to: datetime
     assets: Optional[List[str]] = None
     magic_numbers: Optional[List[int]] = None
     ea_ids: Optional[List[str]] = None
+    weekdays: Optional[List[int]] = None  # 0 = Monday ... 6 = Sunday
+    hours: Optional[List[int]] = None
+
+class GroupedMetricsRequest(AnalysisRequest):
+    group_by: Literal["ea", "symbol", "ea_symbol"] = "ea"
+
+class CubeMetricsRequest(AnalysisRequest):
+    directions: Optional[List[Literal[0, 1]]] = None  # position direction: 0 = buy, 1 = sell
+    path_metrics: bool = False  # also drawdown, streaks and runs (computed from the raw deals)
+
+class CubeGroupedMetricsRequest(CubeMetricsRequest):
+    group_by: Literal["ea", "symbol", "ea_symbol"] = "ea"
+
+class GroupedMetrics(BaseModel):
+    account: Optional[str] = None
+    ea_id: Optional[str] = None
+    symbol: Optional[str] = None
+    metrics: MetricsResponse
+
+class PortfolioRequest(AnalysisRequest):
+    accounts: Optional[List[str]] = None  # terminal pool accounts (all when omitted)
+
+class PortfolioGroupedRequest(PortfolioRequest):
+    group_by: Literal["account", "account_ea", "ea", "symbol", "ea_symbol"] = "account"
+
+class AccountStatus(BaseModel):
+    account: str
+    connected: bool
+    terminal_info: Optional[Dict[str, Any]] = None
+
+class AggregatesRequest(AnalysisRequest):
+    max_points: int = Field(500, ge=3, le=10000)
+    year: Optional[int] = None
+    month: Optional[int] = Field(None, ge=1, le=12)
+
+class RiskRequest(AnalysisRequest):
+    simulations: int = Field(10000, ge=100, le=100000)
+    method: Literal["bootstrap", "shuffle"] = "bootstrap"
+    initial_capital: Optional[float] = Field(None, gt=0)
+    ruin_pct: float = Field(50.0, gt=0, le=100)  # % of initial_capital lost that counts as ruin
+    seed: Optional[int] = None
+
+class Distribution(BaseModel):
+    mean: float
+    std: float
+    min: float
+    max: float
+    percentiles: Dict[str, float]  # p5, p25, p50, p75, p95
+
+class RiskResponse(BaseModel):
+    method: str
+    simulations: int
+    trades: int
+    max_drawdown: Optional[Distribution] = None
+    final_equity: Optional[Distribution] = None
+    max_consecutive_losses: Optional[Distribution] = None
+    risk_of_ruin: Optional[float] = None
+    observed: Dict[str, Any]
+
+class RollingMetricsRequest(AnalysisRequest):
+    windows: List[Annotated[int, Field(ge=2)]] = Field(default_factory=lambda: [50], min_length=1, max_length=10)
+    unit: Literal["trades", "days"] = "trades"  # last N trades or last N calendar days
+    per_ea: bool = True
+    max_points: int = Field(500, ge=2, le=10000)
+
+class RollingPoint(BaseModel):
+    time: datetime
+    ticket: int  # last deal of the window
+    trades: int
+    net_profit: float
+    win_rate: Optional[float] = None
+    profit_factor: Optional[float] = None
+    sharpe_ratio: Optional[float] = None
+    drawdown: float  # below the highest equity inside the window
+
+class RollingSeries(BaseModel):
+    ea_id: Optional[str] = None
+    window: int
+    unit: str
+    points: List[RollingPoint]
+
+class TradesRequest(AnalysisRequest):
+    excursions: bool = False  # measure MAE/MFE from bars (fetched once, then stored)
+
+class Trade(BaseModel):
+    position_id: int
+    symbol: str
+    magic: int
+    type: int  # direction of the opening deal: 0 = buy, 1 = sell
+    open_time: Optional[datetime] = None  # None when the opening deal predates the store
+    close_time: datetime
+    close_time_msc: int
+    volume: float
+    open_price: Optional[float] = None
+    close_price: float  # volume-weighted over partial exits
+    profit: float
+    commission: float
+    swap: float
+    fee: float
+    net_profit: float
+    deals: int
+    exits: int  # partial closes count here, not as separate trades
+    holding_seconds: Optional[float] = None
+    mae: Optional[float] = None  # price distance against the entry
+    mfe: Optional[float] = None  # price distance in favor of the entry
+    excursion_bars: Optional[int] = None
+    ea_id: str
+
+class EAContribution(BaseModel):
+    ea_id: str
+    net_profit: float
+    trading_days: int  # days with a non-zero result
+    daily_std: Optional[float] = None
+    max_drawdown: float  # of the EA's own daily equity curve
+    drawdown_contribution: float  # EA result inside the portfolio's worst drawdown window
+    drawdown_share: Optional[float] = None  # % of that drawdown
+    marginal_drawdown: float  # portfolio max drawdown minus the one without this EA
+
+class CorrelationResponse(BaseModel):
+    ea_ids: List[str]
+    days: int
+    correlation: List[List[Optional[float]]]  # rows and columns in `ea_ids` order
+    average_correlation: Optional[float] = None
+    diversification_ratio: Optional[float] = None
+    portfolio: Dict[str, Any]
+    contributions: List[EAContribution]
+
+class FilterSearchRequest(AnalysisRequest):
+    objective: Literal["net_profit", "profit_factor"] = "net_profit"
+    min_trades: int = Field(30, ge=1)  # candidates keeping fewer trades are discarded
+    search_symbols: bool = False  # also try subsets of each EA's most traded symbols
+
+class FilterSummary(BaseModel):
+    trades: int
+    net_profit: float
+    profit_factor: Optional[float] = None
+    win_rate: float
+
+class FilterCandidate(FilterSummary):
+    weekdays: List[int]  # kept, 0 = Monday ... 6 = Sunday
+    hours: List[int]  # kept, one contiguous window
+    symbols: Optional[List[str]] = None  # kept, only with `search_symbols`
+
+class FilterSearchResult(BaseModel):
+    ea_id: str
+    candidates: int
+    baseline: FilterSummary
+    best: Optional[FilterCandidate] = None  # None when no filter keeps `min_trades` trades
+
+class EquityPoint(BaseModel):
+    time: datetime
+    balance: float
+    ticket: int
+
+class ResultBucket(BaseModel):
+    label: str
+    profit: float
+    trades: int
+    year: Optional[int] = None
+    month: Optional[int] = None
+    date: Optional[str] = None
+
+class HeatmapCell(BaseModel):
+    weekday: int
+    hour: int
+    profit: float
+    trades: int
+
+class AggregatesResponse(BaseModel):
+    total_points: int
+    equity: List[EquityPoint]
+    by_year: List[ResultBucket]
+    by_month: List[ResultBucket]
+    by_day: List[ResultBucket]
+    heatmap: List[HeatmapCell]
+
+class DealsPageRequest(AnalysisRequest):
+    limit: int = Field(100, ge=1, le=5000)
+    cursor: Optional[str] = None
+    sort_by: str = "time_msc"
+    descending: bool = True
+    fields: Optional[List[str]] = None
+
+class DealsPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+    total: int
 
 class ConnectionStatus(BaseModel):
     connected: bool
     version: Optional[tuple] = None
     terminal_info: Optional[Dict[str, Any]] = None
+
+class CacheStats(BaseModel):
+    size: int
+    bytes: int
+    hits: int
+    misses: int
+    evictions: int
+
+class RequestStats(BaseModel):
+    executed: int
+    deduplicated: int
+    in_flight: int
@@ -0,0 +1,110 @@
+"""
+Pre-aggregated time series for the dashboard charts: equity curve (downsampled),
+results per year/month/day and the weekday x hour heatmap.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    :return: Sorted indices of the points to keep (always includes first and last).
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        xs = x[start:end]
+        ys = y[start:end]
+        area = np.abs((x[a] - avg_x) * (ys - y[a]) - (x[a] - xs) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def _profit_buckets(df: pd.DataFrame, keys: List[pd.Series]) -> pd.DataFrame:
+    return df["net_profit"].groupby(keys).agg(["sum", "count"])
+
+
+def build_aggregates(df: pd.DataFrame, max_points: int,
+                     year: Optional[int] = None, month: Optional[int] = None) -> Dict[str, Any]:
+    """
+    :param df: Exit deals in chronological order.
+    :param max_points: Maximum number of equity curve points to return.
+    :param year: Restricts the monthly series to this year (drill-down).
+    :param month: Together with `year`, returns the daily series of that month (1-12).
+    """
+    result: Dict[str, Any] = {
+        "total_points": len(df),
+        "equity": [],
+        "by_year": [],
+        "by_month": [],
+        "by_day": [],
+        "heatmap": [],
+    }
+    if df.empty:
+        return result
+
+    times = df["time"]
+    profit = df["net_profit"].to_numpy(dtype=np.float64)
+    balance = np.cumsum(profit)
+
+    keep = lttb(times.to_numpy().astype("datetime64[s]").astype(np.float64), balance, max_points)
+    result["equity"] = [
+        {"time": t, "balance": float(b), "ticket": int(k)}
+        for t, b, k in zip(times.to_numpy()[keep].astype("datetime64[s]").astype(str),
+                           balance[keep], df["ticket"].to_numpy()[keep])
+    ]
+
+    years = times.dt.year
+    months = times.dt.month
+
+    by_year = _profit_buckets(df, [years])
+    result["by_year"] = [
+        {"label": str(y), "year": int(y), "profit": float(row["sum"]), "trades": int(row["count"])}
+        for y, row in by_year.iterrows()
+    ]
+
+    month_mask = years == year if year is not None else np.ones(len(df), dtype=bool)
+    by_month = _profit_buckets(df[month_mask], [years[month_mask], months[month_mask]])
+    result["by_month"] = [
+        {"label": f"{m:02d}/{y}", "year": int(y), "month": int(m),
+         "profit": float(row["sum"]), "trades": int(row["count"])}
+        for (y, m), row in by_month.iterrows()
+    ]
+
+    if year is not None and month is not None:
+        day_mask = (years == year) & (months == month)
+        days = times[day_mask].dt.normalize()
+        by_day = _profit_buckets(df[day_mask], [days])
+        result["by_day"] = [
+            {"label": d.strftime("%d/%m/%Y"), "date": d.strftime("%Y-%m-%d"),
+             "profit": float(row["sum"]), "trades": int(row["count"])}
+            for d, row in by_day.iterrows()
+        ]
+
+    heatmap = _profit_buckets(df, [times.dt.dayofweek, times.dt.hour])
+    result["heatmap"] = [
+        {"weekday": int(d), "hour": int(h), "profit": float(row["sum"]), "trades": int(row["count"])}
+        for (d, h), row in heatmap.iterrows()
+    ]
+    return result
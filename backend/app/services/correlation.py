@@ -0,0 +1,124 @@
+"""
+Correlation and drawdown contribution of EAs inside a portfolio.
+
+Daily `net_profit` is pivoted into a dense (days x EAs) matrix in a single groupby/unstack
+(days with no trades for an EA count as 0). Everything else is matrix algebra on it:
+- the correlation matrix of daily EA results
+- the diversification ratio: sum of the EAs' daily volatilities over the portfolio's
+- each EA's share of the portfolio's worst drawdown (its result between peak and trough)
+- the marginal drawdown: portfolio max drawdown minus the max drawdown without the EA,
+  computed for all EAs at once from the cumulative matrix
+
+Drawdowns here are measured on daily closes, so they can be smaller than the
+deal-by-deal drawdown of calculate_metrics.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
+
+
+def daily_matrix(df: pd.DataFrame) -> pd.DataFrame:
+    """Daily net result per EA: days as rows (sorted), `ea_id` labels as columns (category order)."""
+    ea_ids = df["ea_id"]
+    if isinstance(ea_ids.dtype, pd.CategoricalDtype):
+        codes, labels = ea_ids.cat.codes.to_numpy(), ea_ids.cat.categories
+    else:
+        codes, labels = pd.factorize(ea_ids, sort=True)
+    days = df["time"].to_numpy().astype("datetime64[D]")
+    # Grouping on integer codes keeps the pivot a single hash pass
+    daily = df["net_profit"].groupby([days, codes]).sum().unstack(fill_value=0.0)
+    daily.columns = [str(label) for label in labels[daily.columns.to_numpy()]]
+    return daily
+
+
+def _max_drawdown(equity: np.ndarray) -> np.ndarray:
+    """Max drawdown of each column of an equity matrix, from its running peak."""
+    return (np.maximum.accumulate(equity, axis=0) - equity).max(axis=0)
+
+
+def empty_correlation() -> Dict[str, Any]:
+    return {
+        "ea_ids": [],
+        "days": 0,
+        "correlation": [],
+        "average_correlation": None,
+        "diversification_ratio": None,
+        "portfolio": {},
+        "contributions": [],
+    }
+
+
+def correlation_analysis(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    :param df: Exit deals with `time`, `ea_id` and `net_profit`.
+    :return: The EA order, correlation matrix (None where an EA has no variance),
+        diversification ratio, portfolio drawdown window and per-EA contributions.
+    """
+    if df.empty:
+        return empty_correlation()
+
+    matrix = daily_matrix(df)
+    values = matrix.to_numpy(dtype=np.float64)
+    n_days, n_eas = values.shape
+    ea_ids = list(matrix.columns)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = np.corrcoef(values, rowvar=False) if n_days > 1 else np.full((n_eas, n_eas), np.nan)
+    correlation = np.atleast_2d(correlation)
+    off_diagonal = correlation[~np.eye(n_eas, dtype=bool)]
+    off_diagonal = off_diagonal[~np.isnan(off_diagonal)]
+
+    portfolio = values.sum(axis=1)
+    ea_std = values.std(axis=0, ddof=1) if n_days > 1 else np.full(n_eas, np.nan)
+    portfolio_std = portfolio.std(ddof=1) if n_days > 1 else np.nan
+    diversification = ea_std.sum() / portfolio_std if portfolio_std > 1e-10 else np.nan
+
+    # Worst drawdown window of the combined daily equity curve
+    equity = np.cumsum(values, axis=0)
+    portfolio_equity = equity.sum(axis=1)
+    peak = np.maximum.accumulate(portfolio_equity)
+    drawdown = peak - portfolio_equity
+    trough = int(drawdown.argmax())
+    max_drawdown = float(drawdown[trough])
+    start = int(np.flatnonzero(portfolio_equity[:trough + 1] == peak[trough])[-1])
+    contribution = equity[trough] - equity[start]
+
+    # Leave-one-out: the portfolio equity without each EA, all columns at once
+    without = portfolio_equity[:, np.newaxis] - equity
+    marginal = max_drawdown - _max_drawdown(without)
+    own_drawdown = _max_drawdown(equity)
+
+    day_labels = matrix.index.to_numpy().astype("datetime64[D]").astype(str)
+    contributions: List[Dict[str, Any]] = []
+    for i, ea_id in enumerate(ea_ids):
+        contributions.append({
+            "ea_id": ea_id,
+            "net_profit": float(equity[-1, i]),
+            "trading_days": int(np.count_nonzero(values[:, i])),
+            "daily_std": _optional(ea_std[i]),
+            "max_drawdown": float(own_drawdown[i]),
+            "drawdown_contribution": float(contribution[i]),
+            "drawdown_share": float(-contribution[i] / max_drawdown * 100) if max_drawdown > 0 else None,
+            "marginal_drawdown": float(marginal[i]),
+        })
+
+    return {
+        "ea_ids": ea_ids,
+        "days": n_days,
+        "correlation": [[None if v != v else v for v in row] for row in correlation.tolist()],
+        "average_correlation": float(off_diagonal.mean()) if len(off_diagonal) else None,
+        "diversification_ratio": _optional(diversification),
+        "portfolio": {
+            "net_profit": float(portfolio_equity[-1]),
+            "daily_std": _optional(portfolio_std),
+            "max_drawdown": max_drawdown,
+            "drawdown_start": str(day_labels[start]) if max_drawdown > 0 else None,
+            "drawdown_end": str(day_labels[trough]) if max_drawdown > 0 else None,
+        },
+        "contributions": contributions,
+    }
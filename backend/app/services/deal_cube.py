@@ -0,0 +1,314 @@
+"""
+Materialized aggregate cube of exit deals for slicing without touching the deals.
+
+Exit deals are reduced to cells keyed by (epoch hour, EA, symbol, direction). The epoch
+hour carries the date, weekday and hour of day, so a range aligned to whole hours plus
+any EA/symbol/weekday/hour/direction filter selects whole cells. Each cell holds the trade
+count, wins, gross profit, gross loss, commission, swap, sum of squared results and the
+best and worst deal.
+
+Cells are kept sorted by key (hour first), so a date range is a contiguous block found by
+binary search and new deals, which arrive at the end of the history, only re-reduce the
+cells at or after their first hour.
+
+Everything in `general`, plus expectancy, standard deviation, the daily Sharpe ratio and
+the largest profit/loss, follows from cell totals. Drawdown, streaks, runs and the
+recovery factor depend on deal order and are left as None: they need the raw deals.
+"""
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.deal_dtypes import float64_values
+
+# Cell key bits, low to high: direction (1), symbol code (16), EA code (16), epoch hour
+SYMBOL_SHIFT = 1
+EA_SHIFT = 17
+HOUR_SHIFT = 33
+CODE_MASK = (1 << 16) - 1
+
+MEASURES = (
+    "count", "wins", "gross_profit", "gross_loss", "commission", "swap",
+    "sum_squares", "max_profit", "max_loss",
+)
+
+# Epoch day 0 (1970-01-01) was a Thursday; weekdays count from Monday = 0
+EPOCH_WEEKDAY = 3
+
+# Raw deal fields the cube is built from (enough for `normalize_deals`)
+CUBE_SOURCE_FIELDS = [
+    "ticket", "time", "time_msc", "type", "entry", "magic", "symbol", "profit", "commission", "swap",
+]
+
+
+def position_directions(deal_types: np.ndarray) -> np.ndarray:
+    """Direction of the position an exit deal closes: 0 = buy, 1 = sell (a buy deal closes a sell)."""
+    return (np.asarray(deal_types) == 0).astype(np.int64)
+
+
+def _reduce(keys: np.ndarray, values: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Sorts rows by key and folds equal keys into one cell."""
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    cells = {}
+    for name, column in values.items():
+        column = column[order]
+        if name == "max_profit":
+            cells[name] = np.maximum.reduceat(column, starts)
+        elif name == "max_loss":
+            cells[name] = np.minimum.reduceat(column, starts)
+        else:
+            cells[name] = np.add.reduceat(column, starts)
+    return keys[starts], cells
+
+
+class DealCube:
+    """Aggregate cells of one chronological stream of exit deals."""
+
+    def __init__(self):
+        # Bookkeeping of the store rows folded in, maintained by the owner
+        self.version: Optional[int] = None
+        self.rows = 0
+        self.position: Tuple[int, int] = (-1, -1)
+
+        self.ea_ids: List[str] = []
+        self.symbols: List[str] = []
+        self._ea_codes: Dict[str, int] = {}
+        self._symbol_codes: Dict[str, int] = {}
+        self.first_time: Optional[int] = None
+        self.last_time: Optional[int] = None
+        # Keys and cells are swapped together so readers never see a half-folded cube
+        self._state: Tuple[np.ndarray, Dict[str, np.ndarray]] = (
+            np.empty(0, dtype=np.int64), {name: np.empty(0) for name in MEASURES}
+        )
+
+    def __len__(self) -> int:
+        return len(self._state[0])
+
+    @staticmethod
+    def _encode(column: pd.Series, labels: List[str], codes: Dict[str, int]) -> np.ndarray:
+        """Stable cube codes of a label column; unseen labels get the next code."""
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            positions, uniques = column.cat.codes.to_numpy(), column.cat.categories
+        else:
+            positions, uniques = pd.factorize(column)
+        lookup = np.empty(len(uniques), dtype=np.int64)
+        for i, label in enumerate(uniques):
+            label = str(label)
+            if label not in codes:
+                if len(labels) > CODE_MASK:
+                    raise ValueError("Too many distinct labels for the cube key")
+                codes[label] = len(labels)
+                labels.append(label)
+            lookup[i] = codes[label]
+        return lookup[positions]
+
+    def fold(self, df: pd.DataFrame) -> "DealCube":
+        """
+        Folds in normalized exit deals (`time`, `type`, `ea_id`, `symbol`, `net_profit`,
+        `commission`, `swap`). Any order is correct; deals newer than the cube are cheapest.
+        """
+        if df.empty:
+            return self
+
+        seconds = df["time"].to_numpy().astype("datetime64[s]").astype(np.int64)
+        keys = (
+            (seconds // 3600 << HOUR_SHIFT)
+            | (self._encode(df["ea_id"], self.ea_ids, self._ea_codes) << EA_SHIFT)
+            | (self._encode(df["symbol"], self.symbols, self._symbol_codes) << SYMBOL_SHIFT)
+            | position_directions(df["type"].to_numpy())
+        )
+        returns = df["net_profit"].to_numpy(dtype=np.float64)
+        win = returns > 0
+        new_keys, new_cells = _reduce(keys, {
+            "count": np.ones(len(returns)),
+            "wins": win.astype(np.float64),
+            "gross_profit": np.where(win, returns, 0.0),
+            "gross_loss": np.where(win, 0.0, returns),
+            "commission": float64_values(df["commission"]),
+            "swap": float64_values(df["swap"]),
+            "sum_squares": returns * returns,
+            "max_profit": np.where(win, returns, -np.inf),
+            "max_loss": np.where(win, np.inf, returns),
+        })
+
+        keys, cells = self._state
+        # Only cells from the smallest new key on can share a key with the new deals: for
+        # appended deals that is the last hour or so of the cube
+        split = int(np.searchsorted(keys, new_keys[0]))
+        if split < len(keys):
+            new_keys, new_cells = _reduce(
+                np.concatenate((keys[split:], new_keys)),
+                {name: np.concatenate((cells[name][split:], new_cells[name])) for name in MEASURES},
+            )
+        self._state = (
+            np.concatenate((keys[:split], new_keys)),
+            {name: np.concatenate((cells[name][:split], new_cells[name])) for name in MEASURES},
+        )
+
+        low, high = int(seconds.min()), int(seconds.max())
+        self.first_time = low if self.first_time is None else min(self.first_time, low)
+        self.last_time = high if self.last_time is None else max(self.last_time, high)
+        return self
+
+    def covers(self, start: int, end: int) -> bool:
+        """Whether [start, end] (epoch seconds) selects whole cells, i.e. its ends fall on hour edges."""
+        start_ok = start % 3600 == 0 or self.first_time is None or start <= self.first_time
+        end_ok = end % 3600 == 3599 or self.last_time is None or end >= self.last_time
+        return start_ok and end_ok
+
+    @staticmethod
+    def _allowed(positions: Sequence[int], size: int) -> np.ndarray:
+        """Lookup table of the allowed values of a small integer field."""
+        allowed = np.zeros(size, dtype=bool)
+        allowed[[position for position in positions if 0 <= position < size]] = True
+        return allowed
+
+    def select(self, start: int, end: int,
+               ea_ids: Optional[List[str]] = None, symbols: Optional[List[str]] = None,
+               weekdays: Optional[List[int]] = None, hours: Optional[List[int]] = None,
+               directions: Optional[List[int]] = None) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Keys and cells of the hours overlapping [start, end] that pass the filters."""
+        keys, cells = self._state
+        low = int(np.searchsorted(keys, (start // 3600) << HOUR_SHIFT))
+        high = int(np.searchsorted(keys, (end // 3600 + 1) << HOUR_SHIFT))
+        keys = keys[low:high]
+        if not (ea_ids or symbols or weekdays or hours or directions):
+            return keys, {name: values[low:high] for name, values in cells.items()}
+
+        # Every filter is a table lookup; the cells are then gathered once
+        mask = np.ones(len(keys), dtype=bool)
+        if ea_ids:
+            codes = [self._ea_codes.get(ea_id, -1) for ea_id in ea_ids]
+            mask &= self._allowed(codes, len(self.ea_ids))[(keys >> EA_SHIFT) & CODE_MASK]
+        if symbols:
+            codes = [self._symbol_codes.get(symbol, -1) for symbol in symbols]
+            mask &= self._allowed(codes, len(self.symbols))[(keys >> SYMBOL_SHIFT) & CODE_MASK]
+        hour_slots = keys >> HOUR_SHIFT
+        if weekdays:
+            mask &= self._allowed(weekdays, 7)[(hour_slots // 24 + EPOCH_WEEKDAY) % 7]
+        if hours:
+            mask &= self._allowed(hours, 24)[hour_slots % 24]
+        if directions:
+            mask &= self._allowed(directions, 2)[keys & 1]
+
+        index = np.flatnonzero(mask)
+        return keys[index], {name: values[low:high].take(index) for name, values in cells.items()}
+
+    def group_codes(self, keys: np.ndarray, group_by: str) -> Tuple[np.ndarray, List[Dict[str, str]]]:
+        """Group index of each cell and the labels of each group ("ea", "symbol" or "ea_symbol")."""
+        ea = (keys >> EA_SHIFT) & CODE_MASK
+        symbol = (keys >> SYMBOL_SHIFT) & CODE_MASK
+        if group_by == "ea":
+            parts = [("ea_id", ea, self.ea_ids)]
+        elif group_by == "symbol":
+            parts = [("symbol", symbol, self.symbols)]
+        else:
+            parts = [("ea_id", ea, self.ea_ids), ("symbol", symbol, self.symbols)]
+
+        # Groups in label order (codes follow first appearance)
+        ranked = []
+        for _, codes, labels in parts:
+            rank = np.empty(len(labels), dtype=np.int64)
+            rank[np.argsort(np.array(labels, dtype=object), kind="stable")] = np.arange(len(labels))
+            ranked.append(rank[codes] if len(labels) else codes)
+        combined = ranked[0] if len(ranked) == 1 else ranked[0] << 16 | ranked[1]
+        _, first, groups = np.unique(combined, return_index=True, return_inverse=True)
+        labels = [
+            {name: names[int(codes[i])] for name, codes, names in parts}
+            for i in first
+        ]
+        return groups, labels
+
+
+def cube_metrics(keys: np.ndarray, cells: Dict[str, np.ndarray], min_days_for_sharpe: int,
+                 groups: Optional[np.ndarray] = None, n_groups: int = 1) -> List[Dict[str, Any]]:
+    """
+    Metrics of selected cells, one dict per group (a single one without `groups`), shaped
+    like `metrics.calculate_metrics` with the order-dependent fields left as None.
+    """
+    if groups is None:
+        groups = np.zeros(len(keys), dtype=np.int64)
+
+    def total(name: str) -> np.ndarray:
+        return np.bincount(groups, weights=cells[name], minlength=n_groups)
+
+    count = total("count").astype(np.int64)
+    wins = total("wins").astype(np.int64)
+    gross_profit, gross_loss = total("gross_profit"), total("gross_loss")
+    total_costs = total("commission") + total("swap")
+    sum_squares = total("sum_squares")
+    max_profit = np.full(n_groups, -np.inf)
+    np.maximum.at(max_profit, groups, cells["max_profit"])
+    max_loss = np.full(n_groups, np.inf)
+    np.minimum.at(max_loss, groups, cells["max_loss"])
+
+    # Daily results per group: one (group, day) bucket per trading day
+    days = (keys >> HOUR_SHIFT) // 24
+    day_buckets, bucket = np.unique(groups << 32 | days, return_inverse=True)
+    daily = np.bincount(bucket, weights=cells["gross_profit"] + cells["gross_loss"])
+    day_groups = day_buckets >> 32
+    n_days = np.bincount(day_groups, minlength=n_groups)
+    daily_sum = np.bincount(day_groups, weights=daily, minlength=n_groups)
+    daily_squares = np.bincount(day_groups, weights=daily * daily, minlength=n_groups)
+
+    results = []
+    for i in range(n_groups):
+        n, n_wins = int(count[i]), int(wins[i])
+        n_losses = n - n_wins
+        profit, loss = float(gross_profit[i]), float(gross_loss[i])
+        net_profit = profit + loss
+
+        if abs(loss) < 1e-10:
+            profit_factor = float("inf") if profit > 0 else 1.0
+        else:
+            profit_factor = profit / abs(loss)
+        avg_win = profit / n_wins if n_wins else 0.0
+        avg_loss = loss / n_losses if n_losses else 0.0
+        mean = net_profit / n if n else 0.0
+        # Variance from sum and sum of squares (clamped: rounding can push it below zero)
+        std_dev = math.sqrt(max(float(sum_squares[i]) - n * mean * mean, 0.0) / (n - 1)) if n > 1 else None
+
+        sharpe = None
+        d = int(n_days[i])
+        if d >= min_days_for_sharpe and d >= 2:
+            day_mean = daily_sum[i] / d
+            day_std = math.sqrt(max(float(daily_squares[i]) - d * day_mean * day_mean, 0.0) / (d - 1))
+            if day_std > 1e-10:
+                sharpe = float(day_mean / day_std * np.sqrt(252))
+
+        results.append({
+            "general": {
+                "net_profit": net_profit,
+                "gross_profit": profit,
+                "gross_loss": loss,
+                "total_costs": float(total_costs[i]),
+                "profit_factor": profit_factor,
+                "win_rate": n_wins / n * 100 if n else 0.0,
+                "total_trades": n,
+                "total_wins": n_wins,
+                "total_losses": n_losses,
+                "avg_win": avg_win,
+                "avg_loss": avg_loss
+            },
+            "advanced": {
+                "expectancy": (n_wins / n) * avg_win + (n_losses / n) * avg_loss if n else 0.0,
+                "sharpe_ratio": sharpe,
+                "recovery_factor": None,
+                "z_score": None,
+                "std_dev": std_dev
+            },
+            "sequences": {
+                "max_consecutive_wins": None,
+                "max_consecutive_losses": None
+            },
+            "extremes": {
+                "max_profit": float(max_profit[i]) if np.isfinite(max_profit[i]) else 0.0,
+                "max_loss": float(max_loss[i]) if np.isfinite(max_loss[i]) else 0.0,
+                "max_drawdown": None
+            }
+        })
+    return results
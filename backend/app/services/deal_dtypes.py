@@ -0,0 +1,172 @@
+"""
+Compact dtypes for the deals frame kept resident by the API and the desktop analyzer.
+
+`DEAL_DTYPE_PLAN` maps each column to a storage kind:
+- "category": text with few distinct values (and no missing ones)
+- "int8": enum-like MT5 fields (type, entry, reason)
+- "int": identifiers, stored as int32 whenever their range fits
+- "float": prices, volumes and deal amounts. Columns with at most DICTIONARY_MAX_VALUES
+  distinct values become categoricals over the exact float64 values (int8/int16 codes);
+  the rest are narrowed to float32 only when every value survives the round trip at
+  FLOAT32_DIGITS significant digits, and `widen` restores the exact float64
+
+Columns left out of the plan (`time`, `time_msc`, `net_profit`) keep their dtype, so the
+equity curve and every metric built on `net_profit` are computed exactly as before.
+Numeric readers go through `float64_values`, serializers through `widen_floats`.
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Significant digits a narrowed value must keep; float32 carries a little over 7
+FLOAT32_DIGITS = 7
+
+# Text columns become categoricals below this distinct/rows ratio
+CATEGORY_MAX_RATIO = 0.5
+
+# Float columns are dictionary-encoded up to this many distinct values, where pandas
+# still uses int16 codes (narrower than float32)
+DICTIONARY_MAX_VALUES = np.iinfo(np.int16).max
+
+_POWERS_OF_TEN = 10.0 ** np.arange(309)
+
+DEAL_DTYPE_PLAN: Dict[str, str] = {
+    "ticket": "int",
+    "order": "int",
+    "position_id": "int",
+    "magic": "int",
+    "type": "int8",
+    "entry": "int8",
+    "reason": "int8",
+    "volume": "float",
+    "price": "float",
+    "price_sl": "float",
+    "price_tp": "float",
+    "profit": "float",
+    "commission": "float",
+    "swap": "float",
+    "fee": "float",
+    "symbol": "category",
+    "comment": "category",
+    "external_id": "category",
+    "ea_id": "category",
+}
+
+
+def _round_significant(values: np.ndarray, digits: int) -> np.ndarray:
+    """Rounds float64 values to `digits` significant digits, landing on the nearest double."""
+    out = values.copy()
+    mask = np.isfinite(values) & (values != 0)
+    if not mask.any():
+        return out
+    x = values[mask]
+    exponent = (digits - 1 - np.floor(np.log10(np.abs(x)))).astype(np.int64)
+    # Integer / power of ten (or integer * power of ten) is correctly rounded, so
+    # a value with at most `digits` significant digits comes back bit-identical
+    up = exponent >= 0
+    scale = _POWERS_OF_TEN[np.minimum(np.abs(exponent), len(_POWERS_OF_TEN) - 1)]
+    out[mask] = np.where(up, np.round(x * scale) / scale, np.round(x / scale) * scale)
+    return out
+
+
+def widen(values: np.ndarray) -> np.ndarray:
+    """float64 copy of a narrowed float32 array, with the original decimal values restored."""
+    return _round_significant(values.astype(np.float64), FLOAT32_DIGITS)
+
+
+def is_float_category(column: pd.Series) -> bool:
+    """Whether `column` is a float column dictionary-encoded by the plan."""
+    return isinstance(column.dtype, pd.CategoricalDtype) and pd.api.types.is_float_dtype(column.cat.categories)
+
+
+def float64_values(column: pd.Series) -> np.ndarray:
+    """Column values as float64, decoding float categoricals and widening float32 columns narrowed by the plan."""
+    if is_float_category(column):
+        # Code -1 (missing) picks the trailing NaN
+        lookup = np.append(column.cat.categories.to_numpy(dtype=np.float64), np.nan)
+        return lookup[column.cat.codes.to_numpy()]
+    values = column.to_numpy()
+    if values.dtype == np.float32:
+        return widen(values)
+    return column.to_numpy(dtype=np.float64)
+
+
+def _float_category(column: pd.Series) -> pd.Series:
+    try:
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+    except (TypeError, ValueError):
+        return column
+    # NaN gets code -1 and reads back as NaN; categories hold the exact float64 values
+    codes, uniques = pd.factorize(values, sort=True)
+    if len(uniques) > min(DICTIONARY_MAX_VALUES, CATEGORY_MAX_RATIO * len(column)):
+        return column
+    categorical = pd.Categorical.from_codes(codes, categories=uniques)
+    return pd.Series(categorical, index=column.index, name=column.name)
+
+
+def _narrow_float(column: pd.Series) -> pd.Series:
+    try:
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+    except (TypeError, ValueError):
+        return column
+    narrow = values.astype(np.float32)
+    # Every value must come back from `widen`, float32-exact ones included: widen rounds to
+    # FLOAT32_DIGITS, so e.g. 12345678.0 (exact in float32) would return as 12345680.0
+    if not np.array_equal(widen(narrow), values, equal_nan=True):
+        return column
+    return pd.Series(narrow, index=column.index, name=column.name)
+
+
+def _narrow_int(column: pd.Series, candidates) -> pd.Series:
+    if not pd.api.types.is_integer_dtype(column) or column.empty:
+        return column
+    low, high = column.min(), column.max()
+    for dtype in candidates:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return column.astype(dtype)
+    return column
+
+
+def _to_category(column: pd.Series) -> pd.Series:
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column
+    codes, uniques = pd.factorize(column, sort=True)
+    if (codes < 0).any() or len(uniques) > CATEGORY_MAX_RATIO * len(column):
+        return column
+    categorical = pd.Categorical.from_codes(codes, categories=uniques)
+    return pd.Series(categorical, index=column.index, name=column.name)
+
+
+def compact_deals(df: pd.DataFrame, plan: Dict[str, str] = DEAL_DTYPE_PLAN) -> pd.DataFrame:
+    """Applies the dtype plan to a normalized deals frame. Columns the plan cannot hold losslessly are kept."""
+    if df.empty:
+        return df
+
+    df = df.copy()
+    for name, kind in plan.items():
+        if name not in df.columns:
+            continue
+        column = df[name]
+        if kind == "category":
+            df[name] = _to_category(column)
+        elif kind == "int8":
+            df[name] = _narrow_int(column, (np.int8, np.int16))
+        elif kind == "int":
+            df[name] = _narrow_int(column, (np.int32,))
+        elif kind == "float":
+            encoded = _float_category(column)
+            df[name] = encoded if encoded is not column else _narrow_float(column)
+    return df
+
+
+def widen_floats(df: pd.DataFrame) -> pd.DataFrame:
+    """Copy of `df` with float32 and float categorical columns restored to float64, for serialization."""
+    narrowed = [name for name in df.columns if df[name].dtype == np.float32 or is_float_category(df[name])]
+    if not narrowed:
+        return df
+    df = df.copy()
+    for name in narrowed:
+        df[name] = float64_values(df[name])
+    return df
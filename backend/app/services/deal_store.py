@@ -0,0 +1,282 @@
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.sl_tp_index import SlTpIndex
+from app.services.trades import TRADE_COLUMNS, TRADE_SOURCE_FIELDS, build_trades
+
+logger = logging.getLogger(__name__)
+
+# Column layout of MT5 TradeDeal records, in the order the terminal returns them.
+DEAL_COLUMNS: Dict[str, str] = {
+    "ticket": "INTEGER PRIMARY KEY",
+    "order": "INTEGER",
+    "time": "INTEGER",
+    "time_msc": "INTEGER",
+    "type": "INTEGER",
+    "entry": "INTEGER",
+    "magic": "INTEGER",
+    "position_id": "INTEGER",
+    "reason": "INTEGER",
+    "volume": "REAL",
+    "price": "REAL",
+    "commission": "REAL",
+    "swap": "REAL",
+    "profit": "REAL",
+    "fee": "REAL",
+    "symbol": "TEXT",
+    "comment": "TEXT",
+    "external_id": "TEXT",
+}
+
+
+def to_epoch(value: datetime) -> int:
+    """Converts a datetime to MT5 epoch seconds (naive values are taken as server time)."""
+    return int(pd.Timestamp(value).timestamp())
+
+
+class DealStore:
+    """
+    Local SQLite copy of the MT5 deal history.
+
+    Deals are stored raw (every entry type) keyed by ticket, together with the
+    last known SL/TP of each position and the sync watermark, so the service
+    only has to ask MT5 for what it has not seen yet.
+
+    The position-level trade table is derived from the deals: saving deals marks
+    their positions dirty, and `refresh_trades` rebuilds only those rows.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.version = 0
+        self.trades_version = 0
+        self._lock = threading.Lock()
+        self._sl_tp: Optional[SlTpIndex] = None
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _init_schema(self) -> None:
+        columns = ", ".join(f'"{name}" {kind}' for name, kind in DEAL_COLUMNS.items())
+        with closing(self._connect()) as conn, conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS deals ({columns})")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_deals_time ON deals (time)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_deals_time_msc ON deals (time_msc, ticket)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_deals_position ON deals (position_id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sl_tp (position_id INTEGER PRIMARY KEY, sl REAL, tp REAL, time_msc INTEGER)"
+            )
+            # Stores created before order times were kept: their rows stay undated
+            if "time_msc" not in {column[1] for column in conn.execute("PRAGMA table_info(sl_tp)")}:
+                conn.execute("ALTER TABLE sl_tp ADD COLUMN time_msc INTEGER")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)")
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+
+            trade_columns = ", ".join(f'"{name}" {kind}' for name, kind in TRADE_COLUMNS.items())
+            conn.execute(f"CREATE TABLE IF NOT EXISTS trades ({trade_columns})")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_close ON trades (close_time)")
+            conn.execute("CREATE TABLE IF NOT EXISTS dirty_positions (position_id INTEGER PRIMARY KEY)")
+            # Stores created before the trade table: every known position needs a row
+            if conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('trades_schema', 1)").rowcount:
+                conn.execute("INSERT OR IGNORE INTO dirty_positions SELECT DISTINCT position_id FROM deals")
+        self.version = int(row[0]) if row else 0
+
+    def get_state(self) -> Dict[str, Optional[int]]:
+        """Returns the sync watermark: covered start and last stored (time_msc, ticket)."""
+        with closing(self._connect()) as conn:
+            meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+            last = conn.execute(
+                "SELECT time, time_msc, ticket FROM deals ORDER BY time_msc DESC, ticket DESC LIMIT 1"
+            ).fetchone()
+        return {
+            "synced_from": meta.get("synced_from"),
+            "synced_to": meta.get("synced_to"),
+            "last_time": last[0] if last else None,
+            "last_time_msc": last[1] if last else None,
+            "last_ticket": last[2] if last else None,
+        }
+
+    def save_deals(self, df: pd.DataFrame) -> int:
+        """Upserts raw deals by ticket. Returns the number of tickets not seen before."""
+        if df.empty:
+            return 0
+
+        frame = df.reindex(columns=list(DEAL_COLUMNS.keys()))
+        rows = frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+        names = ", ".join(f'"{name}"' for name in DEAL_COLUMNS)
+        marks = ", ".join("?" for _ in DEAL_COLUMNS)
+
+        with self._lock, closing(self._connect()) as conn, conn:
+            before = conn.execute("SELECT COUNT(*) FROM deals").fetchone()[0]
+            conn.executemany(f"INSERT OR REPLACE INTO deals ({names}) VALUES ({marks})", rows)
+            positions = frame["position_id"].dropna().unique().tolist()
+            conn.executemany(
+                "INSERT OR IGNORE INTO dirty_positions (position_id) VALUES (?)",
+                ((int(position_id),) for position_id in positions),
+            )
+            after = conn.execute("SELECT COUNT(*) FROM deals").fetchone()[0]
+            added = after - before
+            if added:
+                self.version += 1
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'version'", (self.version,))
+        return added
+
+    def save_sl_tp(self, df_orders: pd.DataFrame) -> None:
+        """
+        Stores the SL/TP of the last order of each position in a batch of history orders.
+        Batches arrive out of time order (a backfill window after the head), so a position's
+        SL/TP is only replaced by an order at least as recent as the one it came from.
+        """
+        if df_orders.empty or "position_id" not in df_orders.columns:
+            return
+
+        orders = df_orders.reindex(columns=["position_id", "sl", "tp", "time_setup_msc"])
+        orders = orders.rename(columns={"time_setup_msc": "time_msc"})
+        sl_tp = orders.groupby("position_id", as_index=False)[["sl", "tp", "time_msc"]].last()
+        rows = sl_tp.astype(object).where(sl_tp.notna(), None).itertuples(index=False, name=None)
+
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO sl_tp (position_id, sl, tp, time_msc) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (position_id) DO UPDATE SET sl = excluded.sl, tp = excluded.tp, "
+                "time_msc = excluded.time_msc "
+                "WHERE excluded.time_msc IS NULL OR sl_tp.time_msc IS NULL OR excluded.time_msc >= sl_tp.time_msc",
+                rows,
+            )
+            if self._sl_tp is not None:
+                self._sl_tp.update(sl_tp)
+
+    def mark_synced(self, synced_from: int, synced_to: int) -> None:
+        """Widens the covered interval after a successful sync."""
+        state = self.get_state()
+        if state["synced_from"] is not None:
+            synced_from = min(synced_from, state["synced_from"])
+        if state["synced_to"] is not None:
+            synced_to = max(synced_to, state["synced_to"])
+
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [("synced_from", synced_from), ("synced_to", synced_to)],
+            )
+
+    def read_deals(self, date_from: datetime, date_to: datetime) -> pd.DataFrame:
+        """Reads raw deals in [date_from, date_to], oldest first."""
+        query = "SELECT * FROM deals WHERE time >= ? AND time <= ? ORDER BY time_msc, ticket"
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(query, conn, params=(to_epoch(date_from), to_epoch(date_to)))
+
+    def read_deals_after(self, time_msc: int, ticket: int) -> pd.DataFrame:
+        """Reads raw deals stored after the (time_msc, ticket) position, oldest first."""
+        query = (
+            "SELECT * FROM deals WHERE time_msc > ? OR (time_msc = ? AND ticket > ?) "
+            "ORDER BY time_msc, ticket"
+        )
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(query, conn, params=(time_msc, time_msc, ticket))
+
+    def read_deals_snapshot(self, time_msc: int, ticket: int,
+                            columns: List[str]) -> Tuple[pd.DataFrame, int, int]:
+        """
+        Deals stored after the (time_msc, ticket) position, oldest first, together with the
+        total deal count and the store version they belong to. Read under the write lock,
+        so no sync lands between the three.
+        """
+        fields = ", ".join(f'"{name}"' for name in columns)
+        query = (
+            f"SELECT {fields} FROM deals WHERE time_msc > ? OR (time_msc = ? AND ticket > ?) "
+            "ORDER BY time_msc, ticket"
+        )
+        with self._lock, closing(self._connect()) as conn:
+            total = conn.execute("SELECT COUNT(*) FROM deals").fetchone()[0]
+            df = pd.read_sql_query(query, conn, params=(time_msc, time_msc, ticket))
+            return df, total, self.version
+
+    def iter_deals(self, date_from: datetime, date_to: datetime, chunksize: int) -> Iterator[pd.DataFrame]:
+        """Yields raw deals in [date_from, date_to] in chunks of at most `chunksize` rows."""
+        query = "SELECT * FROM deals WHERE time >= ? AND time <= ? ORDER BY time_msc, ticket"
+        with closing(self._connect()) as conn:
+            yield from pd.read_sql_query(
+                query, conn, params=(to_epoch(date_from), to_epoch(date_to)), chunksize=chunksize
+            )
+
+    def read_sl_tp(self) -> pd.DataFrame:
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query("SELECT position_id, sl, tp, time_msc FROM sl_tp", conn)
+
+    def sl_tp_index(self) -> SlTpIndex:
+        """SL/TP lookup loaded from the table once, then kept current by `save_sl_tp`."""
+        if self._sl_tp is None:
+            with self._lock:
+                if self._sl_tp is None:
+                    self._sl_tp = SlTpIndex.from_frame(self.read_sl_tp())
+        return self._sl_tp
+
+    def refresh_trades(self) -> int:
+        """Rebuilds the trade rows of positions with new deals. Returns the number of rows written."""
+        with self._lock, closing(self._connect()) as conn, conn:
+            fields = ", ".join(f'"{name}"' for name in TRADE_SOURCE_FIELDS)
+            raw = pd.read_sql_query(
+                f"SELECT {fields} FROM deals WHERE position_id IN (SELECT position_id FROM dirty_positions)",
+                conn,
+            )
+            if raw.empty:
+                conn.execute("DELETE FROM dirty_positions")
+                return 0
+
+            # Sorting here is much cheaper than a temp B-tree ORDER BY over the index lookups
+            trades = build_trades(raw.sort_values(["time_msc", "ticket"], kind="stable"))
+            frame = trades.reindex(columns=list(TRADE_COLUMNS.keys()))
+            rows = frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+            names = ", ".join(f'"{name}"' for name in TRADE_COLUMNS)
+            marks = ", ".join("?" for _ in TRADE_COLUMNS)
+            # Rebuilt rows start without excursions: their time span may have changed
+            conn.executemany(f"INSERT OR REPLACE INTO trades ({names}) VALUES ({marks})", rows)
+            conn.execute("DELETE FROM dirty_positions")
+            self.trades_version += 1
+        return len(trades)
+
+    def read_trades(self, date_from: datetime, date_to: datetime) -> pd.DataFrame:
+        """Reads closed trades with their last exit in [date_from, date_to], oldest exit first."""
+        query = (
+            "SELECT * FROM trades WHERE closed = 1 AND close_time >= ? AND close_time <= ? "
+            "ORDER BY close_time_msc, position_id"
+        )
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(query, conn, params=(to_epoch(date_from), to_epoch(date_to)))
+
+    def read_pending_excursions(self, date_from: datetime, date_to: datetime) -> pd.DataFrame:
+        """Closed trades in the range with a known entry and no MAE/MFE yet."""
+        query = (
+            "SELECT position_id, symbol, type, open_time, close_time, open_price FROM trades "
+            "WHERE closed = 1 AND close_time >= ? AND close_time <= ? "
+            "AND excursion_bars IS NULL AND open_time IS NOT NULL"
+        )
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(query, conn, params=(to_epoch(date_from), to_epoch(date_to)))
+
+    def save_excursions(self, position_ids: np.ndarray, mae: np.ndarray, mfe: np.ndarray,
+                        bars: np.ndarray) -> None:
+        """Stores MAE/MFE and the number of bars they were measured on."""
+        if len(position_ids) == 0:
+            return
+
+        frame = pd.DataFrame({"mae": mae, "mfe": mfe, "bars": bars, "position_id": position_ids})
+        rows = frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None)
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "UPDATE trades SET mae = ?, mfe = ?, excursion_bars = ? WHERE position_id = ?", rows
+            )
+            self.trades_version += 1
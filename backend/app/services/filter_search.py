@@ -0,0 +1,174 @@
+"""
+What-if search for the weekday/hour (and optionally symbol) filters that would have
+worked best for each EA.
+
+Deals are reduced once to a cube of (EA x symbol x weekday x hour) cells holding trade
+count, wins, gross profit and gross loss. A candidate filter keeps a set of weekdays, one
+contiguous window of hours and, optionally, a set of symbols; its totals are sums of cube
+cells, so candidates never touch the deals:
+- hour windows come from prefix sums along the hour axis
+- weekday and symbol sets are 0/1 mask matrices applied with one tensor product
+Every candidate of an EA is scored at once, and the best one meeting the minimum trade
+count wins. This is an in-sample search: the result describes the past, not an edge.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+WEEKDAYS = 7
+HOURS = 24
+
+# Symbols toggled per EA when symbols are searched (2^n - 1 symbol sets); the rest are always kept
+MAX_SEARCH_SYMBOLS = 4
+
+# Last axis of the cube
+COUNT, WINS, GROSS_PROFIT, GROSS_LOSS = range(4)
+
+
+def _codes(column: pd.Series):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), [str(c) for c in column.cat.categories]
+    codes, uniques = pd.factorize(column, sort=True)
+    return codes, [str(u) for u in uniques]
+
+
+def build_cube(df: pd.DataFrame, by_symbol: bool = False) -> Dict[str, Any]:
+    """
+    :param df: Exit deals with `time`, `ea_id`, `symbol` and `net_profit`.
+    :return: `ea_ids`, `symbols` (None without `by_symbol`) and `cells`, an array of shape
+        (EAs, symbols or 1, 7, 24, 4) with COUNT, WINS, GROSS_PROFIT and GROSS_LOSS.
+    """
+    ea_codes, ea_ids = _codes(df["ea_id"])
+    if by_symbol:
+        symbol_codes, symbols = _codes(df["symbol"])
+    else:
+        symbol_codes, symbols = np.zeros(len(df), dtype=np.int64), None
+    n_symbols = len(symbols) if symbols is not None else 1
+
+    times = df["time"]
+    flat = ((ea_codes.astype(np.int64) * n_symbols + symbol_codes) * WEEKDAYS
+            + times.dt.dayofweek.to_numpy()) * HOURS + times.dt.hour.to_numpy()
+    size = len(ea_ids) * n_symbols * WEEKDAYS * HOURS
+
+    returns = df["net_profit"].to_numpy(dtype=np.float64)
+    is_win = returns > 0
+    shape = (len(ea_ids), n_symbols, WEEKDAYS, HOURS)
+    # Stacked last so `cells` owns its buffer (the cache sizes it with sys.getsizeof)
+    cells = np.stack([
+        np.bincount(flat, minlength=size).astype(np.float64).reshape(shape),
+        np.bincount(flat, weights=is_win, minlength=size).reshape(shape),
+        np.bincount(flat, weights=np.where(is_win, returns, 0.0), minlength=size).reshape(shape),
+        np.bincount(flat, weights=np.where(is_win, 0.0, returns), minlength=size).reshape(shape),
+    ], axis=-1)
+    return {"ea_ids": ea_ids, "symbols": symbols, "cells": cells}
+
+
+def _subset_masks(n: int) -> np.ndarray:
+    """Every non-empty subset of n items as rows of a 0/1 matrix."""
+    return ((np.arange(1, 2 ** n)[:, np.newaxis] >> np.arange(n)) & 1).astype(np.float64)
+
+
+def _profit_factor(gross_profit: np.ndarray, gross_loss: np.ndarray) -> np.ndarray:
+    """Same convention as calculate_metrics: inf without losses, 1.0 with no result at all."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(
+            np.abs(gross_loss) < 1e-10,
+            np.where(gross_profit > 0, np.inf, 1.0),
+            gross_profit / np.abs(gross_loss),
+        )
+
+
+def _summary(totals: np.ndarray) -> Dict[str, Any]:
+    count = int(totals[COUNT])
+    return {
+        "trades": count,
+        "net_profit": float(totals[GROSS_PROFIT] + totals[GROSS_LOSS]),
+        "profit_factor": float(_profit_factor(totals[GROSS_PROFIT], totals[GROSS_LOSS])),
+        "win_rate": float(totals[WINS] / count * 100) if count else 0.0,
+    }
+
+
+def _search_ea(cells: np.ndarray, symbols: Optional[List[str]], objective: str,
+               min_trades: int) -> Dict[str, Any]:
+    """Best filter of one EA. `cells` has shape (symbols or 1, 7, 24, 4)."""
+    counts = cells[..., COUNT]
+    weekdays = np.flatnonzero(counts.sum(axis=(0, 2)))
+    hours = np.flatnonzero(counts.sum(axis=(0, 1)))
+
+    # Symbol sets: subsets of the most traded symbols, the others always kept
+    if symbols is not None:
+        traded = np.flatnonzero(counts.sum(axis=(1, 2)))
+        traded = traded[np.argsort(-counts.sum(axis=(1, 2))[traded], kind="stable")]
+        toggled, fixed = traded[:MAX_SEARCH_SYMBOLS], traded[MAX_SEARCH_SYMBOLS:]
+        symbol_masks = _subset_masks(len(toggled))
+        by_symbols = np.tensordot(symbol_masks, cells[toggled], axes=(1, 0)) + cells[fixed].sum(axis=0)
+    else:
+        toggled = fixed = np.empty(0, dtype=np.int64)
+        symbol_masks = np.ones((1, 0))
+        by_symbols = cells.sum(axis=0)[np.newaxis]
+
+    # (symbol sets, weekdays, hours, 4) restricted to what the EA actually traded
+    active = by_symbols[:, weekdays][:, :, hours]
+    prefix = np.concatenate((np.zeros(active.shape[:2] + (1, 4)), np.cumsum(active, axis=2)), axis=2)
+    first, last = np.triu_indices(len(hours))
+    windows = prefix[:, :, last + 1] - prefix[:, :, first]
+
+    weekday_masks = _subset_masks(len(weekdays))
+    # (weekday sets, symbol sets, hour windows, 4)
+    totals = np.tensordot(weekday_masks, windows, axes=(1, 1))
+
+    count = totals[..., COUNT]
+    net = totals[..., GROSS_PROFIT] + totals[..., GROSS_LOSS]
+    score = net if objective == "net_profit" else _profit_factor(totals[..., GROSS_PROFIT], totals[..., GROSS_LOSS])
+    feasible = count >= min_trades
+
+    result = {"candidates": int(count.size), "best": None}
+    if not feasible.any():
+        return result
+
+    # Highest score; ties go to the higher net profit, then to the filter keeping more trades.
+    # Three masked max passes instead of a full sort of the candidates.
+    tied = feasible
+    for key in (score, net):
+        ranked = np.where(tied, key, -np.inf)
+        tied = tied & (ranked == ranked.max())
+    w, s, h = np.unravel_index(int(np.where(tied, count, -1).argmax()), count.shape)
+
+    kept_symbols = None
+    if symbols is not None:
+        chosen = np.concatenate((toggled[symbol_masks[s] > 0], fixed))
+        kept_symbols = sorted(symbols[i] for i in chosen)
+    result["best"] = {
+        "weekdays": weekdays[weekday_masks[w] > 0].tolist(),
+        "hours": list(range(int(hours[first[h]]), int(hours[last[h]]) + 1)),
+        "symbols": kept_symbols,
+        **_summary(totals[w, s, h]),
+    }
+    return result
+
+
+def search_filters(cube: Dict[str, Any], objective: str = "net_profit",
+                   min_trades: int = 30) -> List[Dict[str, Any]]:
+    """
+    Best weekday set x hour window (x symbol set) per EA of a cube from `build_cube`.
+
+    :param objective: "net_profit" or "profit_factor" (ties broken by net profit).
+    :param min_trades: Candidates keeping fewer trades are discarded.
+    :return: Per EA, the unfiltered baseline and the best filter (None when no candidate
+        keeps `min_trades` trades). `weekdays` and `hours` are inclusion lists, ready to
+        be sent back as query filters.
+    """
+    results = []
+    for i, ea_id in enumerate(cube["ea_ids"]):
+        cells = cube["cells"][i]
+        if not cells[..., COUNT].any():
+            continue
+        found = _search_ea(cells, cube["symbols"], objective, min_trades)
+        results.append({
+            "ea_id": ea_id,
+            "candidates": found["candidates"],
+            "baseline": _summary(cells.sum(axis=(0, 1, 2))),
+            "best": found["best"],
+        })
+    return results
@@ -0,0 +1,28 @@
+"""
+Helpers to pull long MT5 histories in bounded time windows.
+
+`history_deals_get` returns one namedtuple per deal; asking for years at once holds
+millions of them (plus a list copy) before any DataFrame exists. Splitting the range
+and converting each window right away keeps only one window of tuples alive.
+"""
+from typing import List, Sequence, Tuple
+
+import pandas as pd
+
+
+def split_range(start: int, end: int, chunk_seconds: int) -> List[Tuple[int, int]]:
+    """
+    Splits [start, end] (epoch seconds) into consecutive windows of at most `chunk_seconds`.
+    Adjacent windows share their boundary second, so callers must dedupe by ticket.
+    """
+    if chunk_seconds <= 0 or end - start <= chunk_seconds:
+        return [(start, end)]
+    bounds = list(range(start, end, chunk_seconds)) + [end]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def records_frame(records: Sequence[tuple]) -> pd.DataFrame:
+    """Typed frame from the namedtuples returned by MT5, without an intermediate list copy."""
+    if records is None or len(records) == 0:
+        return pd.DataFrame()
+    return pd.DataFrame.from_records(records, columns=records[0]._fields)
@@ -0,0 +1,96 @@
+"""
+Numeric kernels shared by the metrics code of the API and the desktop analyzer.
+
+`numba` is optional: when installed the run statistics are JIT-compiled into a
+single loop, otherwise an equivalent vectorized NumPy version is used.
+"""
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover - optional dependency
+    njit = None
+
+
+def _run_statistics_numpy(wins: np.ndarray) -> Tuple[int, int, int]:
+    n = len(wins)
+    if n == 0:
+        return 0, 0, 0
+
+    starts = np.concatenate(([0], np.flatnonzero(wins[1:] != wins[:-1]) + 1))
+    lengths = np.diff(np.append(starts, n))
+    run_is_win = wins[starts]
+
+    max_wins = int(lengths[run_is_win].max()) if run_is_win.any() else 0
+    max_losses = int(lengths[~run_is_win].max()) if not run_is_win.all() else 0
+    return len(starts), max_wins, max_losses
+
+
+def _run_statistics_loop(wins):
+    n = len(wins)
+    if n == 0:
+        return 0, 0, 0
+
+    runs = 1
+    current = 1
+    max_wins = 0
+    max_losses = 0
+    for i in range(1, n):
+        if wins[i] == wins[i - 1]:
+            current += 1
+        else:
+            if wins[i - 1]:
+                max_wins = max(max_wins, current)
+            else:
+                max_losses = max(max_losses, current)
+            runs += 1
+            current = 1
+    if wins[n - 1]:
+        max_wins = max(max_wins, current)
+    else:
+        max_losses = max(max_losses, current)
+    return runs, max_wins, max_losses
+
+
+_run_statistics_jit = njit(cache=True)(_run_statistics_loop) if njit is not None else None
+
+
+def run_statistics(returns) -> Tuple[int, int, int]:
+    """
+    Scans a sequence of trade results once.
+    :param returns: Trade results in chronological order (wins are values > 0).
+    :return: (number of win/loss runs, longest win streak, longest loss streak).
+    """
+    wins = np.asarray(returns, dtype=np.float64) > 0
+    if _run_statistics_jit is not None:
+        runs, max_wins, max_losses = _run_statistics_jit(wins)
+        return int(runs), int(max_wins), int(max_losses)
+    return _run_statistics_numpy(wins)
+
+
+def runs_z_score(returns, num_runs: int):
+    """
+    Wald-Wolfowitz runs test Z-score for a win/loss sequence.
+    :return: Z-score, or None when the test does not apply.
+    """
+    wins = np.asarray(returns, dtype=np.float64) > 0
+    n_wins = int(wins.sum())
+    return runs_z_score_from_counts(n_wins, len(wins) - n_wins, num_runs)
+
+
+def runs_z_score_from_counts(n_wins: int, n_losses: int, num_runs: int):
+    """`runs_z_score` from the win/loss counts and number of runs of the sequence."""
+    n = n_wins + n_losses
+    if n < 2:
+        return None
+    if n_wins == 0 or n_losses == 0:
+        return None
+
+    expected_runs = ((2 * n_wins * n_losses) / n) + 1
+    variance_runs = ((2 * n_wins * n_losses * (2 * n_wins * n_losses - n)) / (n * n * (n - 1)))
+    if variance_runs <= 1e-10:
+        return None
+
+    return (num_runs - expected_runs) / np.sqrt(variance_runs)
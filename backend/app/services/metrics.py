@@ -0,0 +1,136 @@
+"""
+Batch performance metrics of a slice of exit deals.
+
+`MT5Service.calculate_metrics` wraps this with its cache; `incremental_metrics`
+produces the same dictionary by folding deals in as they arrive.
+"""
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.deal_dtypes import float64_values
+from app.services.kernels import run_statistics, runs_z_score
+
+
+def empty_metrics() -> Dict[str, Any]:
+    return {
+        "general": {
+            "net_profit": 0.0,
+            "profit_factor": 0.0,
+            "win_rate": 0.0,
+            "total_trades": 0
+        },
+        "advanced": {
+            "expectancy": 0.0,
+            "sharpe_ratio": None,
+            "recovery_factor": 0.0,
+            "z_score": None,
+            "std_dev": 0.0
+        },
+        "sequences": {
+            "max_consecutive_wins": 0,
+            "max_consecutive_losses": 0
+        },
+        "extremes": {
+            "max_profit": 0.0,
+            "max_loss": 0.0,
+            "max_drawdown": 0.0
+        }
+    }
+
+
+def _z_score(returns: pd.Series, num_runs: int) -> Optional[float]:
+    try:
+        return runs_z_score(returns.values, num_runs)
+    except Exception:
+        return None
+
+
+def calculate_metrics(df: pd.DataFrame, min_days_for_sharpe: int) -> Dict[str, Any]:
+    """
+    :param df: Exit deals in chronological order (with `net_profit`, `commission`, `swap`, `time`).
+    :param min_days_for_sharpe: Minimum number of trading days to report a Sharpe ratio.
+    """
+    if df.empty:
+        return empty_metrics()
+
+    total_ops = len(df)
+    returns = df["net_profit"]
+    wins = returns[returns > 0]
+    losses = returns[returns <= 0]
+
+    gross_profit = wins.sum()
+    gross_loss = losses.sum()
+    net_profit = gross_profit + gross_loss
+    n_wins = len(wins)
+    n_losses = len(losses)
+
+    # Costs
+    total_commission = float64_values(df["commission"]).sum()
+    total_swap = float64_values(df["swap"]).sum()
+    total_costs = total_commission + total_swap
+
+    # Profit Factor
+    if abs(gross_loss) < 1e-10:
+        profit_factor = float("inf") if gross_profit > 0 else 1.0
+    else:
+        profit_factor = gross_profit / abs(gross_loss)
+
+    win_rate = (n_wins / total_ops) * 100 if total_ops > 0 else 0
+
+    # Drawdown
+    cum_profit = returns.cumsum()
+    max_peak = cum_profit.cummax()
+    drawdown = max_peak - cum_profit
+    max_drawdown = drawdown.max()
+
+    # Expectancy
+    avg_win = wins.mean() if not wins.empty else 0.0
+    avg_loss = losses.mean() if not losses.empty else 0.0
+    expectancy = ((n_wins/total_ops) * avg_win) + ((n_losses/total_ops) * avg_loss) if total_ops > 0 else 0.0
+
+    # Sharpe
+    daily_returns = df.groupby(df["time"].dt.date)["net_profit"].sum()
+    sharpe = None
+    if len(daily_returns) >= min_days_for_sharpe:
+        std_dev = daily_returns.std()
+        if std_dev > 1e-10:
+            sharpe = (daily_returns.mean() / std_dev) * np.sqrt(252)
+
+    recovery_factor = net_profit / max_drawdown if max_drawdown > 1e-10 else 0.0
+
+    # Runs and streaks in a single pass
+    num_runs, max_wins_seq, max_losses_seq = run_statistics(returns.values)
+
+    return {
+        "general": {
+            "net_profit": net_profit,
+            "gross_profit": gross_profit,
+            "gross_loss": gross_loss,
+            "total_costs": total_costs,
+            "profit_factor": profit_factor,
+            "win_rate": win_rate,
+            "total_trades": total_ops,
+            "total_wins": n_wins,
+            "total_losses": n_losses,
+            "avg_win": avg_win,
+            "avg_loss": avg_loss
+        },
+        "advanced": {
+            "expectancy": expectancy,
+            "sharpe_ratio": sharpe,
+            "recovery_factor": recovery_factor,
+            "z_score": _z_score(returns, num_runs),
+            "std_dev": returns.std()
+        },
+        "sequences": {
+            "max_consecutive_wins": max_wins_seq,
+            "max_consecutive_losses": max_losses_seq
+        },
+        "extremes": {
+            "max_profit": wins.max() if not wins.empty else 0.0,
+            "max_loss": losses.min() if not losses.empty else 0.0,
+            "max_drawdown": max_drawdown
+        }
+    }
@@ -0,0 +1,72 @@
+"""
+Calls that run next to the MetaTrader5 module: on the service's worker thread, or inside
+a terminal process of the pool.
+
+They are plain module functions returning frames, arrays, dicts or error tuples, so they
+can be sent to another process by reference and their results pickled back. The module
+is imported by name (`MT5_MODULE`), which lets checks run against a fake terminal.
+"""
+import importlib
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.services.history_chunks import records_frame
+
+mt5 = importlib.import_module(get_settings().MT5_MODULE)
+
+
+def initialize(path: Optional[str] = None) -> Optional[Tuple[int, str]]:
+    """Attaches this process to a terminal. Returns None, or the terminal error."""
+    params = {"path": path} if path else {}
+    if not mt5.initialize(**params):
+        return mt5.last_error()
+    return None
+
+
+def shutdown() -> None:
+    mt5.shutdown()
+
+
+def terminal_info() -> Optional[Dict[str, Any]]:
+    info = mt5.terminal_info()
+    return info._asdict() if info else None
+
+
+def history_window(dt_from: datetime, dt_to: datetime) -> tuple:
+    """
+    Deals and orders frames of a window, or the terminal error.
+    Converting here releases the window's namedtuples before the next one is fetched.
+    """
+    deals = mt5.history_deals_get(dt_from, dt_to)
+    if deals is None:
+        return None, None, mt5.last_error()
+    deals = records_frame(deals)
+    return deals, records_frame(mt5.history_orders_get(dt_from, dt_to)), None
+
+
+def change_counters(dt_from: datetime, dt_to: datetime) -> Tuple[Optional[int], Optional[int]]:
+    return mt5.history_deals_total(dt_from, dt_to), mt5.positions_total()
+
+
+def positions() -> tuple:
+    """Open positions frame, or the terminal error."""
+    records = mt5.positions_get()
+    if records is None:
+        return None, mt5.last_error()
+    return records_frame(records), None
+
+
+def rates_window(symbol: str, timeframe: str, dt_from: datetime, dt_to: datetime) -> tuple:
+    """Bar times, highs and lows of a window (`timeframe` as in "M1"), or the terminal error."""
+    rates = mt5.copy_rates_range(symbol, getattr(mt5, f"TIMEFRAME_{timeframe.upper()}"), dt_from, dt_to)
+    if rates is None:
+        return None, mt5.last_error()
+    bars = (
+        np.asarray(rates["time"], dtype=np.int64),
+        np.asarray(rates["high"], dtype=np.float64),
+        np.asarray(rates["low"], dtype=np.float64),
+    )
+    return bars, None
@@ -1,27 +1,81 @@
-import MetaTrader5 as mt5
+import asyncio
 import pandas as pd
 import numpy as np
-import hashlib
 import logging
+import threading
+import time
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Callable, Hashable, Iterator, Optional, List, Tuple, TypeVar
 from functools import lru_cache
 
 from app.core.config import get_settings
+from app.services.cache import TTLCache
+from app.services.correlation import correlation_analysis, empty_correlation
+from app.services.aggregations import build_aggregates
+from app.services.deal_cube import CUBE_SOURCE_FIELDS, DealCube, cube_metrics, position_directions
+from app.services.deal_dtypes import compact_deals, widen_floats
+from app.services.deal_store import DealStore, to_epoch
+from app.services.filter_search import build_cube, search_filters
+from app.services.grouped_metrics import calculate_grouped_metrics
+from app.services.history_chunks import split_range
+from app.services.kernels import run_statistics, runs_z_score
+from app.services import mt5_calls
+from app.services.metrics import calculate_metrics, empty_metrics
+from app.services.normalization import normalize_deals, normalize_positions
+from app.services.mt5_worker import MT5Worker
+from app.services.positions_cache import PositionsCache
+from app.services.risk import empty_risk, monte_carlo
+from app.services.rolling import rolling_metrics
+from app.services.trades import excursions, fetch_windows, normalize_trades, timeframe_seconds
+from app.services.pagination import encode_cursor, page_slice, project, sort_keys, to_python
+from app.services.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+T = TypeVar("T")
+
+# Slack applied around "now" so deals stamped in the broker's timezone are not missed
+SYNC_MARGIN_SECONDS = 2 * 24 * 3600
+
 class MT5Service:
-    def __init__(self):
+    def __init__(self, store: Optional[DealStore] = None, worker: Optional[Any] = None,
+                 terminal_path: Optional[str] = None):
+        """
+        :param worker: Where MT5 calls run: an MT5Worker thread (default) or a TerminalProcess.
+        :param terminal_path: Terminal to attach to (defaults to MT5_PATH).
+        """
         self._connected = False
-        self._metrics_cache: Dict[str, Dict[str, Any]] = {}
+        self._connect_lock = threading.Lock()
+        self.terminal_path = terminal_path or settings.MT5_PATH
+        self._metrics_cache = TTLCache(settings.METRICS_CACHE_SIZE,
+                                       max_bytes=settings.METRICS_CACHE_MAX_BYTES)
         self.all_deals: pd.DataFrame = pd.DataFrame()
+        self.store = store or DealStore(settings.DEAL_STORE_PATH)
+        self._query_cache = TTLCache(settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL_SECONDS,
+                                     max_bytes=settings.QUERY_CACHE_MAX_BYTES)
+        self._last_sync: Tuple[float, Optional[int]] = (0.0, None)
+        self._worker = worker or MT5Worker()
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self._coalesced = {"executed": 0, "deduplicated": 0}
+        self.positions = PositionsCache(self._read_positions, settings.POSITIONS_REFRESH_SECONDS)
+        self._cube = DealCube()
+        self._cube_lock = threading.Lock()
+        # A sync from an earlier start also brings everything a later start would
+        self._sync_flight = SingleFlight(covers=lambda inflight, start: inflight <= start)
+        # Loads of an enclosing range (same store version) are sliced instead of re-read
+        self._load_flight = SingleFlight(
+            covers=lambda inflight, key: inflight[0] == key[0] and inflight[1] <= key[1] and inflight[2] >= key[2]
+        )
+        # An excursion fill of an enclosing range measures every trade a narrower one would
+        self._excursion_flight = SingleFlight(
+            covers=lambda inflight, key: inflight[0] <= key[0] and inflight[1] >= key[1]
+        )
 
     @property
     def is_connected(self) -> bool:
         """Checks if MT5 connection is active."""
-        is_conn = self._connected and mt5.terminal_info() is not None
+        is_conn = self._connected and self._worker.call(mt5_calls.terminal_info) is not None
         if not is_conn and self._connected:
             self._connected = False
         return is_conn
@@ -30,288 +84,697 @@ class MT5Service:
         """Establishes connection to MT5 terminal."""
         if self._connected:
             return True
-        
-        init_params = {}
-        if settings.MT5_PATH:
-            init_params["path"] = settings.MT5_PATH
-        
-        try:
-            if not mt5.initialize(**init_params):
-                error_code, error_desc = mt5.last_error()
+
+        with self._connect_lock:
+            if self._connected:
+                return True
+            try:
+                error = self._worker.call(mt5_calls.initialize, self.terminal_path)
+            except Exception as e:
+                logger.error(f"Exception connecting to MT5: {e}")
+                return False
+
+            if error is not None:
+                error_code, error_desc = error
                 logger.error(f"Failed to initialize MT5 (code {error_code}): {error_desc}")
                 return False
-            
+
             self._connected = True
             logger.info("Connected to MetaTrader 5")
             return True
-            
-        except Exception as e:
-            logger.error(f"Exception connecting to MT5: {e}")
-            return False
 
     def shutdown(self) -> None:
         """Closes MT5 connection."""
         if self._connected:
-            mt5.shutdown()
+            self._worker.call(mt5_calls.shutdown)
             self._connected = False
+        self._worker.stop()
+
+    async def run(self, fn: Callable[..., T], *args: Any, key: Optional[Hashable] = None) -> T:
+        """
+        Awaits a blocking service call from async code without holding the event loop.
+        Concurrent calls with the same `key` share a single execution.
+        """
+        if key is None:
+            return await asyncio.to_thread(fn, *args)
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            self._coalesced["executed"] += 1
+        else:
+            self._coalesced["deduplicated"] += 1
+        return await asyncio.shield(task)
 
     def get_terminal_info(self) -> Optional[Dict[str, Any]]:
         if not self.is_connected and not self.connect():
             return None
-        info = mt5.terminal_info()
-        if info:
-            return info._asdict()
-        return None
+        return self._worker.call(mt5_calls.terminal_info)
 
-    def fetch_deals(self, date_from: datetime, date_to: datetime) -> pd.DataFrame:
-        """Fetches deals from MT5 history."""
+    def sync_history(self, date_from: datetime, force: bool = False) -> int:
+        """
+        Pulls the deals and SL/TP orders the local store has not seen yet.
+        Calls for an already covered range within SYNC_INTERVAL_SECONDS reuse the last sync;
+        concurrent calls wait for an in-flight sync starting at or before their range.
+        """
+        start = to_epoch(date_from)
+        last_at, last_from = self._last_sync
+        if (not force and last_from is not None and start >= last_from
+                and time.monotonic() - last_at < settings.SYNC_INTERVAL_SECONDS):
+            return 0
+
+        added, _ = self._sync_flight.do(start, self._sync_from, start)
+        return added
+
+    def _sync_from(self, start: int) -> int:
         if not self.is_connected and not self.connect():
-            return pd.DataFrame()
+            return 0
+
+        state = self.store.get_state()
+        now = to_epoch(datetime.now())
+        head_limit = now + SYNC_MARGIN_SECONDS
+
+        windows = []
+        if state["synced_from"] is None:
+            windows.append((start, head_limit))
+        else:
+            if start < state["synced_from"]:
+                windows.append((start, state["synced_from"]))
+            # Only ask for what came after the newest stored deal (tickets dedupe the overlap)
+            head = state["last_time"] if state["last_time"] is not None else state["synced_from"]
+            head = max(head, state["synced_to"] - SYNC_MARGIN_SECONDS)
+            windows.append((head, head_limit))
+
+        # Long ranges are fetched in FETCH_CHUNK_DAYS windows, each written to the store before the next
+        chunks = [
+            chunk
+            for window_from, window_to in windows
+            for chunk in split_range(window_from, window_to, settings.FETCH_CHUNK_DAYS * 24 * 3600)
+        ]
+
+        added = 0
+        complete = True
+        for chunk_from, chunk_to in chunks:
+            dt_from = pd.Timestamp(chunk_from, unit="s").to_pydatetime()
+            dt_to = pd.Timestamp(chunk_to, unit="s").to_pydatetime()
+
+            deals, orders, error = self._worker.call(mt5_calls.history_window, dt_from, dt_to)
+            if error is not None:
+                error_code, error_desc = error
+                logger.error(f"Failed to fetch deal history (code {error_code}): {error_desc}")
+                complete = False
+                break
+            added += self.store.save_deals(deals)
+            if not orders.empty:
+                self.store.save_sl_tp(orders)
+
+        if complete:
+            self.store.mark_synced(start, now)
+            self._last_sync = (time.monotonic(), min(start, state["synced_from"] or start))
+        if added:
+            self._query_cache.clear()
+            logger.info(f"Deal store synced: {added} new deals")
+        return added
 
+    def change_counters(self) -> Optional[Tuple[Optional[int], Optional[int]]]:
+        """
+        Cheap change detectors: deals in the synced range and open positions.
+        Returns None until the store has been synced once.
+        """
+        synced_from = self.store.get_state()["synced_from"]
+        if synced_from is None or not self.is_connected:
+            return None
+        dt_from = pd.Timestamp(synced_from, unit="s").to_pydatetime()
+        dt_to = pd.Timestamp(to_epoch(datetime.now()) + SYNC_MARGIN_SECONDS, unit="s").to_pydatetime()
+        return self._worker.call(mt5_calls.change_counters, dt_from, dt_to)
+
+    def deals_after(self, time_msc: int, ticket: int) -> Tuple[pd.DataFrame, Tuple[int, int]]:
+        """
+        Syncs the store head and returns the exit deals stored after (time_msc, ticket),
+        along with the position of the newest stored deal to continue from.
+        """
+        synced_from = self.store.get_state()["synced_from"]
+        if synced_from is not None:
+            self.sync_history(pd.Timestamp(synced_from, unit="s").to_pydatetime(), force=True)
+
+        raw = self.store.read_deals_after(time_msc, ticket)
+        if raw.empty:
+            return pd.DataFrame(), (time_msc, ticket)
+        head = (int(raw["time_msc"].iloc[-1]), int(raw["ticket"].iloc[-1]))
+        return normalize_deals(raw, self.store.sl_tp_index()), head
+
+    def fetch_deals(self, date_from: datetime, date_to: datetime) -> pd.DataFrame:
+        """Returns exit deals for the range from the local store, syncing it with MT5 first."""
         try:
-            deals = mt5.history_deals_get(date_from, date_to)
-            
-            if deals is None or len(deals) == 0:
-                return pd.DataFrame()
-
-            df = pd.DataFrame(list(deals), columns=deals[0]._asdict().keys())
-            df["time"] = pd.to_datetime(df["time"], unit="s")
-
-            if "price_sl" not in df.columns:
-                df["price_sl"] = None
-            if "price_tp" not in df.columns:
-                df["price_tp"] = None
-
-            orders = mt5.history_orders_get(date_from, date_to)
-            if orders is not None and len(orders) > 0:
-                df_orders = pd.DataFrame(list(orders), columns=orders[0]._asdict().keys())
-                if "position_id" in df_orders.columns:
-                    if "sl" not in df_orders.columns:
-                        df_orders["sl"] = None
-                    if "tp" not in df_orders.columns:
-                        df_orders["tp"] = None
-                    sl_tp = df_orders.groupby("position_id", as_index=False)[["sl", "tp"]].last()
-                    df = df.merge(sl_tp, on="position_id", how="left")
-                    df["price_sl"] = df["sl"].combine_first(df["price_sl"])
-                    df["price_tp"] = df["tp"].combine_first(df["price_tp"])
-                    df = df.drop(columns=["sl", "tp"])
-            
-            # Filter for entry types (IN/OUT/INOUT) - actually we want OUT/INOUT for results
-            # logic from analyzer.py: entry in [1, 2, 3] (ENTRY_OUT, ENTRY_INOUT, ENTRY_OUT_BY)
-            df = df[df["entry"].isin([1, 2, 3])].copy()
-            
-            df["net_profit"] = df["profit"] + df["commission"] + df["swap"]
-            
-            def create_ea_id(row):
-                if row["magic"] == 0:
-                    return "Manual"
-                return f"EA {int(row['magic'])}"
-            
-            df["ea_id"] = df.apply(create_ea_id, axis=1)
-            self.all_deals = df
+            self.sync_history(date_from)
+
+            key = (self.store.version, to_epoch(date_from), to_epoch(date_to))
+            df, source = self._load_flight.do(key, self._load_deals, date_from, date_to)
+            if source != key and not df.empty:
+                # Shared result of an enclosing range: keep only the requested window
+                df = self._slice_range(df, key[1], key[2])
             return df
             
         except Exception as e:
             logger.error(f"Error fetching deals: {e}")
             return pd.DataFrame()
 
-    def fetch_positions(self) -> pd.DataFrame:
-        if not self.is_connected and not self.connect():
+    def _load_deals(self, date_from: datetime, date_to: datetime) -> pd.DataFrame:
+        df = self.store.read_deals(date_from, date_to)
+        if df.empty:
             return pd.DataFrame()
 
+        df = compact_deals(normalize_deals(df, self.store.sl_tp_index()))
+        self.all_deals = df
+        return df
+
+    def _query_key(self, date_from: datetime, date_to: datetime,
+                   assets: Optional[List[str]], ea_ids: Optional[List[str]],
+                   weekdays: Optional[List[int]] = None, hours: Optional[List[int]] = None) -> tuple:
+        # The store holds nothing past its newest deal, so later end dates are equivalent
+        last_time = self.store.get_state()["last_time"]
+        end = to_epoch(date_to)
+        if last_time is not None:
+            end = min(end, last_time)
+
+        def normalized(values):
+            return tuple(sorted(set(values))) if values else None
+
+        return (
+            self.store.version,
+            to_epoch(date_from),
+            end,
+            normalized(assets),
+            normalized(ea_ids),
+            normalized(weekdays),
+            normalized(hours),
+        )
+
+    def query_deals(self, date_from: datetime, date_to: datetime,
+                    assets: Optional[List[str]] = None,
+                    ea_ids: Optional[List[str]] = None,
+                    weekdays: Optional[List[int]] = None,
+                    hours: Optional[List[int]] = None) -> pd.DataFrame:
+        """Returns filtered exit deals, sharing results between endpoints through the query cache."""
+        return self.query_deals_keyed(date_from, date_to, assets, ea_ids, weekdays, hours)[1]
+
+    def query_deals_keyed(self, date_from: datetime, date_to: datetime,
+                          assets: Optional[List[str]] = None,
+                          ea_ids: Optional[List[str]] = None,
+                          weekdays: Optional[List[int]] = None,
+                          hours: Optional[List[int]] = None) -> Tuple[tuple, pd.DataFrame]:
+        """`query_deals` plus the query cache key the deals were read under (store version included)."""
+        self.sync_history(date_from)
+
+        key = self._query_key(date_from, date_to, assets, ea_ids, weekdays, hours)
+        cached = self._query_cache.get(key)
+        if cached is not None:
+            return key, cached
+
+        df = self.fetch_deals(date_from, date_to)
+        if df.empty:
+            return key, df
+
+        df = self._apply_filters(df, assets, ea_ids, weekdays, hours)
+        self._query_cache.set(key, df)
+        return key, df
+
+    @staticmethod
+    def _slice_range(df: pd.DataFrame, start: int, end: Optional[int] = None) -> pd.DataFrame:
+        """Rows with `time` in [start, end] (epoch seconds; no upper bound when `end` is None)."""
+        seconds = df["time"].to_numpy().astype("datetime64[s]").astype(np.int64)
+        mask = seconds >= start
+        if end is not None:
+            mask &= seconds <= end
+        return df[mask]
+
+    @staticmethod
+    def _apply_filters(df: pd.DataFrame, assets: Optional[List[str]], ea_ids: Optional[List[str]],
+                       weekdays: Optional[List[int]], hours: Optional[List[int]],
+                       time_column: str = "time") -> pd.DataFrame:
+        if assets:
+            df = df[df["symbol"].isin(assets)]
+        if ea_ids:
+            df = df[df["ea_id"].isin(ea_ids)]
+        if weekdays:
+            df = df[df[time_column].dt.dayofweek.isin(weekdays)]
+        if hours:
+            df = df[df[time_column].dt.hour.isin(hours)]
+        return df
+
+    def _fill_excursions(self, date_from: datetime, date_to: datetime) -> int:
+        """
+        Measures MAE/MFE for the range's trades that have none yet and stores them.
+        Bars are requested per symbol over merged trade spans, so the number of MT5
+        calls depends on the time covered, not on the number of trades.
+        """
+        pending = self.store.read_pending_excursions(date_from, date_to)
+        if pending.empty or (not self.is_connected and not self.connect()):
+            return 0
+
+        bar_seconds = timeframe_seconds(settings.EXCURSION_TIMEFRAME)
+        chunk_seconds = settings.EXCURSION_CHUNK_DAYS * 24 * 3600
+
+        measured = 0
+        for symbol, trades in pending.groupby("symbol", sort=False):
+            open_times = trades["open_time"].to_numpy(dtype=np.int64)
+            close_times = trades["close_time"].to_numpy(dtype=np.int64)
+
+            parts = []
+            for window_from, window_to in fetch_windows(open_times, close_times, bar_seconds, chunk_seconds):
+                dt_from = pd.Timestamp(window_from, unit="s").to_pydatetime()
+                dt_to = pd.Timestamp(window_to, unit="s").to_pydatetime()
+                bars, error = self._worker.call(
+                    mt5_calls.rates_window, symbol, settings.EXCURSION_TIMEFRAME, dt_from, dt_to
+                )
+                if error is not None:
+                    error_code, error_desc = error
+                    logger.error(f"Failed to fetch {symbol} bars (code {error_code}): {error_desc}")
+                    parts = None
+                    break
+                parts.append(bars)
+            if parts is None:
+                # Left unmeasured, so the next request retries the symbol
+                continue
+
+            # Adjacent windows share their boundary bar
+            times, unique = np.unique(np.concatenate([part[0] for part in parts]), return_index=True)
+            highs = np.concatenate([part[1] for part in parts])[unique]
+            lows = np.concatenate([part[2] for part in parts])[unique]
+
+            mae, mfe, bars = excursions(
+                trades["type"].to_numpy(), open_times, close_times,
+                trades["open_price"].to_numpy(dtype=np.float64), times, highs, lows,
+            )
+            self.store.save_excursions(trades["position_id"].to_numpy(), mae, mfe, bars)
+            measured += len(trades)
+        return measured
+
+    def fetch_trades(self, date_from: datetime, date_to: datetime, with_excursions: bool = False) -> pd.DataFrame:
+        """
+        Returns closed round-trip trades (one row per position) for the range, rebuilding
+        the store's trade rows for positions with new deals first.
+        """
         try:
-            positions = mt5.positions_get()
-            if positions is None or len(positions) == 0:
-                return pd.DataFrame()
-
-            df = pd.DataFrame(list(positions), columns=positions[0]._asdict().keys())
-            if "time" in df.columns:
-                df["time"] = pd.to_datetime(df["time"], unit="s")
-            if "sl" not in df.columns:
-                df["sl"] = None
-            if "tp" not in df.columns:
-                df["tp"] = None
-            if "price_current" not in df.columns:
-                df["price_current"] = None
-            if "comment" not in df.columns:
-                df["comment"] = None
-
-            def create_ea_id(row):
-                if row["magic"] == 0:
-                    return "Manual"
-                return f"EA {int(row['magic'])}"
-
-            df["ea_id"] = df.apply(create_ea_id, axis=1)
+            self.sync_history(date_from)
+            self.store.refresh_trades()
+
+            span = (to_epoch(date_from), to_epoch(date_to))
+            if with_excursions:
+                self._excursion_flight.do(span, self._fill_excursions, date_from, date_to)
+
+            key = ("trades", self.store.trades_version) + span
+            cached = self._query_cache.get(key)
+            if cached is not None:
+                return cached
+
+            df = normalize_trades(self.store.read_trades(date_from, date_to))
+            self._query_cache.set(key, df)
             return df
+
         except Exception as e:
-            logger.error(f"Error fetching positions: {e}")
+            logger.error(f"Error fetching trades: {e}")
             return pd.DataFrame()
 
-    def _get_dataframe_hash(self, df: pd.DataFrame) -> str:
+    def query_trades(self, date_from: datetime, date_to: datetime,
+                     assets: Optional[List[str]] = None,
+                     ea_ids: Optional[List[str]] = None,
+                     weekdays: Optional[List[int]] = None,
+                     hours: Optional[List[int]] = None,
+                     with_excursions: bool = False) -> pd.DataFrame:
+        """Round-trip trades filtered like deals, with weekday and hour taken from the exit."""
+        df = self.fetch_trades(date_from, date_to, with_excursions)
         if df.empty:
-            return "empty"
+            return df
+        return self._apply_filters(df, assets, ea_ids, weekdays, hours, time_column="close_time")
+
+    def export_deals(self, date_from: datetime, date_to: datetime, fmt: str = "ndjson",
+                     assets: Optional[List[str]] = None,
+                     ea_ids: Optional[List[str]] = None,
+                     weekdays: Optional[List[int]] = None,
+                     hours: Optional[List[int]] = None) -> Iterator[str]:
+        """
+        Streams exit deals as NDJSON lines or CSV, reading the store in chunks of
+        EXPORT_CHUNK_SIZE rows so memory stays bounded regardless of the range.
+        """
+        self.sync_history(date_from)
+        sl_tp = self.store.sl_tp_index()
+        header = True
+
+        for raw in self.store.iter_deals(date_from, date_to, settings.EXPORT_CHUNK_SIZE):
+            df = normalize_deals(raw, sl_tp)
+            df = self._apply_filters(df, assets, ea_ids, weekdays, hours)
+            if df.empty:
+                continue
+
+            df = df.fillna(0)
+            if fmt == "csv":
+                yield df.to_csv(index=False, header=header, date_format="%Y-%m-%dT%H:%M:%S")
+                header = False
+            else:
+                # Default precision (10 decimals): 15 would print float64 noise such as -74.209999999999994
+                lines = df.to_json(orient="records", lines=True, date_format="iso", date_unit="s")
+                yield lines if lines.endswith("\n") else lines + "\n"
+
+    def fetch_positions(self) -> pd.DataFrame:
+        df = self._read_positions()
+        return df if df is not None else pd.DataFrame()
+
+    def _read_positions(self) -> Optional[pd.DataFrame]:
+        """Normalized open positions, or None when MT5 could not be read (as opposed to no positions)."""
+        if not self.is_connected and not self.connect():
+            return None
+
         try:
-            df_bytes = pd.util.hash_pandas_object(df, index=True).values
-            return hashlib.md5(df_bytes).hexdigest()
-        except Exception:
-            return str(len(df))
+            positions, error = self._worker.call(mt5_calls.positions)
+            if error is not None:
+                error_code, error_desc = error
+                logger.error(f"Failed to fetch positions (code {error_code}): {error_desc}")
+                return None
+            return normalize_positions(positions)
+        except Exception as e:
+            logger.error(f"Error fetching positions: {e}")
+            return None
+
+    def positions_since(self, since_version: Optional[int] = None) -> Dict[str, Any]:
+        """Open positions opened, modified or closed after `since_version` (see PositionsCache.diff)."""
+        self.positions.refresh()
+        return self.positions.diff(since_version)
+
+    def page_deals(self, df: pd.DataFrame, sort_by: str = "time_msc", descending: bool = True,
+                   cursor: Optional[str] = None, limit: int = 100,
+                   fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """One keyset page of the slice, sorted server-side and projected to `fields`."""
+        if df.empty:
+            return {"items": [], "next_cursor": None, "total": 0}
+
+        # The (value, ticket) order of a slice is reused by every page request
+        order_key = ("order", sort_by) + self._get_fingerprint(df)
+        ordered = self._query_cache.get(order_key)
+        if ordered is None:
+            values = sort_keys(df, sort_by)
+            tickets = df["ticket"].to_numpy()
+            order = np.lexsort((tickets, values))
+            ordered = (values[order], tickets[order], order)
+            self._query_cache.set(order_key, ordered)
+
+        values, tickets, order = ordered
+        start, stop = page_slice(values, tickets, descending, cursor, limit)
+        if descending:
+            values, tickets, order = values[::-1], tickets[::-1], order[::-1]
+        page = project(df.iloc[order[start:stop]], fields)
+
+        next_cursor = None
+        if stop < len(values):
+            next_cursor = encode_cursor(to_python(values[stop - 1]), int(tickets[stop - 1]))
 
-    def _get_empty_metrics(self) -> Dict[str, Any]:
         return {
-            "general": {
-                "net_profit": 0.0,
-                "profit_factor": 0.0,
-                "win_rate": 0.0,
-                "total_trades": 0
-            },
-            "advanced": {
-                "expectancy": 0.0,
-                "sharpe_ratio": None,
-                "recovery_factor": 0.0,
-                "z_score": None,
-                "std_dev": 0.0
-            },
-            "sequences": {
-                "max_consecutive_wins": 0,
-                "max_consecutive_losses": 0
-            },
-            "extremes": {
-                "max_profit": 0.0,
-                "max_loss": 0.0,
-                "max_drawdown": 0.0
-            }
+            "items": widen_floats(page).fillna(0).to_dict(orient="records"),
+            "next_cursor": next_cursor,
+            "total": len(df),
         }
 
-    def _calculate_z_score(self, data: pd.Series) -> Optional[float]:
-        if len(data) < 2:
-            return None
+    def _get_fingerprint(self, df: pd.DataFrame, id_column: str = "ticket") -> tuple:
+        """Cheap identity of a deals slice: store version, row count and ticket checksums."""
+        tickets = df[id_column].to_numpy(dtype=np.int64)
+        mixed = np.bitwise_xor.reduce(tickets * np.int64(0x9E3779B1))
+        return (self.store.version, len(tickets), int(tickets.max()), int(tickets.sum()), int(mixed))
+
+    def request_stats(self) -> Dict[str, Dict[str, int]]:
+        """How many calls ran versus how many joined an identical in-flight one."""
+        return {
+            "routes": {**self._coalesced, "in_flight": len(self._inflight)},
+            "sync": self._sync_flight.stats(),
+            "load": self._load_flight.stats(),
+            "excursions": self._excursion_flight.stats(),
+        }
+
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counters and sizes of the service caches."""
+        return {
+            "query": self._query_cache.stats(),
+            "metrics": self._metrics_cache.stats(),
+        }
+
+    def _get_empty_metrics(self) -> Dict[str, Any]:
+        return empty_metrics()
+
+    def _calculate_z_score(self, data: pd.Series, num_runs: Optional[int] = None) -> Optional[float]:
         try:
-            wins_bin = (data > 0).astype(int).values
-            n = len(wins_bin)
-            n_wins = int(wins_bin.sum())
-            n_losses = n - n_wins
-            
-            if n_wins == 0 or n_losses == 0:
-                return None
-            
-            num_runs = 1
-            for i in range(1, n):
-                if wins_bin[i] != wins_bin[i-1]:
-                    num_runs += 1
-            
-            expected_runs = ((2 * n_wins * n_losses) / n) + 1
-            variance_runs = ((2 * n_wins * n_losses * (2 * n_wins * n_losses - n)) / (n * n * (n - 1)))
-            
-            if variance_runs <= 1e-10:
-                return None
-            
-            return (num_runs - expected_runs) / np.sqrt(variance_runs)
+            if num_runs is None:
+                num_runs = run_statistics(data.values)[0]
+            return runs_z_score(data.values, num_runs)
         except Exception:
             return None
 
     def _max_consecutive(self, data: pd.Series, is_win_sequence: bool = True) -> int:
-        max_seq = 0
-        current_seq = 0
-        for val in data:
-            is_win = val > 0
-            if is_win == is_win_sequence:
-                current_seq += 1
-                max_seq = max(max_seq, current_seq)
-            else:
-                current_seq = 0
-        return max_seq
+        _, max_wins, max_losses = run_statistics(data.values)
+        return max_wins if is_win_sequence else max_losses
 
     def calculate_metrics(self, df: pd.DataFrame) -> Dict[str, Any]:
         if df.empty:
             return self._get_empty_metrics()
 
-        df_hash = self._get_dataframe_hash(df)
-        if df_hash in self._metrics_cache:
-            return self._metrics_cache[df_hash]
+        fingerprint = self._get_fingerprint(df)
+        cached = self._metrics_cache.get(fingerprint)
+        if cached is not None:
+            return cached
 
         try:
-            total_ops = len(df)
-            returns = df["net_profit"]
-            wins = returns[returns > 0]
-            losses = returns[returns <= 0]
-            
-            gross_profit = wins.sum()
-            gross_loss = losses.sum()
-            net_profit = gross_profit + gross_loss
-            n_wins = len(wins)
-            n_losses = len(losses)
-            
-            # Costs
-            total_commission = df["commission"].sum()
-            total_swap = df["swap"].sum()
-            total_costs = total_commission + total_swap
-
-            # Profit Factor
-            if abs(gross_loss) < 1e-10:
-                profit_factor = float("inf") if gross_profit > 0 else 1.0
-            else:
-                profit_factor = gross_profit / abs(gross_loss)
-            
-            win_rate = (n_wins / total_ops) * 100 if total_ops > 0 else 0
-            
-            # Drawdown
-            cum_profit = returns.cumsum()
-            max_peak = cum_profit.cummax()
-            drawdown = max_peak - cum_profit
-            max_drawdown = drawdown.max()
-            
-            # Expectancy
-            avg_win = wins.mean() if not wins.empty else 0.0
-            avg_loss = losses.mean() if not losses.empty else 0.0
-            expectancy = ((n_wins/total_ops) * avg_win) + ((n_losses/total_ops) * avg_loss) if total_ops > 0 else 0.0
-            
-            # Sharpe
-            daily_returns = df.groupby(df["time"].dt.date)["net_profit"].sum()
-            sharpe = None
-            if len(daily_returns) >= settings.MIN_DAYS_FOR_SHARPE:
-                std_dev = daily_returns.std()
-                if std_dev > 1e-10:
-                    sharpe = (daily_returns.mean() / std_dev) * np.sqrt(252)
-            
-            recovery_factor = net_profit / max_drawdown if max_drawdown > 1e-10 else 0.0
-            
-            metrics = {
-                "general": {
-                    "net_profit": net_profit,
-                    "gross_profit": gross_profit,
-                    "gross_loss": gross_loss,
-                    "total_costs": total_costs,
-                    "profit_factor": profit_factor,
-                    "win_rate": win_rate,
-                    "total_trades": total_ops,
-                    "total_wins": n_wins,
-                    "total_losses": n_losses,
-                    "avg_win": avg_win,
-                    "avg_loss": avg_loss
-                },
-                "advanced": {
-                    "expectancy": expectancy,
-                    "sharpe_ratio": sharpe,
-                    "recovery_factor": recovery_factor,
-                    "z_score": self._calculate_z_score(returns),
-                    "std_dev": returns.std()
-                },
-                "sequences": {
-                    "max_consecutive_wins": self._max_consecutive(returns, True),
-                    "max_consecutive_losses": self._max_consecutive(returns, False)
-                },
-                "extremes": {
-                    "max_profit": wins.max() if not wins.empty else 0.0,
-                    "max_loss": losses.min() if not losses.empty else 0.0,
-                    "max_drawdown": max_drawdown
-                }
-            }
-            
-            self._metrics_cache[df_hash] = metrics
+            metrics = calculate_metrics(df, settings.MIN_DAYS_FOR_SHARPE)
+            self._metrics_cache.set(fingerprint, metrics)
             return metrics
             
         except Exception as e:
             logger.error(f"Error calculating metrics: {e}")
             return self._get_empty_metrics()
 
+    def calculate_trade_metrics(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Headline metrics with one result per round-trip trade instead of per exit deal."""
+        if df.empty:
+            return self._get_empty_metrics()
+
+        fingerprint = ("trades",) + self._get_fingerprint(df, "position_id")
+        cached = self._metrics_cache.get(fingerprint)
+        if cached is not None:
+            return cached
+
+        try:
+            metrics = calculate_metrics(df.rename(columns={"close_time": "time"}), settings.MIN_DAYS_FOR_SHARPE)
+            self._metrics_cache.set(fingerprint, metrics)
+            return metrics
+
+        except Exception as e:
+            logger.error(f"Error calculating trade metrics: {e}")
+            return self._get_empty_metrics()
+
+    def calculate_grouped_metrics(self, df: pd.DataFrame, group_by: str) -> List[Dict[str, Any]]:
+        """Metrics for every EA, symbol or (EA, symbol) pair of the slice in one pass."""
+        if df.empty:
+            return []
+
+        fingerprint = ("grouped", group_by) + self._get_fingerprint(df)
+        cached = self._metrics_cache.get(fingerprint)
+        if cached is not None:
+            return cached
+
+        try:
+            results = calculate_grouped_metrics(df, group_by, settings.MIN_DAYS_FOR_SHARPE)
+        except Exception as e:
+            logger.error(f"Error calculating grouped metrics: {e}")
+            return []
+
+        self._metrics_cache.set(fingerprint, results)
+        return results
+
+    def calculate_risk(self, df: pd.DataFrame, simulations: int, method: str = "bootstrap",
+                       initial_capital: Optional[float] = None, ruin_pct: float = 50.0,
+                       seed: Optional[int] = None) -> Dict[str, Any]:
+        """Monte Carlo distributions of drawdown, final equity, loss streaks and ruin for the slice."""
+        if df.empty:
+            return empty_risk(method)
+
+        fingerprint = ("risk", simulations, method, initial_capital, ruin_pct, seed) + self._get_fingerprint(df)
+        cached = self._metrics_cache.get(fingerprint)
+        if cached is not None:
+            return cached
+
+        result = monte_carlo(df["net_profit"].to_numpy(dtype=np.float64), simulations, method,
+                             initial_capital, ruin_pct, seed, settings.RISK_WORKERS)
+        self._metrics_cache.set(fingerprint, result)
+        return result
+
+    def calculate_rolling_metrics(self, df: pd.DataFrame, windows: List[int], unit: str = "trades",
+                                  per_ea: bool = True, max_points: int = 500) -> List[Dict[str, Any]]:
+        """Rolling net profit, win rate, profit factor, Sharpe and drawdown per EA and window."""
+        if df.empty:
+            return []
+
+        fingerprint = ("rolling", tuple(windows), unit, per_ea, max_points) + self._get_fingerprint(df)
+        cached = self._metrics_cache.get(fingerprint)
+        if cached is not None:
+            return cached
+
+        try:
+            result = rolling_metrics(df, windows, unit, per_ea, max_points)
+        except Exception as e:
+            logger.error(f"Error calculating rolling metrics: {e}")
+            return []
+
+        self._metrics_cache.set(fingerprint, result)
+        return result
+
+    def calculate_correlation(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Correlation of daily EA results, diversification ratio and drawdown contribution per EA."""
+        if df.empty:
+            return empty_correlation()
+
+        fingerprint = ("correlation",) + self._get_fingerprint(df)
+        cached = self._metrics_cache.get(fingerprint)
+        if cached is not None:
+            return cached
+
+        try:
+            result = correlation_analysis(df)
+        except Exception as e:
+            logger.error(f"Error calculating correlation: {e}")
+            return empty_correlation()
+
+        self._metrics_cache.set(fingerprint, result)
+        return result
+
+    def calculate_filter_search(self, df: pd.DataFrame, objective: str = "net_profit", min_trades: int = 30,
+                                search_symbols: bool = False) -> List[Dict[str, Any]]:
+        """Best weekday/hour (and symbol) filter per EA, searched over a cached cell cube of the slice."""
+        if df.empty:
+            return []
+
+        fingerprint = self._get_fingerprint(df)
+        key = ("filter_search", objective, min_trades, search_symbols) + fingerprint
+        cached = self._metrics_cache.get(key)
+        if cached is not None:
+            return cached
+
+        try:
+            # The cube does not depend on the objective, so other searches of the slice reuse it
+            cube_key = ("filter_cube", search_symbols) + fingerprint
+            cube = self._metrics_cache.get(cube_key)
+            if cube is None:
+                cube = build_cube(df, search_symbols)
+                self._metrics_cache.set(cube_key, cube)
+            result = search_filters(cube, objective, min_trades)
+        except Exception as e:
+            logger.error(f"Error searching filters: {e}")
+            return []
+
+        self._metrics_cache.set(key, result)
+        return result
+
+    def _current_cube(self) -> DealCube:
+        """The aggregate cube, folded forward with the deals stored since its last refresh."""
+        cube = self._cube
+        if cube.version == self.store.version:
+            return cube
+
+        with self._cube_lock:
+            cube = self._cube
+            if cube.version == self.store.version:
+                return cube
+            raw, total, version = self.store.read_deals_snapshot(*cube.position, CUBE_SOURCE_FIELDS)
+            if cube.rows + len(raw) != total:
+                # Deals were stored behind the cube's head (older history backfilled): rebuild
+                cube = DealCube()
+                raw, total, version = self.store.read_deals_snapshot(*cube.position, CUBE_SOURCE_FIELDS)
+            if not raw.empty:
+                cube.fold(normalize_deals(raw))
+                cube.position = (int(raw["time_msc"].iloc[-1]), int(raw["ticket"].iloc[-1]))
+            cube.rows, cube.version = total, version
+            self._cube = cube
+            return cube
+
+    def _cube_select(self, date_from: datetime, date_to: datetime,
+                     assets: Optional[List[str]], ea_ids: Optional[List[str]],
+                     weekdays: Optional[List[int]], hours: Optional[List[int]],
+                     directions: Optional[List[int]]) -> Optional[tuple]:
+        """(cube, keys, cells) of a slice, or None when the cube cannot answer it exactly."""
+        self.sync_history(date_from)
+        try:
+            cube = self._current_cube()
+        except Exception as e:
+            logger.error(f"Error refreshing the deal cube: {e}")
+            return None
+
+        start, end = to_epoch(date_from), to_epoch(date_to)
+        if not cube.covers(start, end):
+            return None
+        return (cube,) + cube.select(start, end, ea_ids, assets, weekdays, hours, directions)
+
+    def _query_directions(self, date_from: datetime, date_to: datetime,
+                          assets: Optional[List[str]], ea_ids: Optional[List[str]],
+                          weekdays: Optional[List[int]], hours: Optional[List[int]],
+                          directions: Optional[List[int]]) -> pd.DataFrame:
+        df = self.query_deals(date_from, date_to, assets, ea_ids, weekdays, hours)
+        if directions and not df.empty:
+            df = df[np.isin(position_directions(df["type"].to_numpy()), directions)]
+        return df
+
+    def calculate_cube_metrics(self, date_from: datetime, date_to: datetime,
+                               assets: Optional[List[str]] = None, ea_ids: Optional[List[str]] = None,
+                               weekdays: Optional[List[int]] = None, hours: Optional[List[int]] = None,
+                               directions: Optional[List[int]] = None,
+                               path_metrics: bool = False) -> Dict[str, Any]:
+        """
+        Metrics of a slice from the aggregate cube, with `source` telling where they came from.
+        Order-dependent metrics (`path_metrics`) and ranges cutting through an hour are
+        computed from the raw deals instead.
+        """
+        selected = None
+        if not path_metrics:
+            selected = self._cube_select(date_from, date_to, assets, ea_ids, weekdays, hours, directions)
+        if selected is None:
+            df = self._query_directions(date_from, date_to, assets, ea_ids, weekdays, hours, directions)
+            return {**self.calculate_metrics(df), "source": "deals"}
+
+        _, keys, cells = selected
+        if len(keys) == 0:
+            return {**self._get_empty_metrics(), "source": "cube"}
+        return {**cube_metrics(keys, cells, settings.MIN_DAYS_FOR_SHARPE)[0], "source": "cube"}
+
+    def calculate_cube_grouped_metrics(self, date_from: datetime, date_to: datetime, group_by: str,
+                                       assets: Optional[List[str]] = None, ea_ids: Optional[List[str]] = None,
+                                       weekdays: Optional[List[int]] = None, hours: Optional[List[int]] = None,
+                                       directions: Optional[List[int]] = None,
+                                       path_metrics: bool = False) -> List[Dict[str, Any]]:
+        """`calculate_cube_metrics` per EA, symbol or (EA, symbol) pair, groups sorted by label."""
+        selected = None
+        if not path_metrics:
+            selected = self._cube_select(date_from, date_to, assets, ea_ids, weekdays, hours, directions)
+        if selected is None:
+            df = self._query_directions(date_from, date_to, assets, ea_ids, weekdays, hours, directions)
+            return self.calculate_grouped_metrics(df, group_by)
+
+        cube, keys, cells = selected
+        if len(keys) == 0:
+            return []
+        groups, labels = cube.group_codes(keys, group_by)
+        metrics = cube_metrics(keys, cells, settings.MIN_DAYS_FOR_SHARPE, groups, len(labels))
+        return [{**label, "metrics": values} for label, values in zip(labels, metrics)]
+
+    def calculate_aggregates(self, df: pd.DataFrame, max_points: int,
+                             year: Optional[int] = None, month: Optional[int] = None) -> Dict[str, Any]:
+        """Chart series (equity, yearly/monthly/daily results, heatmap) for the slice."""
+        if df.empty:
+            return build_aggregates(df, max_points)
+
+        fingerprint = ("aggregates", max_points, year, month) + self._get_fingerprint(df)
+        cached = self._metrics_cache.get(fingerprint)
+        if cached is not None:
+            return cached
+
+        result = build_aggregates(df, max_points, year, month)
+        self._metrics_cache.set(fingerprint, result)
+        return result
+
 mt5_service = MT5Service()
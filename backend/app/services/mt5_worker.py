@@ -0,0 +1,63 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MT5Worker:
+    """
+    Owns the single thread allowed to talk to the MetaTrader5 module.
+
+    The `mt5` C API is not thread-safe, so every call is queued and executed
+    here in order; callers block on (or await) the returned future.
+    """
+
+    def __init__(self, name: str = "mt5-worker"):
+        self.name = name
+        self._queue: "queue.Queue[Optional[Tuple[Future, Callable, tuple, dict]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                logger.error(f"MT5 worker call {getattr(fn, '__name__', fn)} failed: {e}")
+                future.set_exception(e)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Queues `fn` for the worker thread and returns its future."""
+        self.start()
+        future: Future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Runs `fn` on the worker thread and waits for its result (inline if already there)."""
+        if threading.current_thread() is self._thread:
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
@@ -0,0 +1,82 @@
+"""
+Vectorized normalization of raw MT5 deal and position frames.
+
+Shared by the API service and the legacy desktop analyzer, so both derive
+`ea_id`, `net_profit` and SL/TP the same way without row-wise `apply`.
+"""
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from app.services.sl_tp_index import SlTpIndex
+
+MANUAL_EA_ID = "Manual"
+
+# ENTRY_OUT, ENTRY_INOUT, ENTRY_OUT_BY: deals that realize a result
+EXIT_ENTRIES = [1, 2, 3]
+
+
+def build_ea_ids(magic: pd.Series, prefix: str = "EA ") -> pd.Series:
+    """Maps magic numbers to EA ids as a categorical, formatting each distinct magic once."""
+    codes, uniques = pd.factorize(magic, sort=True)
+    labels = [MANUAL_EA_ID if value == 0 else f"{prefix}{int(value)}" for value in uniques]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=labels), index=magic.index)
+
+
+def normalize_deals(
+    df: pd.DataFrame,
+    sl_tp: Optional[Union[SlTpIndex, pd.DataFrame]] = None,
+    ea_prefix: str = "EA ",
+    exits_only: bool = True,
+) -> pd.DataFrame:
+    """
+    Turns raw TradeDeal records into the analysis frame.
+
+    :param df: Raw deals (epoch `time` or already converted).
+    :param sl_tp: SL/TP per position from history orders (an index, or a frame with `position_id`, `sl`, `tp`).
+    :param ea_prefix: Label prefix for non-manual magic numbers.
+    :param exits_only: Keep only deals that close a position.
+    """
+    if df.empty:
+        return df
+
+    if exits_only:
+        df = df[df["entry"].isin(EXIT_ENTRIES)]
+    df = df.reset_index(drop=True)
+
+    if not pd.api.types.is_datetime64_any_dtype(df["time"]):
+        df["time"] = pd.to_datetime(df["time"], unit="s")
+
+    if "price_sl" not in df.columns:
+        df["price_sl"] = None
+    if "price_tp" not in df.columns:
+        df["price_tp"] = None
+
+    if isinstance(sl_tp, pd.DataFrame):
+        sl_tp = SlTpIndex.from_frame(sl_tp)
+    if sl_tp is not None and len(sl_tp):
+        # One hash lookup per deal; values already on the deal are kept where the position has none
+        sl, tp = sl_tp.lookup(df["position_id"].to_numpy())
+        for column, found in (("price_sl", sl), ("price_tp", tp)):
+            current = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+            df[column] = np.where(np.isnan(found), current, found)
+
+    df["net_profit"] = df["profit"] + df["commission"] + df["swap"]
+    df["ea_id"] = build_ea_ids(df["magic"], ea_prefix)
+    return df
+
+
+def normalize_positions(df: pd.DataFrame, ea_prefix: str = "EA ") -> pd.DataFrame:
+    """Fills optional TradePosition fields and derives `ea_id`."""
+    if df.empty:
+        return df
+
+    if "time" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["time"]):
+        df["time"] = pd.to_datetime(df["time"], unit="s")
+    for column in ("sl", "tp", "price_current", "comment"):
+        if column not in df.columns:
+            df[column] = None
+
+    df["ea_id"] = build_ea_ids(df["magic"], ea_prefix)
+    return df
@@ -0,0 +1,91 @@
+"""
+Keyset (cursor) pagination over a deals frame.
+
+Pages are ordered by (sort column, ticket); the cursor carries the last
+(value, ticket) pair seen, so fetching the next page never depends on offsets.
+"""
+import base64
+import json
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.deal_dtypes import float64_values, is_float_category
+
+SORTABLE_COLUMNS = [
+    "time_msc", "ticket", "net_profit", "profit", "volume", "price", "symbol", "ea_id", "magic",
+]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(value: Any, ticket: int) -> str:
+    raw = json.dumps([value, ticket], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, ticket = json.loads(base64.urlsafe_b64decode(padded))
+        return value, int(ticket)
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def sort_keys(df: pd.DataFrame, sort_by: str) -> np.ndarray:
+    """Comparable sort values (strings for categorical/text columns)."""
+    column = df[sort_by]
+    if is_float_category(column):
+        return float64_values(column)
+    if pd.api.types.is_numeric_dtype(column) and not isinstance(column.dtype, pd.CategoricalDtype):
+        return float64_values(column) if column.dtype == np.float32 else column.to_numpy()
+    return column.astype(str).to_numpy(dtype=object)
+
+
+def _check_cursor_value(value: Any, values: np.ndarray) -> None:
+    """Rejects a cursor whose value cannot be compared with the sort column (e.g. reused across `sort_by`)."""
+    if values.dtype == object:
+        valid = isinstance(value, str)
+    else:
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    if not valid:
+        raise InvalidCursor(f"Cursor value {value!r} does not match the sort column")
+
+
+def page_slice(values: np.ndarray, tickets: np.ndarray, descending: bool,
+               cursor: Optional[str], limit: int) -> Tuple[int, int]:
+    """
+    Locates a page by binary search in arrays ordered ascending by (value, ticket).
+    :return: (start, stop) positions of the page, counted in the requested direction.
+    """
+    start = 0
+    if cursor:
+        last_value, last_ticket = decode_cursor(cursor)
+        _check_cursor_value(last_value, values)
+        try:
+            low = int(np.searchsorted(values, last_value, side="left"))
+            high = int(np.searchsorted(values, last_value, side="right"))
+        except TypeError as e:
+            raise InvalidCursor(f"Cursor value {last_value!r} does not match the sort column") from e
+        # Tickets are ascending among the rows sharing the cursor value
+        side = "left" if descending else "right"
+        split = low + int(np.searchsorted(tickets[low:high], last_ticket, side=side))
+        start = len(values) - split if descending else split
+    return start, min(start + limit, len(values))
+
+
+def to_python(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def project(df: pd.DataFrame, fields: Optional[List[str]]) -> pd.DataFrame:
+    if not fields:
+        return df
+    unknown = [f for f in fields if f not in df.columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return df[list(dict.fromkeys(fields))]
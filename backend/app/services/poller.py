@@ -0,0 +1,107 @@
+"""
+Background watcher pushing history and position changes to subscribers.
+
+MT5 is asked only for `history_deals_total` / `positions_total` on every tick;
+deals are read from the store (and MT5 synced) only when those counters move or
+the store head advanced, and only the deals after the last pushed one are sent.
+"""
+import asyncio
+import logging
+from typing import Any, Optional, Set, Tuple
+
+from app.core.config import get_settings
+from app.services.mt5_service import MT5Service, mt5_service
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Event kinds: "deals" (DataFrame of new exit deals), "positions" (list of dicts),
+# "resync" (the subscriber fell behind and must reload)
+Event = Tuple[str, Any]
+
+
+class HistoryPoller:
+    QUEUE_SIZE = 64
+
+    def __init__(self, service: MT5Service, interval: float):
+        self.service = service
+        self.interval = interval
+        self._subscribers: Set["asyncio.Queue[Event]"] = set()
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._cursor: Optional[Tuple[int, int]] = None
+        self._deals_total: Optional[int] = None
+        self._positions_total: Optional[int] = None
+        self._positions_version: Optional[int] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def subscribe(self) -> "asyncio.Queue[Event]":
+        queue: "asyncio.Queue[Event]" = asyncio.Queue(self.QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: "asyncio.Queue[Event]") -> None:
+        self._subscribers.discard(queue)
+        if not self._subscribers:
+            # Nobody is watching: start over from the store head on the next subscriber
+            self._cursor = None
+            self._positions_version = None
+
+    def _broadcast(self, kind: str, payload: Any) -> None:
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait((kind, payload))
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("resync", None))
+
+    async def _run(self) -> None:
+        while True:
+            if self._subscribers:
+                try:
+                    await self.poll()
+                except Exception as e:
+                    logger.error(f"History poller failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def poll(self) -> None:
+        """One change-detection round."""
+        counters = await asyncio.to_thread(self.service.change_counters)
+        if counters is None:
+            return
+        deals_total, positions_total = counters
+
+        state = await asyncio.to_thread(self.service.store.get_state)
+        head = (state["last_time_msc"], state["last_ticket"])
+        if self._cursor is None:
+            self._cursor = head if head[0] is not None else (0, 0)
+            self._deals_total = deals_total
+        elif deals_total != self._deals_total or (head[0] is not None and head != self._cursor):
+            deals, self._cursor = await asyncio.to_thread(self.service.deals_after, *self._cursor)
+            self._deals_total = deals_total
+            if not deals.empty:
+                self._broadcast("deals", deals)
+
+        # Floating P/L moves with every tick, so open positions are re-read while any exist
+        if positions_total != self._positions_total or positions_total:
+            opened_or_closed = positions_total != self._positions_total
+            self._positions_total = positions_total
+            version = await asyncio.to_thread(self.service.positions.refresh, opened_or_closed)
+            if version != self._positions_version:
+                self._positions_version = version
+                self._broadcast("positions", self.service.positions.snapshot())
+
+
+history_poller = HistoryPoller(mt5_service, settings.POLL_INTERVAL_SECONDS)
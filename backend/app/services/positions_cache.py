@@ -0,0 +1,149 @@
+"""
+Versioned snapshot of the open positions.
+
+Every refresh compares the new `positions_get` frame with the previous one
+(vectorized, by ticket) and bumps the version only when something was opened,
+closed or modified, so clients polling with `since_version` receive just that.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.singleflight import SingleFlight
+
+# Derived columns left out of the change detection
+DERIVED_COLUMNS = ["ea_id"]
+
+
+def position_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """JSON-ready records: ISO timestamps and None for missing values."""
+    if df.empty:
+        return []
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def _changed_rows(prev: pd.DataFrame, new: pd.DataFrame) -> np.ndarray:
+    """Row mask of `new` (aligned with `prev` by index) where any compared column differs."""
+    changed = np.zeros(len(new), dtype=bool)
+    for column in new.columns:
+        if column in DERIVED_COLUMNS:
+            continue
+        if column not in prev.columns:
+            return np.ones(len(new), dtype=bool)
+        a = prev[column].to_numpy()
+        b = new[column].to_numpy()
+        if a.dtype.kind == "f" and b.dtype.kind == "f":
+            changed |= (a != b) & ~(np.isnan(a) & np.isnan(b))
+        else:
+            changed |= a != b
+    return changed
+
+
+class PositionsCache:
+    # Closed tickets remembered for diffs; older `since_version` values get a full snapshot
+    MAX_CLOSED = 1000
+
+    def __init__(self, fetch: Callable[[], Optional[pd.DataFrame]], min_interval: float):
+        """
+        :param fetch: Returns the normalized positions frame, or None when MT5 could not be read.
+        :param min_interval: Seconds a snapshot is served before MT5 is asked again.
+        """
+        self._fetch = fetch
+        self.min_interval = min_interval
+        self.version = 0
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._refreshed_at = -float("inf")
+        self._frame = pd.DataFrame()
+        self._opened_at = pd.Series(dtype=np.int64)
+        self._changed_at = pd.Series(dtype=np.int64)
+        self._closed: Dict[int, int] = {}
+        self._oldest = 0
+        self._records: Optional[List[Dict[str, Any]]] = None
+        self._records_version = -1
+
+    def refresh(self, force: bool = False) -> int:
+        """Updates the snapshot unless it is fresher than `min_interval`. Returns its version."""
+        if not force and time.monotonic() - self._refreshed_at < self.min_interval:
+            return self.version
+        version, _ = self._flight.do("positions", self._refresh)
+        return version
+
+    def _refresh(self) -> int:
+        df = self._fetch()
+        if df is None:
+            return self.version
+
+        frame = df.set_index("ticket", drop=False) if not df.empty else self._frame.iloc[0:0]
+        with self._lock:
+            self._refreshed_at = time.monotonic()
+            prev = self._frame
+            opened = frame.index.difference(prev.index)
+            closed = prev.index.difference(frame.index)
+            common = frame.index.intersection(prev.index)
+            modified = common[_changed_rows(prev.loc[common], frame.loc[common])] if len(common) else common
+            if len(opened) == 0 and len(closed) == 0 and len(modified) == 0:
+                return self.version
+
+            version = self.version + 1
+            opened_at = self._opened_at.reindex(frame.index)
+            changed_at = self._changed_at.reindex(frame.index)
+            opened_at.loc[opened] = version
+            changed_at.loc[opened.union(modified)] = version
+
+            for ticket in closed:
+                self._closed[int(ticket)] = version
+            while len(self._closed) > self.MAX_CLOSED:
+                oldest_ticket = next(iter(self._closed))
+                self._oldest = self._closed.pop(oldest_ticket)
+
+            self._frame = frame
+            self._opened_at = opened_at.astype(np.int64)
+            self._changed_at = changed_at.astype(np.int64)
+            self.version = version
+            return version
+
+    def _snapshot_records(self) -> List[Dict[str, Any]]:
+        if self._records is None or self._records_version != self.version:
+            self._records = position_records(self._frame)
+            self._records_version = self.version
+        return self._records
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """All open positions of the current version."""
+        with self._lock:
+            return self._snapshot_records()
+
+    def diff(self, since_version: Optional[int]) -> Dict[str, Any]:
+        """
+        Changes after `since_version`. Without it (or when it is unknown / too old) the whole
+        snapshot is returned in `opened` with `full` set, and clients should replace their state.
+        """
+        with self._lock:
+            version = self.version
+            if since_version is None or since_version < self._oldest or since_version > version:
+                return {"version": version, "full": True, "opened": self._snapshot_records(),
+                        "modified": [], "closed": []}
+            if since_version == version:
+                return {"version": version, "full": False, "opened": [], "modified": [], "closed": []}
+
+            opened_at = self._opened_at.to_numpy()
+            changed_at = self._changed_at.to_numpy()
+            opened = self._frame[opened_at > since_version]
+            modified = self._frame[(opened_at <= since_version) & (changed_at > since_version)]
+            closed = [ticket for ticket, at in self._closed.items() if at > since_version]
+
+        return {
+            "version": version,
+            "full": False,
+            "opened": position_records(opened),
+            "modified": position_records(modified),
+            "closed": closed,
+        }
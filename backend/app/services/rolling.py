@@ -0,0 +1,140 @@
+"""
+Rolling-window versions of the headline metrics, per EA.
+
+A window covers the last N trades or the last N calendar days. Window sums (net result,
+wins, gross profit/loss, sums of squares) are differences of cumulative sums, and the
+equity high inside the window is a sliding max (pandas' monotonic-deque rolling max), so
+every series costs O(n) regardless of the window size.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.services.deal_dtypes import float64_values
+
+
+def _window_sums(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Sum of values[starts[k]..ends[k]] for every k."""
+    cum = np.concatenate(([0.0], np.cumsum(values)))
+    return cum[ends + 1] - cum[starts]
+
+
+def _downsample(n: int, max_points: int) -> np.ndarray:
+    if n <= max_points:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, max_points).round().astype(np.int64))
+
+
+def _points(times: np.ndarray, tickets: np.ndarray, returns: np.ndarray, unit: str) -> Dict[str, np.ndarray]:
+    """Per-point columns of one series: one point per trade, or per calendar day with trades."""
+    is_win = returns > 0
+    columns = {
+        "time": times,
+        "ticket": tickets,
+        "net": returns,
+        "trades": np.ones(len(returns)),
+        "wins": is_win.astype(np.float64),
+        "gross_profit": np.where(is_win, returns, 0.0),
+        "gross_loss": np.where(is_win, 0.0, returns),
+    }
+    if unit != "days":
+        return columns
+
+    daily = pd.DataFrame(columns).groupby(times.astype("datetime64[D]"), sort=True).agg({
+        "ticket": "last", "net": "sum", "trades": "sum", "wins": "sum",
+        "gross_profit": "sum", "gross_loss": "sum",
+    })
+    return {"time": daily.index.to_numpy(), **{name: daily[name].to_numpy() for name in daily.columns}}
+
+
+def _rolling_series(points: Dict[str, np.ndarray], window: int, unit: str, max_points: int) -> List[Dict[str, Any]]:
+    """Window metrics of one series, at up to `max_points` points whose window is fully covered."""
+    returns = points["net"]
+    n = len(returns)
+    equity = np.cumsum(returns)
+    if unit == "days":
+        days = points["time"].astype("datetime64[D]").astype(np.int64)
+        starts = np.searchsorted(days, days - window + 1, side="left")
+        equity_high = pd.Series(equity, index=pd.DatetimeIndex(points["time"])).rolling(f"{window}D").max()
+        full = days - days[0] >= window - 1
+        annualize = np.sqrt(252)
+    else:
+        starts = np.maximum(np.arange(n) - window + 1, 0)
+        equity_high = pd.Series(equity).rolling(window, min_periods=1).max()
+        full = np.arange(n) >= window - 1
+        annualize = 1.0
+
+    at = np.flatnonzero(full)
+    at = at[_downsample(len(at), max_points)]
+    first = starts[at]
+
+    count = (at - first + 1).astype(np.float64)
+    n_trades = _window_sums(points["trades"], first, at)
+    n_wins = _window_sums(points["wins"], first, at)
+    profit = _window_sums(points["gross_profit"], first, at)
+    loss = _window_sums(points["gross_loss"], first, at)
+
+    # Moments around the series mean keep the cumulative-sum variance numerically stable
+    mean = returns.mean()
+    centered = returns - mean
+    s1 = _window_sums(centered, first, at)
+    s2 = _window_sums(centered * centered, first, at)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std = np.sqrt(np.maximum(s2 - s1 * s1 / count, 0.0) / (count - 1))
+        sharpe = np.where((count >= 2) & (std > 1e-10), (s1 / count + mean) / std * annualize, np.nan)
+        win_rate = np.where(n_trades > 0, n_wins / n_trades * 100, np.nan)
+        profit_factor = np.where(np.abs(loss) > 1e-10, profit / np.abs(loss), np.nan)
+    drawdown = equity_high.to_numpy()[at] - equity[at]
+
+    def optional(values: np.ndarray) -> List[Optional[float]]:
+        return [None if v != v else v for v in values.tolist()]
+
+    rows = zip(
+        pd.to_datetime(points["time"][at]).to_pydatetime().tolist(),
+        points["ticket"][at].tolist(),
+        n_trades.astype(np.int64).tolist(),
+        (profit + loss).tolist(),
+        optional(win_rate),
+        optional(profit_factor),
+        optional(sharpe),
+        drawdown.tolist(),
+    )
+    keys = ("time", "ticket", "trades", "net_profit", "win_rate", "profit_factor", "sharpe_ratio", "drawdown")
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def rolling_metrics(df: pd.DataFrame, windows: List[int], unit: str = "trades",
+                    per_ea: bool = True, max_points: int = 500) -> List[Dict[str, Any]]:
+    """
+    One series per (EA, window) with rolling net profit, win rate, profit factor, Sharpe
+    ratio and drawdown from the window's equity high.
+
+    :param df: Exit deals in chronological order.
+    :param unit: "trades" (last N trades, per-trade Sharpe) or "days" (last N calendar
+        days, Sharpe of daily results annualized as in calculate_metrics).
+    :param per_ea: One series per EA; otherwise a single series for the whole slice.
+    :param max_points: Points per series, evenly spaced (the latest is always kept).
+    """
+    if df.empty:
+        return []
+
+    times = df["time"].to_numpy()
+    tickets = df["ticket"].to_numpy()
+    returns = float64_values(df["net_profit"])
+    if per_ea:
+        groups = df.groupby("ea_id", observed=True, sort=True).indices.items()
+    else:
+        groups = [(None, np.arange(len(df)))]
+
+    series = []
+    for ea_id, positions in groups:
+        points = _points(times[positions], tickets[positions], returns[positions], unit)
+        for window in windows:
+            series.append({
+                "ea_id": None if ea_id is None else str(ea_id),
+                "window": window,
+                "unit": unit,
+                "points": _rolling_series(points, window, unit, max_points),
+            })
+    return series
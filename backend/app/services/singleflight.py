@@ -0,0 +1,69 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same work into one execution.
+
+    A caller whose key is covered by an in-flight call (by default: the same key)
+    waits for that call and receives its result instead of running `fn` again.
+    `covers(inflight_key, key)` must be reflexive.
+    """
+
+    def __init__(self, covers: Optional[Callable[[Hashable, Hashable], bool]] = None):
+        self._covers = covers or (lambda inflight_key, key: inflight_key == key)
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executed = 0
+        self.deduplicated = 0
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, Hashable]:
+        """
+        Runs `fn` unless an in-flight call covers `key`.
+        :return: (result, key of the call that produced it)
+        """
+        with self._lock:
+            shared = next(
+                ((k, call) for k, call in self._calls.items() if self._covers(k, key)), None
+            )
+            if shared is not None:
+                self.deduplicated += 1
+            else:
+                leader = self._calls[key] = _Call()
+                self.executed += 1
+
+        if shared is not None:
+            inflight_key, call = shared
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, inflight_key
+
+        try:
+            leader.result = fn(*args, **kwargs)
+        except BaseException as e:
+            leader.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            leader.event.set()
+        return leader.result, key
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "executed": self.executed,
+                "deduplicated": self.deduplicated,
+                "in_flight": len(self._calls),
+            }
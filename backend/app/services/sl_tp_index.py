@@ -0,0 +1,84 @@
+"""
+In-memory position_id -> (sl, tp) lookup used to enrich deals.
+
+Replaces a left `merge` plus two `combine_first` calls (several full copies of the
+deals frame) with one hash lookup per deal through `Index.get_indexer`.
+"""
+import threading
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class SlTpIndex:
+    """
+    Last known SL/TP per position, with the time of the order it came from. Updates swap
+    in new arrays, so lookups never lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Tuple[pd.Index, np.ndarray, np.ndarray, np.ndarray] = (
+            pd.Index([], dtype=np.int64), np.empty(0), np.empty(0), np.empty(0)
+        )
+
+    @classmethod
+    def from_frame(cls, sl_tp: pd.DataFrame) -> "SlTpIndex":
+        """Builds the index from a frame with `position_id`, `sl`, `tp` and optionally `time_msc` columns."""
+        index = cls()
+        index.update(sl_tp)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._state[0])
+
+    def update(self, sl_tp: pd.DataFrame) -> None:
+        """
+        Upserts positions; for a position listed more than once the last row wins. A row
+        older (`time_msc`) than the one already known is ignored; rows without a time always apply.
+        """
+        if sl_tp.empty:
+            return
+
+        sl_tp = sl_tp[~sl_tp["position_id"].duplicated(keep="last")]
+        ids = sl_tp["position_id"].to_numpy(dtype=np.int64)
+        sl = sl_tp["sl"].to_numpy(dtype=np.float64, na_value=np.nan)
+        tp = sl_tp["tp"].to_numpy(dtype=np.float64, na_value=np.nan)
+        if "time_msc" in sl_tp.columns:
+            times = sl_tp["time_msc"].to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            times = np.full(len(ids), np.nan)
+
+        with self._lock:
+            index, old_sl, old_tp, old_times = self._state
+            positions = index.get_indexer(ids)
+            known = positions >= 0
+            # Same rule as the sl_tp table upsert
+            current = old_times[positions[known]]
+            newer = np.isnan(times[known]) | np.isnan(current) | (times[known] >= current)
+            rows, targets = np.flatnonzero(known)[newer], positions[known][newer]
+            new_sl, new_tp, new_times = old_sl.copy(), old_tp.copy(), old_times.copy()
+            new_sl[targets] = sl[rows]
+            new_tp[targets] = tp[rows]
+            new_times[targets] = times[rows]
+            if not known.all():
+                index = index.append(pd.Index(ids[~known]))
+                new_sl = np.concatenate((new_sl, sl[~known]))
+                new_tp = np.concatenate((new_tp, tp[~known]))
+                new_times = np.concatenate((new_times, times[~known]))
+            self._state = (index, new_sl, new_tp, new_times)
+
+    def lookup(self, position_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(sl, tp) arrays aligned with `position_ids`; NaN for unknown positions."""
+        index, sl, tp, _ = self._state
+        positions = index.get_indexer(position_ids)
+        missing = positions < 0
+        if not missing.any():
+            return sl[positions], tp[positions]
+        positions = np.where(missing, 0, positions)
+        found_sl = sl[positions] if len(sl) else np.full(len(positions), np.nan)
+        found_tp = tp[positions] if len(tp) else np.full(len(positions), np.nan)
+        found_sl[missing] = np.nan
+        found_tp[missing] = np.nan
+        return found_sl, found_tp
@@ -0,0 +1,256 @@
+"""
+Several MT5 terminals (one per account) behind a single API.
+
+The MetaTrader5 module binds a process to one terminal, so every configured terminal
+is served by its own worker process (`TerminalProcess`) and its own `MT5Service`, with a
+separate deal store. Pool queries fan out to the accounts in parallel and merge their
+deals with an `account` column, so metrics can be computed per account or across the
+whole portfolio.
+"""
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import get_settings
+from app.services.cache import TTLCache
+from app.services.deal_dtypes import compact_deals, widen_floats
+from app.services.deal_store import DealStore
+from app.services.grouped_metrics import calculate_grouped_metrics
+from app.services.metrics import calculate_metrics, empty_metrics
+from app.services.mt5_service import MT5Service
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def _serve(conn) -> None:
+    """Terminal process loop: runs (fn, args, kwargs) messages until a None arrives."""
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        fn, args, kwargs = message
+        try:
+            reply = (True, fn(*args, **kwargs))
+        except Exception as e:
+            reply = (False, RuntimeError(f"{getattr(fn, '__name__', fn)} failed: {e}"))
+        conn.send(reply)
+
+
+class TerminalProcess:
+    """
+    Drop-in for MT5Worker that runs every call in a dedicated process.
+
+    Calls must be picklable by reference (see `mt5_calls`). The process is spawned on
+    the first call and again after it dies; the service notices the lost terminal
+    through `is_connected` and reconnects.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._conn = None
+
+    def _start(self) -> None:
+        if self._process is not None and self._process.is_alive():
+            return
+        context = multiprocessing.get_context("spawn")
+        self._conn, child = context.Pipe()
+        self._process = context.Process(target=_serve, args=(child,), name=self.name, daemon=True)
+        self._process.start()
+        child.close()
+
+    def start(self) -> None:
+        with self._lock:
+            self._start()
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Runs `fn` in the terminal process and waits for its result."""
+        with self._lock:
+            self._start()
+            try:
+                self._conn.send((fn, args, kwargs))
+                ok, value = self._conn.recv()
+            except (EOFError, OSError) as e:
+                self._process = None
+                raise RuntimeError(f"Terminal process {self.name} exited") from e
+        if not ok:
+            raise value
+        return value
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        with self._lock:
+            process, conn = self._process, self._conn
+            self._process = self._conn = None
+        if process is None:
+            return
+        try:
+            conn.send(None)
+        except OSError:
+            pass
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+        conn.close()
+
+
+def account_store_path(base: str, account: str) -> str:
+    """Deal store file of one account, next to the default store."""
+    root, extension = os.path.splitext(base)
+    return f"{root}.{re.sub(r'[^A-Za-z0-9_.-]', '_', account)}{extension}"
+
+
+class TerminalPool:
+    def __init__(self, terminals: Dict[str, Optional[str]], store_path: str):
+        """
+        :param terminals: Account name -> terminal path (None for the default terminal).
+        :param store_path: Base deal store path; each account gets its own file.
+        """
+        self.services: Dict[str, MT5Service] = {
+            account: MT5Service(
+                store=DealStore(account_store_path(store_path, account)),
+                worker=TerminalProcess(f"mt5-{account}"),
+                terminal_path=path,
+            )
+            for account, path in terminals.items()
+        }
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._query_cache = TTLCache(settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL_SECONDS,
+                                     max_bytes=settings.QUERY_CACHE_MAX_BYTES)
+        self._metrics_cache = TTLCache(settings.METRICS_CACHE_SIZE,
+                                       max_bytes=settings.METRICS_CACHE_MAX_BYTES)
+
+    @property
+    def accounts(self) -> List[str]:
+        return list(self.services)
+
+    def _fan_out(self, fn: Callable[[MT5Service], Any], accounts: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Runs `fn(service)` for every selected account at once; results keep the account order."""
+        selected = [account for account in self.services if not accounts or account in accounts]
+        if not selected:
+            return {}
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=len(self.services), thread_name_prefix="terminal-pool")
+        futures = {account: self._executor.submit(fn, self.services[account]) for account in selected}
+        return {account: future.result() for account, future in futures.items()}
+
+    def status(self) -> List[Dict[str, Any]]:
+        infos = self._fan_out(lambda service: service.get_terminal_info())
+        return [
+            {"account": account, "connected": info is not None, "terminal_info": info}
+            for account, info in infos.items()
+        ]
+
+    def query_deals(self, date_from: datetime, date_to: datetime,
+                    accounts: Optional[List[str]] = None,
+                    assets: Optional[List[str]] = None,
+                    ea_ids: Optional[List[str]] = None,
+                    weekdays: Optional[List[int]] = None,
+                    hours: Optional[List[int]] = None) -> pd.DataFrame:
+        """
+        Filtered exit deals of the selected accounts (all by default), synced and read in
+        parallel, merged in time order with an `account` column.
+        """
+        results = self._fan_out(
+            lambda service: service.query_deals_keyed(date_from, date_to, assets, ea_ids, weekdays, hours),
+            accounts,
+        )
+        # Each account's key carries the normalized filters and the store version its frame
+        # was read under, so a sync racing the fan-out can't file new deals under an old key
+        key = tuple((account, account_key) for account, (account_key, _) in results.items())
+        cached = self._query_cache.get(key)
+        if cached is not None:
+            return cached
+
+        merged = self._merge({account: df for account, (_, df) in results.items()})
+        self._query_cache.set(key, merged)
+        return merged
+
+    @staticmethod
+    def _merge(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        parts = [
+            # Widened first: concatenating float32 with float64 columns would keep float32 noise
+            widen_floats(df).assign(account=account)
+            for account, df in frames.items() if not df.empty
+        ]
+        if not parts:
+            return pd.DataFrame()
+
+        merged = pd.concat(parts, ignore_index=True)
+        merged = merged.sort_values(["time_msc", "ticket"], kind="stable", ignore_index=True)
+        # Categories differ between accounts, so the merged frame is compacted again
+        merged = compact_deals(merged)
+        merged["account"] = merged["account"].astype("category")
+        return merged
+
+    def _fingerprint(self, df: pd.DataFrame) -> tuple:
+        """Identity of a merged slice: store versions plus ticket checksums salted by account."""
+        tickets = df["ticket"].to_numpy(dtype=np.int64)
+        accounts = df["account"].cat.codes.to_numpy().astype(np.int64)
+        mixed = np.bitwise_xor.reduce((tickets * np.int64(0x9E3779B1)) ^ (accounts << np.int64(48)))
+        versions = tuple(service.store.version for service in self.services.values())
+        return versions + (len(tickets), int(tickets.sum()), int(accounts.sum()), int(mixed))
+
+    def calculate_metrics(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """Metrics of the merged equity curve across the selected accounts."""
+        if df.empty:
+            return empty_metrics()
+
+        fingerprint = ("portfolio",) + self._fingerprint(df)
+        cached = self._metrics_cache.get(fingerprint)
+        if cached is not None:
+            return cached
+
+        try:
+            metrics = calculate_metrics(df, settings.MIN_DAYS_FOR_SHARPE)
+        except Exception as e:
+            logger.error(f"Error calculating portfolio metrics: {e}")
+            return empty_metrics()
+
+        self._metrics_cache.set(fingerprint, metrics)
+        return metrics
+
+    def calculate_grouped_metrics(self, df: pd.DataFrame, group_by: str) -> List[Dict[str, Any]]:
+        """Metrics per account (or per account and EA, EA or symbol across accounts)."""
+        if df.empty:
+            return []
+
+        fingerprint = ("portfolio_grouped", group_by) + self._fingerprint(df)
+        cached = self._metrics_cache.get(fingerprint)
+        if cached is not None:
+            return cached
+
+        try:
+            results = calculate_grouped_metrics(df, group_by, settings.MIN_DAYS_FOR_SHARPE)
+        except Exception as e:
+            logger.error(f"Error calculating portfolio grouped metrics: {e}")
+            return []
+
+        self._metrics_cache.set(fingerprint, results)
+        return results
+
+    def shutdown(self) -> None:
+        """Closes every terminal and stops its process."""
+        for service in self.services.values():
+            service.shutdown()
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+terminal_pool = TerminalPool(settings.MT5_TERMINALS, settings.DEAL_STORE_PATH)
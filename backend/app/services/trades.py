@@ -0,0 +1,235 @@
+"""
+Position-level round trips rebuilt from raw deals.
+
+Exit deals alone split a position closed in parts into several "trades" and lose the
+holding time. Here every deal of a position (IN and OUT) is folded into one row with a
+single grouped aggregation on `position_id`: entry/exit times, volume-weighted entry and
+exit prices, summed results and the number of partial exits.
+
+MAE/MFE (maximum adverse/favorable excursion, in price units) come from OHLC bars: the
+low/high extremes of the bars spanning each trade, found for all trades of a symbol at
+once with `reduceat` over searchsorted bar ranges.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.normalization import EXIT_ENTRIES, build_ea_ids
+
+# Columns of the stored trade table, in order
+TRADE_COLUMNS: Dict[str, str] = {
+    "position_id": "INTEGER PRIMARY KEY",
+    "symbol": "TEXT",
+    "magic": "INTEGER",
+    "type": "INTEGER",
+    "open_time": "INTEGER",
+    "close_time": "INTEGER",
+    "close_time_msc": "INTEGER",
+    "volume": "REAL",
+    "open_price": "REAL",
+    "close_price": "REAL",
+    "profit": "REAL",
+    "commission": "REAL",
+    "swap": "REAL",
+    "fee": "REAL",
+    "net_profit": "REAL",
+    "deals": "INTEGER",
+    "exits": "INTEGER",
+    "closed": "INTEGER",
+    "mae": "REAL",
+    "mfe": "REAL",
+    "excursion_bars": "INTEGER",
+}
+
+# Raw deal fields a trade row is built from
+TRADE_SOURCE_FIELDS = (
+    "ticket", "position_id", "symbol", "magic", "type", "entry", "time", "time_msc",
+    "volume", "price", "profit", "commission", "swap", "fee",
+)
+
+_TIMEFRAME_UNITS = {"M": 60, "H": 3600, "D": 86400}
+
+# Exit volume short of the entry volume by more than this leaves the position open
+_VOLUME_TOLERANCE = 1e-8
+
+
+def timeframe_seconds(timeframe: str) -> int:
+    """Bar length of an MT5 timeframe name such as "M1", "M15", "H1" or "D1"."""
+    unit, count = timeframe[:1].upper(), timeframe[1:]
+    if unit not in _TIMEFRAME_UNITS or not count.isdigit():
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return _TIMEFRAME_UNITS[unit] * int(count)
+
+
+def build_trades(raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per position from its raw deals (epoch `time`, every entry type, oldest first;
+    only TRADE_SOURCE_FIELDS are used).
+
+    Positions whose opening deal predates the store keep a null `open_time`/`open_price`.
+    A netting reversal (ENTRY_INOUT) is counted as an exit of the same position.
+    """
+    if raw.empty:
+        return pd.DataFrame(columns=list(TRADE_COLUMNS))
+
+    entry = raw["entry"].to_numpy()
+    is_in = entry == 0
+    is_out = np.isin(entry, EXIT_ENTRIES)
+    volume = raw["volume"].to_numpy(dtype=np.float64)
+    price = raw["price"].to_numpy(dtype=np.float64)
+    time = raw["time"].to_numpy(dtype=np.float64)
+
+    parts = pd.DataFrame({
+        "position_id": raw["position_id"].to_numpy(),
+        "symbol": raw["symbol"].to_numpy(),
+        "magic": raw["magic"].to_numpy(),
+        "in_type": np.where(is_in, raw["type"].to_numpy(dtype=np.float64), np.nan),
+        "out_type": np.where(is_out, raw["type"].to_numpy(dtype=np.float64), np.nan),
+        "open_time": np.where(is_in, time, np.nan),
+        "close_time": np.where(is_out, time, np.nan),
+        "close_time_msc": np.where(is_out, raw["time_msc"].to_numpy(dtype=np.float64), np.nan),
+        "in_volume": np.where(is_in, volume, 0.0),
+        "in_value": np.where(is_in, volume * price, 0.0),
+        "out_volume": np.where(is_out, volume, 0.0),
+        "out_value": np.where(is_out, volume * price, 0.0),
+        "profit": raw["profit"].to_numpy(dtype=np.float64),
+        "commission": raw["commission"].to_numpy(dtype=np.float64),
+        "swap": raw["swap"].to_numpy(dtype=np.float64),
+        "fee": raw["fee"].to_numpy(dtype=np.float64),
+        "deals": 1,
+        "exits": is_out.astype(np.int64),
+    })
+
+    grouped = parts.groupby("position_id", sort=True).agg(
+        symbol=("symbol", "first"),
+        magic=("magic", "first"),
+        in_type=("in_type", "first"),
+        out_type=("out_type", "first"),
+        open_time=("open_time", "min"),
+        close_time=("close_time", "max"),
+        close_time_msc=("close_time_msc", "max"),
+        in_volume=("in_volume", "sum"),
+        in_value=("in_value", "sum"),
+        out_volume=("out_volume", "sum"),
+        out_value=("out_value", "sum"),
+        profit=("profit", "sum"),
+        commission=("commission", "sum"),
+        swap=("swap", "sum"),
+        fee=("fee", "sum"),
+        deals=("deals", "sum"),
+        exits=("exits", "sum"),
+    )
+
+    in_volume = grouped["in_volume"].to_numpy()
+    out_volume = grouped["out_volume"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        open_price = np.where(in_volume > 0, grouped["in_value"].to_numpy() / in_volume, np.nan)
+        close_price = np.where(out_volume > 0, grouped["out_value"].to_numpy() / out_volume, np.nan)
+
+    # Direction of the opening deal; without one, the opposite of the first exit
+    direction = grouped["in_type"].fillna(1 - grouped["out_type"]).to_numpy()
+
+    trades = pd.DataFrame({
+        "position_id": grouped.index.to_numpy(dtype=np.int64),
+        "symbol": grouped["symbol"].to_numpy(),
+        "magic": grouped["magic"].to_numpy(dtype=np.int64),
+        "type": direction,
+        "open_time": grouped["open_time"].to_numpy(),
+        "close_time": grouped["close_time"].to_numpy(),
+        "close_time_msc": grouped["close_time_msc"].to_numpy(),
+        "volume": np.where(in_volume > 0, in_volume, out_volume),
+        "open_price": open_price,
+        "close_price": close_price,
+        "profit": grouped["profit"].to_numpy(),
+        "commission": grouped["commission"].to_numpy(),
+        "swap": grouped["swap"].to_numpy(),
+        "fee": grouped["fee"].to_numpy(),
+        # Same definition as the deals frame (fees are reported apart)
+        "net_profit": (grouped["profit"] + grouped["commission"] + grouped["swap"]).to_numpy(),
+        "deals": grouped["deals"].to_numpy(dtype=np.int64),
+        "exits": grouped["exits"].to_numpy(dtype=np.int64),
+        "closed": ((out_volume > 0) & (out_volume >= in_volume - _VOLUME_TOLERANCE)).astype(np.int64),
+        "mae": np.nan,
+        "mfe": np.nan,
+        "excursion_bars": np.nan,
+    })
+    return trades
+
+
+def normalize_trades(trades: pd.DataFrame, ea_prefix: str = "EA ") -> pd.DataFrame:
+    """Stored trade rows as the analysis frame: datetimes, holding time and `ea_id`."""
+    if trades.empty:
+        return trades
+
+    trades = trades.drop(columns=["closed"]).reset_index(drop=True)
+    trades["type"] = trades["type"].astype(np.int64)
+    trades["holding_seconds"] = trades["close_time"] - trades["open_time"]
+    trades["open_time"] = pd.to_datetime(trades["open_time"], unit="s")
+    trades["close_time"] = pd.to_datetime(trades["close_time"], unit="s")
+    trades["ea_id"] = build_ea_ids(trades["magic"], ea_prefix)
+    return trades
+
+
+def fetch_windows(open_times: np.ndarray, close_times: np.ndarray, bar_seconds: int,
+                  chunk_seconds: int) -> List[Tuple[int, int]]:
+    """
+    Bar request windows of at most `chunk_seconds` covering every [open, close] interval
+    of one symbol. Windows bridge the gaps between trades, so the number of requests grows
+    with the time span traded rather than with the number of trades.
+    """
+    if len(open_times) == 0:
+        return []
+
+    order = np.argsort(open_times, kind="stable")
+    starts = open_times[order] - open_times[order] % bar_seconds
+    # Latest exit among the trades opened so far
+    reach = np.maximum.accumulate(close_times[order])
+
+    windows = []
+    position = int(starts[0])
+    while True:
+        opened = np.searchsorted(starts, position + chunk_seconds, side="right")
+        needed = int(reach[opened - 1])
+        window_to = min(position + chunk_seconds, needed)
+        windows.append((position, window_to))
+        if needed > window_to:
+            position = window_to
+        elif opened < len(starts):
+            position = int(starts[opened])
+        else:
+            return windows
+
+
+def excursions(types: np.ndarray, open_times: np.ndarray, close_times: np.ndarray,
+               open_prices: np.ndarray, bar_times: np.ndarray, highs: np.ndarray,
+               lows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    MAE, MFE (price distance from the entry, never negative) and bar count per trade.
+
+    :param bar_times: Sorted bar open times (epoch seconds) of the trades' symbol.
+    The bars containing the entry and the exit are included whole, so excursions are
+    measured at bar resolution. Trades without bars get NaN and a count of 0.
+    """
+    n = len(types)
+    if n == 0 or len(bar_times) == 0:
+        return np.full(n, np.nan), np.full(n, np.nan), np.zeros(n, dtype=np.int64)
+
+    first = np.maximum(np.searchsorted(bar_times, open_times, side="right") - 1, 0)
+    stop = np.searchsorted(bar_times, close_times, side="right")
+    bars = np.maximum(stop - first, 0)
+    has_bars = bars > 0
+
+    # reduceat over interleaved (first, stop) pairs; the trailing sentinel lets stop == len
+    bounds = np.empty(2 * n, dtype=np.int64)
+    bounds[0::2] = first
+    bounds[1::2] = np.maximum(stop, first + 1)
+    highest = np.maximum.reduceat(np.append(highs, -np.inf), bounds)[0::2]
+    lowest = np.minimum.reduceat(np.append(lows, np.inf), bounds)[0::2]
+
+    is_buy = types == 0
+    up = np.maximum(highest - open_prices, 0.0)
+    down = np.maximum(open_prices - lowest, 0.0)
+    mae = np.where(has_bars, np.where(is_buy, down, up), np.nan)
+    mfe = np.where(has_bars, np.where(is_buy, up, down), np.nan)
+    return mae, mfe, bars
@@ -0,0 +1,90 @@
+"""
+Peak memory of one history_deals_get for the whole range vs. monthly windows.
+
+MT5 is replaced by a synthetic terminal that builds fresh TradeDeal namedtuples
+for every call, as the real API does. Run from `backend/`:
+python -m benchmarks.bench_chunked_fetch
+"""
+import gc
+import time
+import tracemalloc
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.history_chunks import records_frame, split_range
+from benchmarks.synthetic import make_raw_deals
+
+CHUNK_SECONDS = 31 * 24 * 3600
+
+
+class SyntheticTerminal:
+    def __init__(self, raw: pd.DataFrame):
+        self.TradeDeal = namedtuple("TradeDeal", list(raw.columns))
+        self.times = raw["time"].to_numpy()
+        self.columns = [raw[c].to_numpy() for c in raw.columns]
+
+    def history_deals_get(self, start: int, end: int) -> tuple:
+        lo = np.searchsorted(self.times, start, side="left")
+        hi = np.searchsorted(self.times, end, side="right")
+        columns = [c[lo:hi].tolist() for c in self.columns]
+        return tuple(self.TradeDeal(*row) for row in zip(*columns))
+
+
+def single_fetch(terminal: SyntheticTerminal, start: int, end: int) -> pd.DataFrame:
+    """The previous path: the whole range at once, plus a list copy of the tuples."""
+    deals = terminal.history_deals_get(start, end)
+    return pd.DataFrame(list(deals), columns=deals[0]._asdict().keys())
+
+
+def chunked_fetch(terminal: SyntheticTerminal, start: int, end: int) -> pd.DataFrame:
+    """Monthly windows converted right away, then concatenated (desktop analyzer)."""
+    frames = [records_frame(terminal.history_deals_get(a, b)) for a, b in split_range(start, end, CHUNK_SECONDS)]
+    return pd.concat(frames, ignore_index=True).drop_duplicates("ticket")
+
+
+def chunked_stream(terminal: SyntheticTerminal, start: int, end: int) -> int:
+    """
+    Monthly windows consumed one at a time (the API writes each one to the deal store).
+    :return: Rows fetched, counting deals on a shared window boundary twice.
+    """
+    rows = 0
+    for a, b in split_range(start, end, CHUNK_SECONDS):
+        rows += len(records_frame(terminal.history_deals_get(a, b)))
+    return rows
+
+
+def measure(fn, *args):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak, elapsed
+
+
+def main() -> None:
+    for n in (200_000, 1_000_000):
+        raw = make_raw_deals(n)
+        terminal = SyntheticTerminal(raw)
+        start, end = int(raw["time"].iloc[0]), int(raw["time"].iloc[-1])
+        years = (end - start) / (365 * 24 * 3600)
+
+        single, peak_single, t_single = measure(single_fetch, terminal, start, end)
+        chunked, peak_chunked, t_chunked = measure(chunked_fetch, terminal, start, end)
+        rows, peak_stream, t_stream = measure(chunked_stream, terminal, start, end)
+        assert len(single) == len(chunked) == n and rows >= n
+        assert single.reset_index(drop=True).equals(chunked.reset_index(drop=True))
+
+        print(f"{n:>9,} deals over {years:.1f} years")
+        for label, peak, elapsed in (("single window", peak_single, t_single),
+                                     ("monthly + concat", peak_chunked, t_chunked),
+                                     ("monthly streamed", peak_stream, t_stream)):
+            print(f"  {label:<17} peak {peak / 2**20:8.1f} MiB | {elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    main()
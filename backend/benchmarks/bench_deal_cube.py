@@ -0,0 +1,62 @@
+"""
+Aggregate cube: build, incremental fold of a sync and slice queries against the
+filter + batch metrics path they replace.
+
+Run from `backend/`: python -m benchmarks.bench_deal_cube
+"""
+import time
+
+import numpy as np
+
+from app.services.deal_cube import DealCube, cube_metrics
+from app.services.deal_dtypes import compact_deals
+from app.services.metrics import calculate_metrics
+from app.services.normalization import normalize_deals
+from benchmarks.synthetic import make_raw_deals
+
+MIN_DAYS_FOR_SHARPE = 30
+QUERIES = 20
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main() -> None:
+    rng = np.random.default_rng(7)
+    for n in (100_000, 1_000_000):
+        df = compact_deals(normalize_deals(make_raw_deals(n)))
+        head, tail = df.iloc[: len(df) - len(df) // 100], df.iloc[len(df) - len(df) // 100:]
+
+        cube, t_build = timed(DealCube().fold, head)
+        _, t_fold = timed(cube.fold, tail)
+
+        seconds = df["time"].to_numpy().astype("datetime64[s]").astype(np.int64)
+        ea_ids = list(df["ea_id"].cat.categories)
+        t_cube = t_batch = 0.0
+        for _ in range(QUERIES):
+            start = int(rng.integers(seconds[0], seconds[-1])) // 3600 * 3600
+            end = seconds[-1]
+            picked = [str(ea) for ea in rng.choice(ea_ids, 5, replace=False)]
+            weekdays = [0, 1, 2, 3, 4]
+
+            started = time.perf_counter()
+            keys, cells = cube.select(start, end, picked, None, weekdays)
+            cube_metrics(keys, cells, MIN_DAYS_FOR_SHARPE)
+            t_cube += time.perf_counter() - started
+
+            started = time.perf_counter()
+            mask = (seconds >= start) & df["ea_id"].isin(picked).to_numpy()
+            mask &= df["time"].dt.dayofweek.isin(weekdays).to_numpy()
+            calculate_metrics(df[mask], MIN_DAYS_FOR_SHARPE)
+            t_batch += time.perf_counter() - started
+
+        print(f"{len(df):>9,} exit deals -> {len(cube):>7,} cells | build {t_build * 1000:7.1f} ms | "
+              f"fold 1% {t_fold * 1000:5.1f} ms | slice: cube {t_cube / QUERIES * 1000:5.2f} ms, "
+              f"filter + metrics {t_batch / QUERIES * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Resident memory of the deals frame before and after the dtype plan.
+
+`text as object` is the frame as pandas < 3 builds it (every string a Python object);
+pandas 3 stores text in Arrow-backed columns by default. Run from `backend/`:
+python -m benchmarks.bench_deal_dtypes
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.deal_dtypes import compact_deals, float64_values, is_float_category, widen_floats
+from app.services.metrics import calculate_metrics
+from app.services.normalization import normalize_deals
+from benchmarks.synthetic import make_raw_deals, make_sl_tp
+
+TEXT_COLUMNS = ["symbol", "comment", "external_id"]
+
+
+def resident_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def main() -> None:
+    for n in (200_000, 2_000_000):
+        raw = make_raw_deals(n)
+        df = normalize_deals(raw, make_sl_tp(raw))
+        as_object = df.astype({name: object for name in TEXT_COLUMNS})
+
+        started = time.perf_counter()
+        compact = compact_deals(df)
+        elapsed = time.perf_counter() - started
+
+        # Lossless: every narrowed column widens back to the original values
+        restored = widen_floats(compact)
+        for name in df.columns:
+            if compact[name].dtype == np.float32 or is_float_category(compact[name]):
+                assert np.array_equal(restored[name].to_numpy(), float64_values(df[name]), equal_nan=True), name
+            else:
+                assert (compact[name].astype(str).to_numpy() == df[name].astype(str).to_numpy()).all(), name
+        assert calculate_metrics(compact, 30) == calculate_metrics(df, 30)
+
+        after = resident_bytes(compact)
+        print(f"{len(df):>9,} exit deals | compact: {after / 2**20:7.1f} MiB in {elapsed * 1000:6.1f} ms")
+        for label, frame in (("text as object", as_object), ("text as arrow", df)):
+            before = resident_bytes(frame)
+            print(f"  {label:<15} {before / 2**20:7.1f} MiB -> {before / after:4.1f}x smaller")
+
+    print("\nper column (last run):")
+    before, after = df.memory_usage(deep=True, index=False), compact.memory_usage(deep=True, index=False)
+    for name in df.columns:
+        print(f"  {name:<12} {str(df[name].dtype):<15} -> {str(compact[name].dtype):<9} "
+              f"{before[name] / len(df):6.1f} -> {after[name] / len(df):5.1f} B/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Filter search: one cell cube per slice, then every candidate of an EA scored at once.
+
+Run from `backend/`: python -m benchmarks.bench_filter_search
+"""
+import time
+
+from app.services.deal_dtypes import compact_deals
+from app.services.filter_search import build_cube, search_filters
+from app.services.normalization import normalize_deals
+from benchmarks.synthetic import make_raw_deals
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main() -> None:
+    for n in (100_000, 1_000_000):
+        df = compact_deals(normalize_deals(make_raw_deals(n)))
+        for by_symbol in (False, True):
+            cube, t_cube = timed(build_cube, df, by_symbol)
+            results, t_search = timed(search_filters, cube, "profit_factor", 30)
+            candidates = sum(result["candidates"] for result in results)
+            print(f"{len(df):>9,} exit deals, {len(results)} EAs, symbols {'on ' if by_symbol else 'off'} | "
+                  f"cube {t_cube * 1000:6.1f} ms | search {t_search * 1000:7.1f} ms "
+                  f"over {candidates:,} candidates")
+
+
+if __name__ == "__main__":
+    main()
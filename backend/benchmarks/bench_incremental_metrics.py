@@ -0,0 +1,60 @@
+"""
+Full metrics recompute vs. folding the newly appended deals into accumulators.
+
+Run from `backend/`: python -m benchmarks.bench_incremental_metrics
+"""
+import math
+import time
+
+from app.services.incremental_metrics import MetricsAccumulator, SliceMetrics
+from app.services.metrics import calculate_metrics
+from app.services.normalization import normalize_deals
+from benchmarks.synthetic import make_raw_deals, make_sl_tp
+
+MIN_DAYS_FOR_SHARPE = 30
+
+
+def assert_close(expected, result, path="metrics") -> None:
+    if isinstance(expected, dict):
+        for key in expected:
+            assert_close(expected[key], result[key], f"{path}.{key}")
+    elif expected is None or result is None:
+        assert expected is None and result is None, (path, expected, result)
+    else:
+        a, b = float(expected), float(result)
+        assert (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9), (path, a, b)
+
+
+def main() -> None:
+    # 2M raw rows -> 1M exit deals
+    raw = make_raw_deals(2_000_000)
+    df = normalize_deals(raw, make_sl_tp(raw))
+    print(f"{len(df):,} exit deals")
+
+    for k in (1, 10, 100, 1_000):
+        history, appended = df.iloc[:-k], df.iloc[-k:]
+        total = MetricsAccumulator(MIN_DAYS_FOR_SHARPE).fold(history)
+        slices = SliceMetrics(MIN_DAYS_FOR_SHARPE)
+        slices.fold(history)
+
+        start = time.perf_counter()
+        expected = calculate_metrics(df, MIN_DAYS_FOR_SHARPE)
+        t_full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = total.fold(appended).snapshot()
+        t_fold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        touched = slices.fold(appended)
+        slices.snapshot(touched)
+        t_slices = time.perf_counter() - start
+
+        assert_close(expected, result)
+        print(f"{k:>6,} new deals | full recompute: {t_full * 1000:8.1f} ms | "
+              f"fold: {t_fold * 1000:6.2f} ms ({t_full / t_fold:6.0f}x) | "
+              f"fold per (EA, symbol): {t_slices * 1000:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Row-wise `apply` normalization vs. the shared vectorized stage.
+
+Run from `backend/`: python -m benchmarks.bench_normalization
+"""
+import time
+
+import pandas as pd
+
+from app.services.normalization import normalize_deals
+from benchmarks.synthetic import make_raw_deals, make_sl_tp
+
+
+def legacy_normalize(df: pd.DataFrame, sl_tp: pd.DataFrame) -> pd.DataFrame:
+    """The pre-vectorization path of MT5Service.fetch_deals."""
+    df = df.copy()
+    df["time"] = pd.to_datetime(df["time"], unit="s")
+    df["price_sl"] = None
+    df["price_tp"] = None
+    df = df.merge(sl_tp, on="position_id", how="left")
+    df["price_sl"] = df["sl"].combine_first(df["price_sl"])
+    df["price_tp"] = df["tp"].combine_first(df["price_tp"])
+    df = df.drop(columns=["sl", "tp"])
+    df = df[df["entry"].isin([1, 2, 3])].copy()
+    df["net_profit"] = df["profit"] + df["commission"] + df["swap"]
+
+    def create_ea_id(row):
+        if row["magic"] == 0:
+            return "Manual"
+        return f"EA {int(row['magic'])}"
+
+    df["ea_id"] = df.apply(create_ea_id, axis=1)
+    return df
+
+
+def timed(fn, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    for n in (10_000, 100_000, 1_000_000):
+        raw = make_raw_deals(n)
+        sl_tp = make_sl_tp(raw)
+
+        legacy = legacy_normalize(raw, sl_tp)
+        vectorized = normalize_deals(raw, sl_tp)
+        assert legacy["ea_id"].tolist() == vectorized["ea_id"].astype(str).tolist()
+        assert (legacy["net_profit"].values == vectorized["net_profit"].values).all()
+
+        t_legacy = timed(legacy_normalize, raw, sl_tp, repeat=1)
+        t_vector = timed(normalize_deals, raw, sl_tp)
+        print(f"{n:>9,} raw deals | apply: {t_legacy * 1000:9.1f} ms | "
+              f"vectorized: {t_vector * 1000:7.1f} ms | speedup: {t_legacy / t_vector:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
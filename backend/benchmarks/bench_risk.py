@@ -0,0 +1,36 @@
+"""
+Monte Carlo risk engine: 10,000 resamples of 5,000 trades.
+
+Run from `backend/`: python -m benchmarks.bench_risk [workers]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.services import risk
+
+
+def main() -> None:
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    returns = np.round(np.random.default_rng(42).normal(5, 50, 5_000), 2)
+    kernel = "numba" if risk._scan_jit is not None else "numpy"
+    print(f"{len(returns):,} trades | path kernel: {kernel} | cpus: {os.cpu_count()}")
+
+    try:
+        # Warm-up: process start-up and JIT compilation are one-off costs
+        risk.monte_carlo(returns, 1_000, seed=0, workers=workers)
+        for method in ("bootstrap", "shuffle"):
+            for n_workers in sorted({0, workers}):
+                started = time.perf_counter()
+                result = risk.monte_carlo(returns, 10_000, method, 10_000.0, seed=1, workers=n_workers)
+                elapsed = time.perf_counter() - started
+                p50 = result["max_drawdown"]["percentiles"]["p50"]
+                print(f"  {method:<9} workers={n_workers:<2} {elapsed * 1000:7.0f} ms | median max drawdown {p50:,.2f}")
+    finally:
+        risk.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Rolling metrics cost vs. window size: cumulative sums + sliding max keep it O(n).
+
+Run from `backend/`: python -m benchmarks.bench_rolling
+"""
+import time
+
+from app.services.deal_dtypes import compact_deals
+from app.services.normalization import normalize_deals
+from app.services.rolling import rolling_metrics
+from benchmarks.synthetic import make_raw_deals
+
+
+def main() -> None:
+    df = compact_deals(normalize_deals(make_raw_deals(2_000_000)))
+    n_eas = df["ea_id"].nunique()
+    print(f"{len(df):,} exit deals, {n_eas} EAs")
+    for unit, windows in (("trades", ([20], [200], [2000], [20, 200, 2000])), ("days", ([7], [90], [7, 30, 90]))):
+        for sizes in windows:
+            started = time.perf_counter()
+            series = rolling_metrics(df, sizes, unit)
+            elapsed = time.perf_counter() - started
+            print(f"  {unit:<6} windows {str(sizes):<16} {len(series):>4} series in {elapsed * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
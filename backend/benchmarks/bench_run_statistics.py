@@ -0,0 +1,60 @@
+"""
+Python-loop run statistics vs. the single-pass kernel.
+
+Run from `backend/`: python -m benchmarks.bench_run_statistics
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.kernels import run_statistics
+
+
+def legacy_runs(data: pd.Series) -> int:
+    wins_bin = (data > 0).astype(int).values
+    num_runs = 1
+    for i in range(1, len(wins_bin)):
+        if wins_bin[i] != wins_bin[i - 1]:
+            num_runs += 1
+    return num_runs
+
+
+def legacy_max_consecutive(data: pd.Series, is_win_sequence: bool) -> int:
+    max_seq = 0
+    current_seq = 0
+    for val in data:
+        is_win = val > 0
+        if is_win == is_win_sequence:
+            current_seq += 1
+            max_seq = max(max_seq, current_seq)
+        else:
+            current_seq = 0
+    return max_seq
+
+
+def legacy(data: pd.Series):
+    return legacy_runs(data), legacy_max_consecutive(data, True), legacy_max_consecutive(data, False)
+
+
+def main() -> None:
+    rng = np.random.default_rng(7)
+    for n in (10_000, 100_000, 1_000_000):
+        returns = pd.Series(np.round(rng.normal(2, 50, size=n), 2))
+
+        start = time.perf_counter()
+        expected = legacy(returns)
+        t_legacy = time.perf_counter() - start
+
+        run_statistics(returns.values)  # warm-up (JIT compile when numba is installed)
+        start = time.perf_counter()
+        result = run_statistics(returns.values)
+        t_kernel = time.perf_counter() - start
+
+        assert result == expected, (result, expected)
+        print(f"{n:>9,} trades | loops: {t_legacy * 1000:9.1f} ms | "
+              f"kernel: {t_kernel * 1000:7.2f} ms | speedup: {t_legacy / t_kernel:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+SL/TP enrichment: merge + combine_first vs. the position_id index lookup.
+
+Run from `backend/`: python -m benchmarks.bench_sl_tp
+"""
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from app.services.sl_tp_index import SlTpIndex
+from benchmarks.synthetic import make_raw_deals, make_sl_tp
+
+
+def merge_enrich(df: pd.DataFrame, sl_tp: pd.DataFrame) -> pd.DataFrame:
+    """The previous path of normalize_deals."""
+    df = df.copy()
+    df["price_sl"] = None
+    df["price_tp"] = None
+    df = df.merge(sl_tp[["position_id", "sl", "tp"]], on="position_id", how="left")
+    df["price_sl"] = df["sl"].combine_first(df["price_sl"])
+    df["price_tp"] = df["tp"].combine_first(df["price_tp"])
+    return df.drop(columns=["sl", "tp"])
+
+
+def index_enrich(df: pd.DataFrame, index: SlTpIndex) -> pd.DataFrame:
+    df = df.copy()
+    sl, tp = index.lookup(df["position_id"].to_numpy())
+    df["price_sl"] = sl
+    df["price_tp"] = tp
+    return df
+
+
+def measure(fn, *args, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def main() -> None:
+    for n in (100_000, 1_000_000):
+        raw = make_raw_deals(n)
+        sl_tp = make_sl_tp(raw)
+        sl_tp["sl"] = sl_tp["sl"] - (sl_tp["position_id"] % 7)
+        # The first positions have no SL/TP and must come out as NaN
+        sl_tp = sl_tp.iloc[len(sl_tp) // 10:]
+
+        started = time.perf_counter()
+        index = SlTpIndex.from_frame(sl_tp)
+        t_build = time.perf_counter() - started
+
+        merged, t_merge, peak_merge = measure(merge_enrich, raw, sl_tp)
+        looked_up, t_index, peak_index = measure(index_enrich, raw, index)
+        for column in ("price_sl", "price_tp"):
+            assert np.array_equal(merged[column].to_numpy(dtype=np.float64, na_value=np.nan),
+                                  looked_up[column].to_numpy(), equal_nan=True)
+
+        # Incremental update: a sync window touching 1% of the positions
+        changed = sl_tp.sample(frac=0.01, random_state=1).assign(tp=123.0)
+        started = time.perf_counter()
+        index.update(changed)
+        t_update = time.perf_counter() - started
+
+        print(f"{n:>9,} deals | merge: {t_merge * 1000:7.1f} ms, peak {peak_merge / 2**20:6.1f} MiB | "
+              f"index: {t_index * 1000:6.1f} ms, peak {peak_index / 2**20:6.1f} MiB | "
+              f"build {t_build * 1000:5.1f} ms, update {t_update * 1000:5.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Round-trip trade table: grouped build, store refresh and MAE/MFE from bars.
+
+Run from `backend/`: python -m benchmarks.bench_trades
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.deal_store import DealStore
+from app.services.trades import build_trades, excursions, fetch_windows
+from benchmarks.synthetic import make_raw_deals
+
+BAR_SECONDS = 300
+CHUNK_SECONDS = 31 * 24 * 3600
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main() -> None:
+    for n in (100_000, 1_000_000):
+        raw = make_raw_deals(n)
+        trades, t_build = timed(build_trades, raw)
+
+        # A synthetic M5 series spanning the whole history, shared by every trade
+        start, end = int(raw["time"].min()), int(raw["time"].max())
+        bar_times = np.arange(start - start % BAR_SECONDS, end + 1, BAR_SECONDS)
+        mid = 100.0 + np.sin(bar_times / 50_000.0)
+        measured = trades.dropna(subset=["open_time"])
+        args = (
+            measured["type"].to_numpy(), measured["open_time"].to_numpy(dtype=np.int64),
+            measured["close_time"].to_numpy(dtype=np.int64), measured["open_price"].to_numpy(),
+            bar_times, mid + 0.05, mid - 0.05,
+        )
+        _, t_excursions = timed(excursions, *args)
+
+        # Bar requests: one per window and symbol, against one per trade
+        requests = sum(
+            len(fetch_windows(group["open_time"].to_numpy(dtype=np.int64),
+                              group["close_time"].to_numpy(dtype=np.int64), 60, CHUNK_SECONDS))
+            for _, group in measured.groupby("symbol")
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = DealStore(os.path.join(directory, "bench.sqlite3"))
+            store.save_deals(raw.iloc[: n - n // 100])
+            rows_full, t_full = timed(store.refresh_trades)
+            # A sync bringing the newest 1% of the deals
+            store.save_deals(raw.iloc[n - n // 100:])
+            rows_inc, t_inc = timed(store.refresh_trades)
+
+        print(f"{n:>9,} deals -> {len(trades):>7,} trades | build {t_build * 1000:6.1f} ms | "
+              f"MAE/MFE {t_excursions * 1000:6.1f} ms over {len(bar_times):,} bars, "
+              f"{requests} bar requests | store refresh: full {t_full:5.2f} s ({rows_full:,} rows), "
+              f"after 1% sync {t_inc * 1000:6.1f} ms ({rows_inc:,} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Synthetic MT5-shaped data for the benchmark scripts."""
+import numpy as np
+import pandas as pd
+
+SYMBOLS = ["WINJ25", "WDOK25", "PETR4", "VALE3", "EURUSD", "XAUUSD"]
+
+
+def make_raw_deals(n: int, n_magics: int = 40, seed: int = 42) -> pd.DataFrame:
+    """Builds `n` raw TradeDeal rows (half entries, half exits) with epoch times."""
+    rng = np.random.default_rng(seed)
+    ticket = np.arange(1, n + 1, dtype=np.int64)
+    time = 1_600_000_000 + np.cumsum(rng.integers(1, 600, size=n))
+    entry = (ticket % 2 == 0).astype(np.int64)
+    position_id = (ticket + 1) // 2 + 100_000
+    magic = rng.integers(0, n_magics, size=n) * 1000
+    magic = np.repeat(magic[::2], 2)[:n]
+    # Prices move on a 0.01 tick, as MT5 quotes do
+    price = np.round(100.0 + rng.normal(0, 1, size=n).cumsum() * 0.01, 2)
+    profit = np.where(entry == 1, np.round(rng.normal(5, 50, size=n), 2), 0.0)
+
+    return pd.DataFrame({
+        "ticket": ticket,
+        "order": ticket,
+        "time": time,
+        "time_msc": time * 1000,
+        "type": rng.integers(0, 2, size=n),
+        "entry": entry,
+        "magic": magic,
+        "position_id": position_id,
+        "reason": np.full(n, 3),
+        "volume": rng.choice([1.0, 2.0, 5.0], size=n),
+        "price": price,
+        "commission": np.full(n, -0.5),
+        "swap": np.zeros(n),
+        "profit": profit,
+        "fee": np.zeros(n),
+        "symbol": rng.choice(SYMBOLS, size=n),
+        "comment": rng.choice(["", "tp", "sl"], size=n),
+        "external_id": np.full(n, ""),
+    })
+
+
+def make_sl_tp(raw: pd.DataFrame) -> pd.DataFrame:
+    """Builds one SL/TP row per position of a raw deals frame."""
+    positions = raw["position_id"].unique()
+    return pd.DataFrame({
+        "position_id": positions,
+        "sl": np.full(len(positions), 99.0),
+        "tp": np.full(len(positions), 101.0),
+    })
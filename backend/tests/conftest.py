@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+# Settings are read once at import, so the fake terminal and a scratch store are selected
+# before any app module loads (terminal processes inherit both)
+os.environ["MT5_MODULE"] = "tests.fake_mt5"
+os.environ.setdefault("DEAL_STORE_PATH", os.path.join(tempfile.mkdtemp(prefix="ea-analyzer-"), "deals.sqlite3"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from tests import fake_mt5  # noqa: E402
+
+
+@pytest.fixture
+def fake():
+    fake_mt5.reset()
+    yield fake_mt5
+    fake_mt5.reset()
@@ -0,0 +1,134 @@
+"""
+Stand-in for the MetaTrader5 package, selected with MT5_MODULE=tests.fake_mt5.
+
+History lives in module globals that tests set directly (`DEALS`, `ORDERS`). A terminal
+initialized with a path loads a deterministic history derived from that path instead,
+so each terminal of a pool (every one in its own process) serves its own account.
+"""
+import os
+import zlib
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+TradeDeal = namedtuple(
+    "TradeDeal",
+    "ticket order time time_msc type entry magic position_id reason volume price "
+    "commission swap profit fee symbol comment external_id",
+)
+TradeOrder = namedtuple(
+    "TradeOrder",
+    "ticket time_setup time_setup_msc time_done time_done_msc type magic position_id sl tp symbol",
+)
+TerminalInfo = namedtuple("TerminalInfo", "name connected pid")
+
+TIMEFRAME_M1 = 1
+
+# Deals per account when a terminal path selects the history
+TERMINAL_DEALS = 200
+
+DEALS: List[TradeDeal] = []
+ORDERS: List[TradeOrder] = []
+POSITIONS: List[tuple] = []
+
+# (name, dt_from, dt_to) of every history request
+CALLS: List[tuple] = []
+# history_deals_get fails once this many calls have succeeded (None: never)
+FAIL_AFTER: Optional[int] = None
+
+_initialized = False
+
+
+def make_history(positions: int, start: int = 1_704_067_200, seed: int = 0,
+                 symbols: Tuple[str, ...] = ("WINJ25", "WDOK25", "EURUSD")) -> Tuple[list, list]:
+    """In/out deal pairs and one SL/TP order per position, every hour or so from `start`."""
+    rng = np.random.default_rng(seed)
+    deals, orders = [], []
+    t = start
+    for i in range(positions):
+        t += int(rng.integers(600, 7200))
+        position_id = 10_000 + i
+        magic = int(rng.integers(0, 4)) * 1000
+        symbol = symbols[int(rng.integers(0, len(symbols)))]
+        side = int(rng.integers(0, 2))
+        price = round(100 + float(rng.normal()), 2)
+        closed = t + int(rng.integers(30, 3600))
+        profit = round(float(rng.normal(5, 50)), 2)
+        deals.append(TradeDeal(2 * i + 1, 2 * i + 1, t, t * 1000, side, 0, magic, position_id, 3,
+                               1.0, price, -0.5, 0.0, 0.0, 0.0, symbol, "", ""))
+        deals.append(TradeDeal(2 * i + 2, 2 * i + 2, closed, closed * 1000 + 5, 1 - side, 1, magic,
+                               position_id, 3, 1.0, price + 1, -0.5, 0.0, profit, 0.0, symbol, "tp", ""))
+        orders.append(order(2 * i + 1, t, position_id, price - 1, price + 1, side, magic, symbol))
+        t = closed
+    return deals, orders
+
+
+def order(ticket: int, time: int, position_id: int, sl: float, tp: float,
+          side: int = 0, magic: int = 0, symbol: str = "WINJ25") -> TradeOrder:
+    return TradeOrder(ticket, time, time * 1000, time, time * 1000, side, magic, position_id, sl, tp, symbol)
+
+
+def reset(deals: Optional[list] = None, orders: Optional[list] = None) -> None:
+    global FAIL_AFTER
+    DEALS[:] = deals or []
+    ORDERS[:] = orders or []
+    POSITIONS.clear()
+    CALLS.clear()
+    FAIL_AFTER = None
+
+
+def _epoch(value: datetime) -> float:
+    # Naive datetimes are server time, which the service handles as UTC
+    return value.replace(tzinfo=timezone.utc).timestamp() if value.tzinfo is None else value.timestamp()
+
+
+def initialize(path: Optional[str] = None, **kwargs) -> bool:
+    global _initialized
+    if path:
+        DEALS[:], ORDERS[:] = make_history(TERMINAL_DEALS, seed=zlib.crc32(path.encode()) % 1000)
+    _initialized = True
+    return True
+
+
+def shutdown() -> None:
+    global _initialized
+    _initialized = False
+
+
+def last_error() -> Tuple[int, str]:
+    return (-1, "fake failure") if FAIL_AFTER is not None else (1, "Success")
+
+
+def terminal_info() -> Optional[TerminalInfo]:
+    # Like the real module: nothing until this process is attached to a terminal
+    return TerminalInfo(f"fake-{os.getpid()}", True, os.getpid()) if _initialized else None
+
+
+def history_deals_get(dt_from: datetime, dt_to: datetime) -> Optional[tuple]:
+    served = sum(1 for call in CALLS if call[0] == "deals")
+    CALLS.append(("deals", dt_from, dt_to))
+    if FAIL_AFTER is not None and served >= FAIL_AFTER:
+        return None
+    low, high = _epoch(dt_from), _epoch(dt_to)
+    return tuple(deal for deal in DEALS if low <= deal.time <= high)
+
+
+def history_orders_get(dt_from: datetime, dt_to: datetime) -> tuple:
+    CALLS.append(("orders", dt_from, dt_to))
+    low, high = _epoch(dt_from), _epoch(dt_to)
+    return tuple(o for o in ORDERS if low <= o.time_setup <= high)
+
+
+def history_deals_total(dt_from: datetime, dt_to: datetime) -> int:
+    low, high = _epoch(dt_from), _epoch(dt_to)
+    return sum(1 for deal in DEALS if low <= deal.time <= high)
+
+
+def positions_get() -> tuple:
+    return tuple(POSITIONS)
+
+
+def positions_total() -> int:
+    return len(POSITIONS)
@@ -0,0 +1,198 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.deal_cube import DealCube, cube_metrics, position_directions
+from app.services.deal_dtypes import compact_deals
+from app.services.deal_store import DealStore, to_epoch
+from app.services.grouped_metrics import calculate_grouped_metrics
+from app.services.metrics import calculate_metrics
+from app.services.mt5_service import MT5Service
+from app.services.normalization import normalize_deals
+from benchmarks.synthetic import make_raw_deals
+
+MIN_DAYS_FOR_SHARPE = 30
+HOUR = 3600
+START = 1_704_067_200  # 2024-01-01
+
+
+def assert_same_metrics(cube, batch):
+    """Cube metrics against the raw-deal ones; the order-dependent fields are None in the cube."""
+    for section in ("general", "advanced", "sequences", "extremes"):
+        for name, value in cube[section].items():
+            if value is None:
+                assert name in ("recovery_factor", "z_score", "max_consecutive_wins",
+                                "max_consecutive_losses", "max_drawdown", "sharpe_ratio", "std_dev"), name
+                expected = batch[section][name]
+                if name in ("sharpe_ratio", "std_dev"):
+                    assert expected is None or np.isnan(expected), (name, expected)
+                continue
+            expected = batch[section][name]
+            assert expected is not None, (section, name)
+            assert np.isclose(float(value), float(expected), rtol=1e-9, atol=1e-6), (section, name, value, expected)
+
+
+def filtered(df, start, end, ea_ids=None, symbols=None, weekdays=None, hours=None, directions=None):
+    times = df["time"]
+    mask = (times >= pd.Timestamp(start, unit="s")) & (times <= pd.Timestamp(end, unit="s"))
+    if ea_ids:
+        mask &= df["ea_id"].isin(ea_ids)
+    if symbols:
+        mask &= df["symbol"].isin(symbols)
+    if weekdays:
+        mask &= times.dt.dayofweek.isin(weekdays)
+    if hours:
+        mask &= times.dt.hour.isin(hours)
+    if directions:
+        mask &= np.isin(position_directions(df["type"].to_numpy()), directions)
+    return df[mask]
+
+
+@pytest.fixture(scope="module")
+def deals():
+    return compact_deals(normalize_deals(make_raw_deals(30_000, n_magics=8)))
+
+
+def test_folding_in_batches_matches_one_build(deals):
+    whole = DealCube().fold(deals)
+    folded = DealCube()
+    for part in np.array_split(np.arange(len(deals)), 7):
+        folded.fold(deals.iloc[part])
+
+    keys, cells = whole.select(0, 2 ** 40)
+    folded_keys, folded_cells = folded.select(0, 2 ** 40)
+    assert np.array_equal(keys, folded_keys)
+    for name, values in cells.items():
+        assert np.allclose(values, folded_cells[name]), name
+
+
+def test_random_slices_match_raw_deal_metrics(deals):
+    cube = DealCube().fold(deals)
+    rng = np.random.default_rng(0)
+    first = to_epoch(deals["time"].min()) // HOUR * HOUR
+    ea_labels, symbol_labels = list(deals["ea_id"].cat.categories), list(deals["symbol"].cat.categories)
+
+    for trial in range(30):
+        start = first + int(rng.integers(0, 2_000)) * HOUR
+        end = start + int(rng.integers(1, 8_000)) * HOUR - 1
+        filters = {
+            "ea_ids": list(rng.choice(ea_labels, 3)) if trial % 2 else None,
+            "symbols": list(rng.choice(symbol_labels, 2)) if trial % 3 == 0 else None,
+            "weekdays": [int(day) for day in rng.choice(7, 3)] if trial % 4 == 0 else None,
+            "hours": [int(hour) for hour in rng.choice(24, 8)] if trial % 5 == 0 else None,
+            "directions": [int(rng.integers(0, 2))] if trial % 6 == 0 else None,
+        }
+        assert cube.covers(start, end)
+        keys, cells = cube.select(start, end, **filters)
+        expected = filtered(deals, start, end, **filters)
+        if expected.empty:
+            assert len(keys) == 0
+            continue
+
+        assert_same_metrics(cube_metrics(keys, cells, MIN_DAYS_FOR_SHARPE)[0],
+                            calculate_metrics(expected, MIN_DAYS_FOR_SHARPE))
+        for group_by in ("ea", "symbol", "ea_symbol"):
+            groups, labels = cube.group_codes(keys, group_by)
+            metrics = cube_metrics(keys, cells, MIN_DAYS_FOR_SHARPE, groups, len(labels))
+            batch = {
+                tuple(str(row.get(name)) for name in ("ea_id", "symbol")): row["metrics"]
+                for row in calculate_grouped_metrics(expected, group_by, MIN_DAYS_FOR_SHARPE)
+            }
+            assert len(labels) == len(batch)
+            for label, values in zip(labels, metrics):
+                assert_same_metrics(values, batch[tuple(str(label.get(name)) for name in ("ea_id", "symbol"))])
+
+
+def test_ranges_cutting_an_hour_are_not_covered(deals):
+    cube = DealCube().fold(deals)
+    first = to_epoch(deals["time"].min()) // HOUR * HOUR + HOUR
+
+    assert cube.covers(first, first + 5 * HOUR - 1)
+    assert not cube.covers(first + 60, first + 5 * HOUR - 1)
+    assert not cube.covers(first, first + 5 * HOUR - 60)
+
+
+def at(epoch: int) -> datetime:
+    return pd.Timestamp(epoch, unit="s").to_pydatetime()
+
+
+@pytest.fixture
+def service(fake, tmp_path):
+    service = MT5Service(store=DealStore(str(tmp_path / "deals.sqlite3")))
+    yield service
+    service.shutdown()
+
+
+def rebuilt(service: MT5Service) -> DealCube:
+    raw = service.store.read_deals(at(0), at(2 ** 31))
+    return DealCube().fold(normalize_deals(raw))
+
+
+def assert_same_cube(cube: DealCube, expected: DealCube):
+    keys, cells = cube.select(0, 2 ** 40)
+    expected_keys, expected_cells = expected.select(0, 2 ** 40)
+    assert np.array_equal(keys, expected_keys)
+    for name, values in cells.items():
+        assert np.allclose(values, expected_cells[name]), name
+
+
+def test_service_falls_back_to_deals_for_partial_hours(fake, service):
+    fake.reset(*fake.make_history(80, start=START))
+    service.sync_history(at(START), force=True)
+    end = fake.DEALS[-1].time // HOUR * HOUR + HOUR - 1
+    reference = calculate_metrics(service.query_deals(at(START), at(end)), MIN_DAYS_FOR_SHARPE)
+
+    # Starts inside the history, 90 seconds into an hour
+    cut = fake.DEALS[40].time // HOUR * HOUR + 90
+
+    aligned = service.calculate_cube_metrics(at(START), at(end))
+    partial = service.calculate_cube_metrics(at(cut), at(end))
+    path = service.calculate_cube_metrics(at(START), at(end), path_metrics=True)
+
+    assert aligned["source"] == "cube"
+    assert_same_metrics(aligned, reference)
+    assert partial["source"] == "deals" and path["source"] == "deals"
+    assert partial["general"] == pytest.approx(
+        calculate_metrics(service.query_deals(at(cut), at(end)), MIN_DAYS_FOR_SHARPE)["general"]
+    )
+    assert path["extremes"]["max_drawdown"] == pytest.approx(reference["extremes"]["max_drawdown"])
+
+
+def test_cube_folds_new_head_deals_after_sync(fake, service):
+    now = to_epoch(datetime.now())
+    deals, orders = fake.make_history(30, start=now - 2 * 24 * HOUR)
+    fake.reset(deals[:40], orders[:20])
+    since = at(now - 3 * 24 * HOUR)
+    service.sync_history(since, force=True)
+    service.calculate_cube_metrics(since, at(2 ** 31))
+    cube = service._cube
+
+    fake.reset(deals, orders)
+    assert service.sync_history(since, force=True) == 20
+    metrics = service.calculate_cube_metrics(since, at(2 ** 31))
+
+    # Folded forward in place, and equal to a cube built from scratch
+    assert service._cube is cube and cube.version == service.store.version
+    assert cube.rows == len(deals)
+    assert_same_cube(cube, rebuilt(service))
+    assert metrics["general"]["total_trades"] == 30
+
+
+def test_cube_is_rebuilt_when_deals_land_behind_its_head(fake, service):
+    deals, orders = fake.make_history(60, start=START)
+    fake.reset(deals, orders)
+    middle = deals[60].time
+    service.sync_history(at(middle), force=True)
+    service.calculate_cube_metrics(at(middle), at(2 ** 31))
+    cube = service._cube
+    assert cube.rows == 60
+
+    service.sync_history(at(START), force=True)
+    metrics = service.calculate_cube_metrics(at(START), at(2 ** 31))
+
+    assert service._cube is not cube
+    assert service._cube.rows == len(deals)
+    assert_same_cube(service._cube, rebuilt(service))
+    assert metrics["general"]["total_trades"] == 60
@@ -0,0 +1,99 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.filter_search import MAX_SEARCH_SYMBOLS, _profit_factor, build_cube, search_filters
+
+MIN_TRADES = 25
+
+
+@pytest.fixture(scope="module")
+def deals():
+    rng = np.random.default_rng(1)
+    n = 2_000
+    df = pd.DataFrame({
+        "time": pd.to_datetime(rng.integers(1_600_000_000, 1_700_000_000, n), unit="s"),
+        "ea_id": rng.choice(["a", "b", "rare"], n, p=[0.5, 0.49, 0.01]),
+        "symbol": rng.choice(["V", "W", "X", "Y", "Z"], n, p=[0.1, 0.1, 0.2, 0.3, 0.3]),
+        # Whole-number results, so ties between candidates actually happen
+        "net_profit": np.round(rng.normal(0.2, 5, n)),
+    })
+    # A few weekdays and hours keep the enumeration small
+    times = df["time"].dt
+    return df[(times.dayofweek < 4) & (times.hour >= 3) & (times.hour < 9)].reset_index(drop=True)
+
+
+def candidate_sets(df: pd.DataFrame, by_symbol: bool):
+    """Every filter the search considers, enumerated as plain inclusion lists."""
+    weekdays = sorted(df["time"].dt.dayofweek.unique())
+    hours = sorted(df["time"].dt.hour.unique())
+    symbol_sets = [None]
+    if by_symbol:
+        counts = df["symbol"].value_counts()
+        toggled, fixed = list(counts.index[:MAX_SEARCH_SYMBOLS]), list(counts.index[MAX_SEARCH_SYMBOLS:])
+        symbol_sets = [
+            list(chosen) + fixed
+            for k in range(1, len(toggled) + 1)
+            for chosen in itertools.combinations(toggled, k)
+        ]
+    for k in range(1, len(weekdays) + 1):
+        for days in itertools.combinations(weekdays, k):
+            for first, last in itertools.combinations_with_replacement(range(len(hours)), 2):
+                for symbols in symbol_sets:
+                    yield list(days), list(range(hours[first], hours[last] + 1)), symbols
+
+
+def brute_force(df: pd.DataFrame, objective: str, by_symbol: bool):
+    """(score, net profit, trades) of the best candidate, scanning the deals for each one."""
+    weekday, hour = df["time"].dt.dayofweek.to_numpy(), df["time"].dt.hour.to_numpy()
+    symbol, returns = df["symbol"].to_numpy(), df["net_profit"].to_numpy()
+    best = None
+    for days, hours, symbols in candidate_sets(df, by_symbol):
+        mask = np.isin(weekday, days) & np.isin(hour, hours)
+        if symbols is not None:
+            mask &= np.isin(symbol, symbols)
+        kept = returns[mask]
+        if len(kept) < MIN_TRADES:
+            continue
+        net = kept.sum()
+        if objective == "net_profit":
+            score = net
+        else:
+            score = float(_profit_factor(kept[kept > 0].sum(), kept[kept <= 0].sum()))
+        best = max(best, (score, net, len(kept))) if best is not None else (score, net, len(kept))
+    return best
+
+
+def totals(df: pd.DataFrame, best: dict):
+    mask = df["time"].dt.dayofweek.isin(best["weekdays"]) & df["time"].dt.hour.isin(best["hours"])
+    if best["symbols"] is not None:
+        mask &= df["symbol"].isin(best["symbols"])
+    kept = df.loc[mask, "net_profit"]
+    return kept.sum(), len(kept)
+
+
+@pytest.mark.parametrize("by_symbol", [False, True])
+@pytest.mark.parametrize("objective", ["net_profit", "profit_factor"])
+def test_search_finds_the_brute_force_winner(deals, objective, by_symbol):
+    results = {row["ea_id"]: row for row in search_filters(build_cube(deals, by_symbol), objective, MIN_TRADES)}
+
+    for ea_id, group in deals.groupby("ea_id"):
+        expected = brute_force(group, objective, by_symbol)
+        best = results[ea_id]["best"]
+        if expected is None:
+            assert best is None
+            continue
+
+        score = best["net_profit"] if objective == "net_profit" else best["profit_factor"]
+        assert np.allclose((score, best["net_profit"], best["trades"]), expected)
+        # The reported filter reproduces the reported totals on the raw deals
+        assert np.allclose(totals(group, best), (best["net_profit"], best["trades"]))
+
+
+def test_baseline_is_the_unfiltered_ea(deals):
+    for row in search_filters(build_cube(deals), "net_profit", MIN_TRADES):
+        group = deals[deals["ea_id"] == row["ea_id"]]
+        assert row["baseline"]["trades"] == len(group)
+        assert row["baseline"]["net_profit"] == pytest.approx(group["net_profit"].sum())
@@ -0,0 +1,25 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from app.api.formats import columnar_response, frame_to_columnar
+
+
+def test_missing_datetimes_are_null():
+    df = pd.DataFrame({"time": pd.to_datetime([1_704_067_200, None], unit="s")})
+
+    assert frame_to_columnar(df)["columns"]["time"] == ["2024-01-01T00:00:00", None]
+
+
+def test_non_finite_floats_are_null():
+    df = pd.DataFrame({
+        "profit_factor": [1.5, np.inf, -np.inf, np.nan],
+        "ratio": pd.Series([2.0, np.inf, None, 1.0], dtype=object),
+    })
+
+    response = columnar_response(frame_to_columnar(df))
+
+    columns = json.loads(response.body)["columns"]
+    assert columns["profit_factor"] == [1.5, None, None, None]
+    assert columns["ratio"] == [2.0, None, None, 1.0]
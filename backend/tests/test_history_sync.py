@@ -0,0 +1,125 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from app.services import mt5_service as service_module
+from app.services.deal_store import DealStore, to_epoch
+from app.services.mt5_service import SYNC_MARGIN_SECONDS, MT5Service
+
+DAY = 24 * 3600
+START = 1_704_067_200  # 2024-01-01
+
+
+def at(epoch: int) -> datetime:
+    return pd.Timestamp(epoch, unit="s").to_pydatetime()
+
+
+@pytest.fixture
+def service(fake, tmp_path):
+    service = MT5Service(store=DealStore(str(tmp_path / "deals.sqlite3")))
+    yield service
+    service.shutdown()
+
+
+def stored_tickets(service: MT5Service) -> list:
+    return service.store.read_deals(at(0), at(2 ** 31))["ticket"].tolist()
+
+
+def deal_windows(fake) -> list:
+    return [(to_epoch(dt_from), to_epoch(dt_to)) for name, dt_from, dt_to in fake.CALLS if name == "deals"]
+
+
+def test_first_sync_stores_history_and_watermark(fake, service):
+    fake.reset(*fake.make_history(50, start=START))
+
+    added = service.sync_history(at(START), force=True)
+
+    state = service.store.get_state()
+    assert added == 100
+    assert stored_tickets(service) == [deal.ticket for deal in fake.DEALS]
+    assert state["synced_from"] == START
+    assert state["last_ticket"] == fake.DEALS[-1].ticket
+    assert len(service.store.read_sl_tp()) == 50
+
+
+def test_resync_fetches_only_the_head(fake, service):
+    now = to_epoch(datetime.now())
+    deals, orders = fake.make_history(15, start=now - DAY)
+    fake.reset(deals[:20], orders[:10])
+    service.sync_history(at(now - 2 * DAY), force=True)
+    head = service.store.get_state()["last_time"]
+
+    fake.reset(deals, orders)
+    added = service.sync_history(at(now - 2 * DAY), force=True)
+
+    windows = deal_windows(fake)
+    assert windows[0][0] == head
+    assert all(window_from >= head for window_from, _ in windows)
+    # The newest stored deal is fetched again and deduped by ticket
+    assert added == 10
+    assert stored_tickets(service) == [deal.ticket for deal in deals]
+
+
+def test_resync_head_starts_no_later_than_the_margin_before_synced_to(fake, service):
+    fake.reset(*fake.make_history(20, start=START))
+    service.sync_history(at(START), force=True)
+    synced_to = service.store.get_state()["synced_to"]
+
+    fake.CALLS.clear()
+    service.sync_history(at(START), force=True)
+
+    assert deal_windows(fake)[0][0] == synced_to - SYNC_MARGIN_SECONDS
+
+
+def test_earlier_start_backfills_before_synced_from(fake, service):
+    deals, orders = fake.make_history(60, start=START)
+    fake.reset(deals, orders)
+    middle = deals[60].time
+    service.sync_history(at(middle), force=True)
+    assert stored_tickets(service) == [deal.ticket for deal in deals if deal.time >= middle]
+
+    fake.CALLS.clear()
+    service.sync_history(at(START), force=True)
+
+    assert deal_windows(fake)[0] == (START, middle)
+    assert stored_tickets(service) == [deal.ticket for deal in deals]
+    assert service.store.get_state()["synced_from"] == START
+
+
+def test_backfill_keeps_the_newer_sl_tp(fake, service):
+    deals, orders = fake.make_history(60, start=START)
+    position = deals[70].position_id
+    middle = deals[60].time
+    old = fake.order(9_001, START + 60, position, 1.0, 2.0)
+    new = fake.order(9_002, middle + 60, position, 3.0, 4.0)
+    fake.reset(deals, orders + [old, new])
+
+    service.sync_history(at(middle), force=True)
+    index = service.store.sl_tp_index()
+    service.sync_history(at(START), force=True)
+
+    table = service.store.read_sl_tp().set_index("position_id")
+    assert (table.at[position, "sl"], table.at[position, "tp"]) == (3.0, 4.0)
+    sl, tp = index.lookup(pd.Index([position]).to_numpy())
+    assert (sl[0], tp[0]) == (3.0, 4.0)
+
+
+def test_failed_chunk_leaves_the_watermark(fake, service, monkeypatch):
+    monkeypatch.setattr(service_module.settings, "FETCH_CHUNK_DAYS", 1)
+    deals, orders = fake.make_history(60, start=START)
+    fake.reset(deals, orders)
+    fake.FAIL_AFTER = 2
+
+    service.sync_history(at(START), force=True)
+
+    # Chunks fetched before the failure are kept, but the range is not marked as covered
+    state = service.store.get_state()
+    assert state["synced_from"] is None and state["synced_to"] is None
+    assert stored_tickets(service) == [deal.ticket for deal in deals if deal.time <= START + 2 * DAY]
+
+    fake.FAIL_AFTER = None
+    service.sync_history(at(START), force=True)
+
+    assert service.store.get_state()["synced_from"] == START
+    assert stored_tickets(service) == [deal.ticket for deal in deals]
@@ -0,0 +1,83 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.services.grouped_metrics import calculate_grouped_metrics
+from app.services.incremental_metrics import MetricsAccumulator, SliceMetrics
+from app.services.metrics import calculate_metrics
+from app.services.normalization import normalize_deals
+from benchmarks.synthetic import make_raw_deals, make_sl_tp
+
+MIN_DAYS_FOR_SHARPE = 5
+
+# Folded from integers and comparisons, so they match the batch values exactly
+EXACT = {
+    "general.total_trades", "general.total_wins", "general.total_losses",
+    "sequences.max_consecutive_wins", "sequences.max_consecutive_losses",
+    "extremes.max_profit", "extremes.max_loss", "extremes.max_drawdown",
+}
+# Everything else is a float sum: equal up to summation order
+REL_TOL = 1e-9
+
+
+def assert_matches(expected, result, exact=EXACT, path=""):
+    if isinstance(expected, dict):
+        assert expected.keys() == result.keys(), path
+        for key in expected:
+            assert_matches(expected[key], result[key], exact, f"{path}.{key}".lstrip("."))
+    elif expected is None or result is None:
+        assert expected is None and result is None, (path, expected, result)
+    elif path in exact:
+        assert result == expected, (path, expected, result)
+    else:
+        a, b = float(expected), float(result)
+        assert (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=REL_TOL, abs_tol=1e-9), (path, a, b)
+
+
+@pytest.fixture(scope="module")
+def deals():
+    raw = make_raw_deals(20_000, n_magics=4, seed=7)
+    return normalize_deals(raw, make_sl_tp(raw))
+
+
+def appends(n: int, seed: int):
+    """Random batch boundaries: single deals, small and large appends."""
+    rng = np.random.default_rng(seed)
+    cuts = np.unique(np.concatenate((rng.integers(1, n, 40), [1, 2, n - 1])))
+    return zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [n])))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_accumulator_matches_batch_after_each_append(deals, seed):
+    accumulator = MetricsAccumulator(MIN_DAYS_FOR_SHARPE)
+
+    for start, end in appends(len(deals), seed):
+        accumulator.fold(deals.iloc[start:end])
+        assert_matches(calculate_metrics(deals.iloc[:end], MIN_DAYS_FOR_SHARPE), accumulator.snapshot())
+
+
+def test_refolding_seen_deals_is_ignored(deals):
+    accumulator = MetricsAccumulator(MIN_DAYS_FOR_SHARPE).fold(deals.iloc[:500])
+
+    accumulator.fold(deals.iloc[400:800])
+
+    assert_matches(calculate_metrics(deals.iloc[:800], MIN_DAYS_FOR_SHARPE), accumulator.snapshot())
+
+
+def test_slices_match_batch_and_grouped_metrics(deals):
+    slices = SliceMetrics(MIN_DAYS_FOR_SHARPE)
+
+    for start, end in appends(len(deals), seed=11):
+        slices.fold(deals.iloc[start:end])
+
+    result = {(row["ea_id"], row["symbol"]): row["metrics"] for row in slices.snapshot()}
+    grouped = calculate_grouped_metrics(deals, "ea_symbol", MIN_DAYS_FOR_SHARPE)
+    assert sorted(result) == sorted((row["ea_id"], row["symbol"]) for row in grouped)
+    for row in grouped:
+        key = (row["ea_id"], row["symbol"])
+        alone = deals[(deals["ea_id"] == key[0]) & (deals["symbol"] == key[1])]
+        assert_matches(calculate_metrics(alone, MIN_DAYS_FOR_SHARPE), result[key])
+        # The grouped equity curves come from pandas' compensated cumsum, so the drawdown
+        # is only equal up to rounding there
+        assert_matches(row["metrics"], result[key], exact=EXACT - {"extremes.max_drawdown"})
@@ -0,0 +1,81 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from app.services import risk
+
+scan = pytest.mark.skipif(risk._scan_jit is None, reason="numba not installed")
+
+
+def fisher_yates_paths(keys: np.ndarray) -> np.ndarray:
+    """Trade order of each shuffled path, as the compiled scan draws it."""
+    rows, n = keys.shape
+    order = np.arange(n)
+    paths = np.empty((rows, n), dtype=np.int64)
+    for r in range(rows):
+        for step in range(n):
+            i = n - 1 - step
+            j = int(keys[r, step] * (i + 1))
+            order[i], order[j] = order[j], order[i]
+            paths[r, step] = order[i]
+    return paths
+
+
+@pytest.fixture
+def returns():
+    return np.round(np.random.default_rng(3).normal(2, 30, 300), 2)
+
+
+@scan
+@pytest.mark.parametrize("method", ["bootstrap", "shuffle"])
+def test_compiled_scan_matches_numpy_statistics(returns, method):
+    keys = np.random.default_rng(0).random((40, len(returns)))
+    stats = np.empty((len(keys), 4))
+
+    risk._scan_jit(returns, keys, method == "shuffle", np.arange(len(returns)), stats)
+
+    if method == "shuffle":
+        paths = fisher_yates_paths(keys)
+        assert (np.sort(paths, axis=1) == np.arange(len(returns))).all()
+    else:
+        paths = (keys * len(returns)).astype(np.int64)
+    expected = risk._path_stats_numpy(returns, paths)
+    assert np.allclose(stats, expected, rtol=1e-12, atol=1e-9)
+
+
+@scan
+def test_shuffle_draws_uniform_permutations():
+    n, rows = 3, 60_000
+    keys = np.random.default_rng(1).random((rows, n))
+    counts = {}
+    for path in map(tuple, fisher_yates_paths(keys)):
+        counts[path] = counts.get(path, 0) + 1
+
+    assert set(counts) == set(itertools.permutations(range(n)))
+    expected = rows / len(counts)
+    chi2 = sum((count - expected) ** 2 / expected for count in counts.values())
+    assert chi2 < 20.5  # p < 0.001 for 5 degrees of freedom
+
+
+@pytest.mark.parametrize("method", ["bootstrap", "shuffle"])
+def test_same_seed_same_result_with_workers(returns, method):
+    try:
+        inline = risk.simulate_paths(returns, 1_200, method, seed=5)
+        pooled = risk.simulate_paths(returns, 1_200, method, seed=5, workers=2)
+    finally:
+        risk.shutdown_pool()
+
+    assert np.array_equal(inline, pooled)
+    if method == "shuffle":
+        assert np.allclose(inline[:, risk.FINAL], returns.sum())
+
+
+def test_numpy_fallback_statistics(returns, monkeypatch):
+    monkeypatch.setattr(risk, "_scan_jit", None)
+
+    stats = risk.simulate_paths(returns, 600, "shuffle", seed=2)
+
+    assert stats.shape == (600, 4)
+    assert np.allclose(stats[:, risk.FINAL], returns.sum())
+    assert (stats[:, risk.MAX_DRAWDOWN] >= 0).all() and (stats[:, risk.TROUGH] <= 0).all()
@@ -0,0 +1,105 @@
+import os
+import signal
+import zlib
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from app.services.terminal_pool import TerminalPool
+from tests import fake_mt5
+
+TERMINALS = {"prop-a": "A", "prop-b": "B"}
+DATE_FROM, DATE_TO = datetime(2023, 1, 1), datetime(2030, 1, 1)
+
+
+def account_history(path: str) -> list:
+    deals, _ = fake_mt5.make_history(fake_mt5.TERMINAL_DEALS, seed=zlib.crc32(path.encode()) % 1000)
+    return [deal for deal in deals if deal.entry == 1]
+
+
+@pytest.fixture(scope="module")
+def pool(tmp_path_factory):
+    pool = TerminalPool(TERMINALS, str(tmp_path_factory.mktemp("pool") / "deals.sqlite3"))
+    yield pool
+    pool.shutdown()
+
+
+def test_fan_out_merges_accounts_in_time_order(pool):
+    df = pool.query_deals(DATE_FROM, DATE_TO)
+
+    assert len(df) == 2 * fake_mt5.TERMINAL_DEALS
+    assert set(df["account"].cat.categories) == set(TERMINALS)
+    assert df["time_msc"].is_monotonic_increasing
+    for account, path in TERMINALS.items():
+        exits = account_history(path)
+        rows = df[df["account"] == account]
+        assert rows["ticket"].tolist() == [deal.ticket for deal in exits]
+        expected = sum(deal.profit + deal.commission + deal.swap for deal in exits)
+        assert rows["net_profit"].sum() == pytest.approx(expected)
+
+
+def test_each_terminal_runs_in_its_own_process(pool):
+    infos = {status["account"]: status["terminal_info"] for status in pool.status()}
+
+    pids = {info["pid"] for info in infos.values()}
+    assert len(pids) == len(TERMINALS) and os.getpid() not in pids
+
+
+def test_account_and_portfolio_metrics(pool):
+    df = pool.query_deals(DATE_FROM, DATE_TO)
+
+    portfolio = pool.calculate_metrics(df)
+    by_account = {row["account"]: row["metrics"] for row in pool.calculate_grouped_metrics(df, "account")}
+
+    assert portfolio["general"]["total_trades"] == len(df)
+    assert portfolio["general"]["net_profit"] == pytest.approx(df["net_profit"].sum())
+    for account in TERMINALS:
+        alone = pool.services[account].query_deals(DATE_FROM, DATE_TO)
+        assert by_account[account]["general"] == pytest.approx(pool.services[account].calculate_metrics(alone)["general"])
+    assert sum(m["general"]["net_profit"] for m in by_account.values()) == pytest.approx(
+        portfolio["general"]["net_profit"]
+    )
+
+
+def test_selected_accounts_only(pool):
+    df = pool.query_deals(DATE_FROM, DATE_TO, accounts=["prop-b"])
+
+    assert set(df["account"].unique()) == {"prop-b"}
+    assert len(df) == fake_mt5.TERMINAL_DEALS
+
+
+def test_dead_terminal_process_is_respawned(pool):
+    service = pool.services["prop-a"]
+    before = service.get_terminal_info()["pid"]
+
+    os.kill(before, signal.SIGKILL)
+    service._worker._process.join(10)
+
+    info = service.get_terminal_info()
+    assert info is not None and info["pid"] != before
+    # The new process attached to the terminal again and serves its history
+    service.sync_history(DATE_FROM, force=True)
+    assert len(pool.query_deals(DATE_FROM, DATE_TO, accounts=["prop-a"])) == fake_mt5.TERMINAL_DEALS
+
+
+def test_query_cache_key_normalizes_filters_and_follows_versions(pool):
+    store = pool.services["prop-b"].store
+    deal = store.read_deals_after(store.get_state()["last_time_msc"] - 1, 0)
+    deal["ticket"] += 1_000_000
+    deal["time"] += 60
+    deal["time_msc"] += 60_000
+    opened = pd.Timestamp(int(deal["time"].iloc[0]), unit="s")
+    hours, weekdays = [opened.hour, (opened.hour + 5) % 24], [opened.dayofweek]
+
+    first = pool.query_deals(DATE_FROM, DATE_TO, hours=hours + hours, weekdays=weekdays)
+    same = pool.query_deals(DATE_FROM, DATE_TO, hours=sorted(hours, reverse=True), weekdays=weekdays)
+    assert same is first
+
+    # A new deal in one account moves its store version, so the merged entry is not reused
+    assert store.save_deals(deal) == 1
+    after = pool.query_deals(DATE_FROM, DATE_TO, hours=hours, weekdays=weekdays)
+
+    assert after is not first
+    assert len(after) == len(first) + 1
+    assert deal["ticket"].iloc[0] in set(after["ticket"])
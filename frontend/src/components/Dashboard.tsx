@@ -1,29 +1,50 @@
 import { useState, useEffect, useCallback, useRef } from 'react';
 import { api } from '../services/api';
-import type { Deal, Metrics, Position } from '../services/api';
+import type { Aggregates, AnalysisRequest, Deal, GroupedMetrics, Metrics, Position } from '../services/api';
 import { LineChart, Line, BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, Legend, ReferenceLine, Cell, RadialBarChart, RadialBar, PolarAngleAxis, PieChart, Pie } from 'recharts';
-import { format, parseISO, getDay, getHours } from 'date-fns';
+import { format } from 'date-fns';
 import { KPICard } from './KPICard';
 import type { DashboardFilters } from './Sidebar';
 import { Activity, TrendingUp, TrendingDown, Flame, Repeat, Gauge } from 'lucide-react';
+import { formatCurrency } from '../utils/format';
 
-const DAY_MAP: { [key: number]: string } = {
-  0: 'Dom', 1: 'Seg', 2: 'Ter', 3: 'Qua', 4: 'Qui', 5: 'Sex', 6: 'Sáb'
-};
+// Sidebar day labels in API order (weekday 0 = Monday)
+const WEEKDAY_NAMES = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom'];
 
-import { formatCurrency } from '../utils/format';
+const EQUITY_POINTS = 1000;
+const TRADES_PAGE_SIZE = 100;
+const TRADE_FIELDS: (keyof Deal)[] = ['ticket', 'time', 'type', 'volume', 'price', 'net_profit', 'symbol', 'ea_id'];
+const EMPTY_AGGREGATES: Aggregates = { total_points: 0, equity: [], by_year: [], by_month: [], by_day: [], heatmap: [] };
 
-type EquityPoint = {
-  time: string;
-  balance: number;
-  ticket: number;
+// A range ending today is requested up to now, so the backend serves the live head
+const effectiveRange = (dateFrom: string, dateTo: string): AnalysisRequest => {
+  const now = new Date();
+  const toDate = new Date(dateTo);
+  return { date_from: dateFrom, date_to: toDate.toDateString() === now.toDateString() ? now.toISOString() : dateTo };
 };
 
+// Sidebar selection as API filters ('Todos' means no filter)
+const toAnalysisRequest = (filters: DashboardFilters): AnalysisRequest => ({
+  ...effectiveRange(filters.dateFrom, filters.dateTo),
+  assets: filters.selectedAssets.includes('Todos') ? undefined : filters.selectedAssets,
+  ea_ids: filters.selectedEAs.includes('Todos') ? undefined : filters.selectedEAs,
+  weekdays: filters.selectedDays.map(day => WEEKDAY_NAMES.indexOf(day)).filter(day => day >= 0),
+  hours: filters.selectedHours,
+});
+
+// The API reads an empty weekday/hour list as "no filter"; here it means nothing is selected
+const hasSelection = (filters: DashboardFilters) => filters.selectedDays.length > 0 && filters.selectedHours.length > 0;
+
 export function Dashboard({ filters, onDataLoaded }: { filters: DashboardFilters; onDataLoaded?: (assets: string[], eas: string[]) => void }) {
-  const [rawDeals, setRawDeals] = useState<Deal[]>([]);
-  const [filteredDeals, setFilteredDeals] = useState<Deal[]>([]);
   const [openPositions, setOpenPositions] = useState<Position[]>([]);
   const [metrics, setMetrics] = useState<Metrics | null>(null);
+  const [eaMetrics, setEaMetrics] = useState<GroupedMetrics[]>([]);
+  const [aggregates, setAggregates] = useState<Aggregates>(EMPTY_AGGREGATES);
+  const [trades, setTrades] = useState<Partial<Deal>[]>([]);
+  const [tradesCursor, setTradesCursor] = useState<string | null>(null);
+  const [tradesTotal, setTradesTotal] = useState(0);
+  // Bumped on reloads and new deals so the filtered views are fetched again
+  const [refreshKey, setRefreshKey] = useState(0);
   const [loading, setLoading] = useState(false);
   const [lastSyncAt, setLastSyncAt] = useState<Date | null>(null);
   const [activeTab, setActiveTab] = useState<'visao' | 'graficos' | 'heatmap' | 'trades'>('visao');
@@ -31,40 +52,22 @@ export function Dashboard({ filters, onDataLoaded }: { filters: DashboardFilters
   const [selectedYear, setSelectedYear] = useState<number | null>(null);
   const [selectedMonth, setSelectedMonth] = useState<number | null>(null);
   const lastResultClickRef = useRef<{ time: number; key: string | null }>({ time: 0, key: null });
-  
-  // Default range: last 5 years to cover everything for now
-  // In a real app, this should probably come from the filters or be adjustable
-  // const [dateFrom] = useState(new Date(new Date().setFullYear(new Date().getFullYear() - 5)).toISOString());
-  // const [dateTo] = useState(new Date().toISOString());
 
   const fetchData = useCallback(async () => {
     setLoading(true);
     try {
-      const now = new Date();
-      const toDate = new Date(filters.dateTo);
-      const effectiveDateTo = toDate.toDateString() === now.toDateString() ? now.toISOString() : filters.dateTo;
-      const request = { date_from: filters.dateFrom, date_to: effectiveDateTo };
-      
-      // Fetch only deals, calculate metrics locally to support filtering
-      const dealsData = await api.getDeals(request);
-      setRawDeals(dealsData);
-      const positionsData = await api.getPositions();
+      // Assets and EAs of the whole range feed the sidebar, whatever is selected
+      const [slices, positionsData] = await Promise.all([
+        api.getGroupedMetrics(effectiveRange(filters.dateFrom, filters.dateTo), 'ea_symbol'),
+        api.getPositions(),
+      ]);
       setOpenPositions(positionsData);
 
-      // Extract unique assets and EAs
-      if (dealsData.length > 0) {
-        const assets = [...new Set(dealsData.map(d => d.symbol))].sort();
-        const eas = [...new Set(dealsData.map(d => d.ea_id))].sort();
-        
-        if (onDataLoaded) {
-          onDataLoaded(assets, eas);
-        }
-      } else {
-        if (onDataLoaded) {
-          onDataLoaded([], []);
-        }
+      if (onDataLoaded) {
+        const assets = [...new Set(slices.map(slice => slice.symbol).filter((s): s is string => s !== null))].sort();
+        const eas = [...new Set(slices.map(slice => slice.ea_id).filter((ea): ea is string => ea !== null))].sort();
+        onDataLoaded(assets, eas);
       }
-
     } catch (error) {
       console.error("Error fetching data:", error);
     } finally {
@@ -73,18 +76,47 @@ export function Dashboard({ filters, onDataLoaded }: { filters: DashboardFilters
     }
   }, [filters.dateFrom, filters.dateTo, onDataLoaded]);
 
+  // Manual and fallback reloads also refetch the filtered views
+  const reloadAll = useCallback(() => {
+    fetchData();
+    setRefreshKey(key => key + 1);
+  }, [fetchData]);
+
   useEffect(() => {
     fetchData();
   }, [fetchData]);
 
+  // Push updates from the backend; full reloads only on resync or, if the stream fails, on the resync interval
   useEffect(() => {
-    const intervalMinutes = Math.max(1, filters.resyncMinutes);
-    const intervalMs = intervalMinutes * 60 * 1000;
-    const intervalId = setInterval(() => {
-      fetchData();
-    }, intervalMs);
-    return () => clearInterval(intervalId);
-  }, [fetchData, filters.resyncMinutes]);
+    const isLive = new Date(filters.dateTo).toDateString() === new Date().toDateString();
+    let fallbackId: ReturnType<typeof setInterval> | undefined;
+
+    const unsubscribe = api.subscribeEvents(
+      { date_from: filters.dateFrom, date_to: isLive ? undefined : filters.dateTo },
+      {
+        onDeals: (deals) => {
+          if (deals.length > 0) setRefreshKey(key => key + 1);
+          setLastSyncAt(new Date());
+        },
+        onPositions: (positions) => setOpenPositions(positions),
+        onResync: () => {
+          reloadAll();
+        },
+        onError: () => {
+          if (fallbackId === undefined) {
+            const intervalMs = Math.max(1, filters.resyncMinutes) * 60 * 1000;
+            fallbackId = setInterval(() => {
+              reloadAll();
+            }, intervalMs);
+          }
+        }
+      }
+    );
+    return () => {
+      unsubscribe();
+      if (fallbackId !== undefined) clearInterval(fallbackId);
+    };
+  }, [reloadAll, filters.dateFrom, filters.dateTo, filters.resyncMinutes]);
 
   useEffect(() => {
     setResultLevel('year');
@@ -92,155 +124,91 @@ export function Dashboard({ filters, onDataLoaded }: { filters: DashboardFilters
     setSelectedMonth(null);
   }, [filters.dateFrom, filters.dateTo]);
 
-  // Apply filters and calculate metrics
+  // KPIs and the per-EA table, computed by the backend for the selected filters
   useEffect(() => {
-    // if (!rawDeals.length) return;
-
-    const filtered = rawDeals.filter(deal => {
-      const dealDate = new Date(deal.time);
-      const dayName = DAY_MAP[getDay(dealDate)];
-      const hour = getHours(dealDate);
-      // Asset Filter
-      if (!filters.selectedAssets.includes('Todos') && !filters.selectedAssets.includes(deal.symbol)) {
-        return false;
-      }
-
-      // EA Filter
-      if (!filters.selectedEAs.includes('Todos') && !filters.selectedEAs.includes(deal.ea_id)) {
-        return false;
-      }
-
-      // Day Filter
-      if (!filters.selectedDays.includes(dayName)) {
-        return false;
-      }
-
-      // Hour Filter
-      if (!filters.selectedHours.includes(hour)) {
-        return false;
-      }
-
-      return true;
-    });
-
-    setFilteredDeals(filtered);
-
-    // Calculate metrics locally
-    const total_trades = filtered.length;
-    const net_profit = filtered.reduce((sum, d) => sum + d.net_profit, 0);
-    const wins = filtered.filter(d => d.net_profit >= 0);
-    const losses = filtered.filter(d => d.net_profit < 0);
-    const gross_profit = wins.reduce((sum, d) => sum + d.net_profit, 0);
-    const gross_loss = losses.reduce((sum, d) => sum + d.net_profit, 0); // usually negative
-    
-    const win_rate = total_trades > 0 ? (wins.length / total_trades) * 100 : 0;
-    const profit_factor = Math.abs(gross_loss) > 0 ? gross_profit / Math.abs(gross_loss) : gross_profit > 0 ? 999 : 0;
-    const avg_win = wins.length > 0 ? gross_profit / wins.length : 0;
-    const avg_loss = losses.length > 0 ? gross_loss / losses.length : 0;
-    const total_costs = filtered.reduce((sum, d) => sum + d.commission + d.swap, 0);
-    const sortedByTime = [...filtered].sort((a, b) => new Date(a.time).getTime() - new Date(b.time).getTime());
-    let maxWinStreak = 0;
-    let maxLossStreak = 0;
-    let currentWin = 0;
-    let currentLoss = 0;
-    sortedByTime.forEach(deal => {
-      if (deal.net_profit >= 0) {
-        currentWin += 1;
-        currentLoss = 0;
-        if (currentWin > maxWinStreak) maxWinStreak = currentWin;
-      } else {
-        currentLoss += 1;
-        currentWin = 0;
-        if (currentLoss > maxLossStreak) maxLossStreak = currentLoss;
-      }
-    });
-
-    setMetrics({
-      general: {
-        net_profit,
-        gross_profit,
-        gross_loss,
-        total_costs,
-        total_trades,
-        total_wins: wins.length,
-        total_losses: losses.length,
-        avg_win,
-        avg_loss,
-        win_rate,
-        profit_factor,
-        max_win_streak: maxWinStreak,
-        max_loss_streak: maxLossStreak
-      },
-      advanced: {},
-      sequences: {},
-      extremes: {}
-    });
-
-  }, [rawDeals, filters]);
-
-  // Calculate cumulative equity for chart
-  const equityData = filteredDeals.reduce<EquityPoint[]>((acc, deal) => {
-    const lastBalance = acc.length > 0 ? acc[acc.length - 1].balance : 0;
-    acc.push({
-      time: deal.time,
-      balance: lastBalance + deal.net_profit,
-      ticket: deal.ticket
-    });
-    return acc;
-  }, []);
-
-  const resultYearMap = filteredDeals.reduce((acc: Record<string, number>, deal) => {
-    const year = format(parseISO(deal.time), 'yyyy');
-    acc[year] = (acc[year] || 0) + deal.net_profit;
-    return acc;
-  }, {});
-  const resultYearData = Object.entries(resultYearMap)
-    .map(([year, profit]) => ({
-      label: year,
-      profit,
-      year: Number(year)
-    }))
-    .sort((a, b) => a.year - b.year);
-
-  const resultMonthMap = filteredDeals.reduce((acc: Record<string, number>, deal) => {
-    const date = parseISO(deal.time);
-    const year = date.getFullYear();
-    if (selectedYear !== null && year !== selectedYear) {
-      return acc;
+    if (!hasSelection(filters)) {
+      setMetrics(null);
+      setEaMetrics([]);
+      return;
     }
-    const month = date.getMonth() + 1;
-    const key = `${String(month).padStart(2, '0')}/${year}`;
-    acc[key] = (acc[key] || 0) + deal.net_profit;
-    return acc;
-  }, {});
-  const resultMonthData = Object.entries(resultMonthMap)
-    .map(([label, profit]) => ({
-      label,
-      profit,
-      month: Number(label.split('/')[0])
-    }))
-    .sort((a, b) => a.month - b.month);
-
-  const resultDayMap = filteredDeals.reduce((acc: Record<string, number>, deal) => {
-    const date = parseISO(deal.time);
-    const year = date.getFullYear();
-    const month = date.getMonth();
-    if (selectedYear === null || selectedMonth === null || year !== selectedYear || month !== selectedMonth) {
-      return acc;
+    let cancelled = false;
+    const request = toAnalysisRequest(filters);
+    Promise.all([api.getMetrics(request), api.getGroupedMetrics(request, 'ea')])
+      .then(([metricsData, eaData]) => {
+        if (cancelled) return;
+        setMetrics(metricsData);
+        setEaMetrics(eaData);
+      })
+      .catch(error => console.error("Error fetching metrics:", error));
+    return () => {
+      cancelled = true;
+    };
+  }, [filters, refreshKey]);
+
+  // Chart series: downsampled equity, results of the drill-down level and the heatmap
+  useEffect(() => {
+    if (!hasSelection(filters)) {
+      setAggregates(EMPTY_AGGREGATES);
+      return;
     }
-    const dayKey = format(date, 'dd/MM/yyyy');
-    acc[dayKey] = (acc[dayKey] || 0) + deal.net_profit;
-    return acc;
-  }, {});
-  const resultDayData = Object.entries(resultDayMap)
-    .map(([label, profit]) => ({
-      label,
-      profit,
-      timeValue: parseISO(label.split('/').reverse().join('-')).getTime()
-    }))
-    .sort((a, b) => a.timeValue - b.timeValue);
-
-  const resultDrilldownData = resultLevel === 'year' ? resultYearData : resultLevel === 'month' ? resultMonthData : resultDayData;
+    let cancelled = false;
+    api.getAggregates({
+      ...toAnalysisRequest(filters),
+      max_points: EQUITY_POINTS,
+      year: resultLevel !== 'year' && selectedYear !== null ? selectedYear : undefined,
+      month: resultLevel === 'day' && selectedMonth !== null ? selectedMonth + 1 : undefined,
+    })
+      .then(data => {
+        if (!cancelled) setAggregates(data);
+      })
+      .catch(error => console.error("Error fetching aggregates:", error));
+    return () => {
+      cancelled = true;
+    };
+  }, [filters, refreshKey, resultLevel, selectedYear, selectedMonth]);
+
+  // Trades table: first page once the tab is open, further pages on demand
+  useEffect(() => {
+    if (activeTab !== 'trades') return;
+    if (!hasSelection(filters)) {
+      setTrades([]);
+      setTradesCursor(null);
+      setTradesTotal(0);
+      return;
+    }
+    let cancelled = false;
+    api.getDealsPage({ ...toAnalysisRequest(filters), limit: TRADES_PAGE_SIZE, fields: TRADE_FIELDS })
+      .then(page => {
+        if (cancelled) return;
+        setTrades(page.items);
+        setTradesCursor(page.next_cursor);
+        setTradesTotal(page.total);
+      })
+      .catch(error => console.error("Error fetching trades:", error));
+    return () => {
+      cancelled = true;
+    };
+  }, [filters, refreshKey, activeTab]);
+
+  const loadMoreTrades = async () => {
+    if (!tradesCursor) return;
+    try {
+      const page = await api.getDealsPage({
+        ...toAnalysisRequest(filters),
+        limit: TRADES_PAGE_SIZE,
+        fields: TRADE_FIELDS,
+        cursor: tradesCursor,
+      });
+      setTrades(previous => [...previous, ...page.items]);
+      setTradesCursor(page.next_cursor);
+      setTradesTotal(page.total);
+    } catch (error) {
+      console.error("Error fetching trades:", error);
+    }
+  };
+
+  const equityData = aggregates.equity;
+  const resultDrilldownData = resultLevel === 'year' ? aggregates.by_year : resultLevel === 'month' ? aggregates.by_month : aggregates.by_day;
   const resultLevelLabel = resultLevel === 'year' ? 'Ano' : resultLevel === 'month' ? 'Mês' : 'Dia';
   const resultLevelDetail = resultLevel === 'month' && selectedYear !== null
     ? `${selectedYear}`
@@ -292,7 +260,6 @@ export function Dashboard({ filters, onDataLoaded }: { filters: DashboardFilters
     }
   };
 
-  const sortedDeals = [...filteredDeals].sort((a, b) => new Date(b.time).getTime() - new Date(a.time).getTime());
   const lastSyncLabel = lastSyncAt ? format(lastSyncAt, 'dd/MM HH:mm:ss') : 'Sem dados';
   const nextSyncLabel = lastSyncAt
     ? format(new Date(lastSyncAt.getTime() + filters.resyncMinutes * 60 * 1000), 'dd/MM HH:mm:ss')
@@ -316,12 +283,9 @@ export function Dashboard({ filters, onDataLoaded }: { filters: DashboardFilters
   ];
 
   const heatmapHours = [...filters.selectedHours].sort((a, b) => a - b);
-  const heatmapDays = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom'];
-  const heatmapMap = filteredDeals.reduce((acc: Record<string, number>, deal) => {
-    const dayName = DAY_MAP[getDay(new Date(deal.time))];
-    const hour = getHours(new Date(deal.time));
-    const key = `${dayName}-${hour}`;
-    acc[key] = (acc[key] || 0) + deal.net_profit;
+  const heatmapDays = WEEKDAY_NAMES;
+  const heatmapMap = aggregates.heatmap.reduce((acc: Record<string, number>, cell) => {
+    acc[`${WEEKDAY_NAMES[cell.weekday]}-${cell.hour}`] = cell.profit;
     return acc;
   }, {});
   const heatmapValues = heatmapDays.flatMap(day => heatmapHours.map(hour => heatmapMap[`${day}-${hour}`] || 0));
@@ -337,22 +301,6 @@ export function Dashboard({ filters, onDataLoaded }: { filters: DashboardFilters
     return '#1a1a1a';
   };
 
-  const eaStats = filteredDeals.reduce((acc: Record<string, { total: number; wins: number; losses: number; net: number; grossProfit: number; grossLoss: number }>, deal) => {
-    const key = deal.ea_id;
-    if (!acc[key]) {
-      acc[key] = { total: 0, wins: 0, losses: 0, net: 0, grossProfit: 0, grossLoss: 0 };
-    }
-    acc[key].total += 1;
-    acc[key].net += deal.net_profit;
-    if (deal.net_profit >= 0) {
-      acc[key].wins += 1;
-      acc[key].grossProfit += deal.net_profit;
-    } else {
-      acc[key].losses += 1;
-      acc[key].grossLoss += deal.net_profit;
-    }
-    return acc;
-  }, {});
   const openPositionsFiltered = openPositions.filter(position => {
     if (!filters.selectedAssets.includes('Todos') && !filters.selectedAssets.includes(position.symbol)) {
       return false;
@@ -376,15 +324,18 @@ export function Dashboard({ filters, onDataLoaded }: { filters: DashboardFilters
     }
     return b.ticket - a.ticket;
   });
-  const topEA = Object.entries(eaStats).sort((a, b) => b[1].net - a[1].net)[0];
+  const topEA = eaMetrics.reduce<GroupedMetrics | null>(
+    (best, row) => (best === null || row.metrics.general.net_profit > best.metrics.general.net_profit ? row : best),
+    null
+  );
   const topEAStats = topEA
     ? {
-        name: topEA[0],
-        total: topEA[1].total,
-        winRate: topEA[1].total > 0 ? (topEA[1].wins / topEA[1].total) * 100 : 0,
-        net: topEA[1].net,
-        avgWin: topEA[1].wins > 0 ? topEA[1].grossProfit / topEA[1].wins : 0,
-        avgLoss: topEA[1].losses > 0 ? topEA[1].grossLoss / topEA[1].losses : 0
+        name: topEA.ea_id ?? '-',
+        total: topEA.metrics.general.total_trades,
+        winRate: topEA.metrics.general.win_rate,
+        net: topEA.metrics.general.net_profit,
+        avgWin: topEA.metrics.general.avg_win,
+        avgLoss: topEA.metrics.general.avg_loss
       }
     : null;
 
@@ -395,7 +346,7 @@ export function Dashboard({ filters, onDataLoaded }: { filters: DashboardFilters
       <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', marginBottom: '30px' }}>
         <h2 style={{ fontSize: '1.8rem', fontWeight: 'bold', color: '#fff' }}>Dashboard de Performance</h2>
         <button 
-          onClick={fetchData} 
+          onClick={reloadAll} 
           className="refresh-btn"
           style={{
             background: '#00aaff',
@@ -466,13 +417,13 @@ export function Dashboard({ filters, onDataLoaded }: { filters: DashboardFilters
               />
               <KPICard 
                 title="Sequência Positiva" 
-                value={metrics.general.max_win_streak ?? 0} 
+                value={Number(metrics.sequences.max_consecutive_wins ?? 0)} 
                 color="#00ff00"
                 icon={Flame}
               />
               <KPICard 
                 title="Sequência Negativa" 
-                value={metrics.general.max_loss_streak ?? 0} 
+                value={Number(metrics.sequences.max_consecutive_losses ?? 0)} 
                 color="#ff4444"
                 icon={Repeat}
               />
@@ -887,9 +838,9 @@ export function Dashboard({ filters, onDataLoaded }: { filters: DashboardFilters
                 </tr>
               </thead>
               <tbody>
-                {sortedDeals.map((deal) => (
+                {trades.map((deal) => (
                   <tr key={deal.ticket} style={{ borderBottom: '1px solid #333', color: '#e0e0e0' }}>
-                    <td style={{ padding: '15px' }}>{format(new Date(deal.time), 'dd/MM/yyyy HH:mm')}</td>
+                    <td style={{ padding: '15px' }}>{deal.time ? format(new Date(deal.time), 'dd/MM/yyyy HH:mm') : '-'}</td>
                     <td style={{ padding: '15px' }}>{deal.ticket}</td>
                     <td style={{ padding: '15px' }}>
                       <span style={{ 
@@ -901,8 +852,8 @@ export function Dashboard({ filters, onDataLoaded }: { filters: DashboardFilters
                     </td>
                     <td style={{ padding: '15px' }}>{deal.volume}</td>
                     <td style={{ padding: '15px' }}>{deal.price}</td>
-                    <td style={{ padding: '15px', color: deal.net_profit >= 0 ? '#00ff00' : '#ff4444', fontWeight: 'bold' }}>
-                      {formatCurrency(deal.net_profit, deal.symbol)}
+                    <td style={{ padding: '15px', color: (deal.net_profit ?? 0) >= 0 ? '#00ff00' : '#ff4444', fontWeight: 'bold' }}>
+                      {formatCurrency(deal.net_profit ?? 0, deal.symbol)}
                     </td>
                     <td style={{ padding: '15px' }}>{deal.ea_id}</td>
                   </tr>
@@ -910,6 +861,27 @@ export function Dashboard({ filters, onDataLoaded }: { filters: DashboardFilters
               </tbody>
             </table>
           </div>
+          <div style={{ display: 'flex', alignItems: 'center', justifyContent: 'space-between', marginTop: '16px' }}>
+            <span style={{ color: '#888', fontSize: '0.85rem' }}>
+              {trades.length} de {tradesTotal} trades
+            </span>
+            {tradesCursor && (
+              <button
+                onClick={loadMoreTrades}
+                style={{
+                  padding: '6px 12px',
+                  borderRadius: '6px',
+                  border: '1px solid #333',
+                  background: '#1b1b1b',
+                  color: '#bbb',
+                  cursor: 'pointer',
+                  fontWeight: 600
+                }}
+              >
+                Carregar mais
+              </button>
+            )}
+          </div>
         </div>
       )}
     </div>
@@ -33,6 +33,15 @@ export interface Position {
   comment: string | null;
 }
 
+// `full`: `opened` holds the whole snapshot and replaces the local state
+export interface PositionsDiff {
+  version: number;
+  full: boolean;
+  opened: Position[];
+  modified: Position[];
+  closed: number[];
+}
+
 export interface Metrics {
   general: {
     net_profit: number;
@@ -58,10 +67,268 @@ export interface AnalysisRequest {
   date_to: string;
   assets?: string[];
   ea_ids?: string[];
+  weekdays?: number[]; // 0 = Monday ... 6 = Sunday
+  hours?: number[];
+}
+
+export interface AggregatesRequest extends AnalysisRequest {
+  max_points?: number;
+  year?: number;
+  month?: number;
+}
+
+export interface ResultBucket {
+  label: string;
+  profit: number;
+  trades: number;
+  year: number | null;
+  month: number | null;
+  date: string | null;
+}
+
+export interface Aggregates {
+  total_points: number;
+  equity: { time: string; balance: number; ticket: number }[];
+  by_year: ResultBucket[];
+  by_month: ResultBucket[];
+  by_day: ResultBucket[];
+  heatmap: { weekday: number; hour: number; profit: number; trades: number }[];
+}
+
+export interface DealsPageRequest extends AnalysisRequest {
+  limit?: number;
+  cursor?: string | null;
+  sort_by?: string;
+  descending?: boolean;
+  fields?: (keyof Deal)[];
+}
+
+export interface DealsPage {
+  items: Partial<Deal>[];
+  next_cursor: string | null;
+  total: number;
+}
+
+export type GroupBy = 'ea' | 'symbol' | 'ea_symbol';
+
+export interface GroupedMetrics {
+  account?: string | null;
+  ea_id: string | null;
+  symbol: string | null;
+  metrics: Metrics;
+}
+
+export interface CubeMetricsRequest extends AnalysisRequest {
+  directions?: (0 | 1)[]; // position direction: 0 = buy, 1 = sell
+  path_metrics?: boolean; // drawdown, streaks and runs (from the raw deals)
+}
+
+// Order-dependent fields are null when `source` is 'cube'
+export interface CubeMetrics extends Metrics {
+  source: 'cube' | 'deals';
+}
+
+export interface RollingMetricsRequest extends AnalysisRequest {
+  windows?: number[];
+  unit?: 'trades' | 'days';
+  per_ea?: boolean;
+  max_points?: number;
+}
+
+export interface RollingPoint {
+  time: string;
+  ticket: number;
+  trades: number;
+  net_profit: number;
+  win_rate: number | null;
+  profit_factor: number | null;
+  sharpe_ratio: number | null;
+  drawdown: number;
+}
+
+export interface RollingSeries {
+  ea_id: string | null;
+  window: number;
+  unit: 'trades' | 'days';
+  points: RollingPoint[];
+}
+
+export interface RiskRequest extends AnalysisRequest {
+  simulations?: number;
+  method?: 'bootstrap' | 'shuffle';
+  initial_capital?: number;
+  ruin_pct?: number;
+  seed?: number;
+}
+
+export interface Distribution {
+  mean: number;
+  std: number;
+  min: number;
+  max: number;
+  percentiles: Record<'p5' | 'p25' | 'p50' | 'p75' | 'p95', number>;
+}
+
+export interface RiskSimulation {
+  method: 'bootstrap' | 'shuffle';
+  simulations: number;
+  trades: number;
+  max_drawdown: Distribution | null;
+  final_equity: Distribution | null;
+  max_consecutive_losses: Distribution | null;
+  risk_of_ruin: number | null;
+  observed: {
+    max_drawdown?: number;
+    final_equity?: number;
+    max_consecutive_losses?: number;
+    drawdown_exceeded?: number;
+  };
+}
+
+export interface EAContribution {
+  ea_id: string;
+  net_profit: number;
+  trading_days: number;
+  daily_std: number | null;
+  max_drawdown: number;
+  drawdown_contribution: number;
+  drawdown_share: number | null;
+  marginal_drawdown: number;
+}
+
+export interface CorrelationAnalysis {
+  ea_ids: string[];
+  days: number;
+  correlation: (number | null)[][];
+  average_correlation: number | null;
+  diversification_ratio: number | null;
+  portfolio: {
+    net_profit?: number;
+    daily_std?: number | null;
+    max_drawdown?: number;
+    drawdown_start?: string | null;
+    drawdown_end?: string | null;
+  };
+  contributions: EAContribution[];
+}
+
+export interface FilterSearchRequest extends AnalysisRequest {
+  objective?: 'net_profit' | 'profit_factor';
+  min_trades?: number;
+  search_symbols?: boolean;
+}
+
+export interface FilterSummary {
+  trades: number;
+  net_profit: number;
+  profit_factor: number | null;
+  win_rate: number;
+}
+
+// Filters to keep, ready to be sent back as `weekdays` / `hours` / `assets`
+export interface FilterCandidate extends FilterSummary {
+  weekdays: number[];
+  hours: number[];
+  symbols: string[] | null;
+}
+
+export interface FilterSearchResult {
+  ea_id: string;
+  candidates: number;
+  baseline: FilterSummary;
+  best: FilterCandidate | null;
+}
+
+export interface TradesRequest extends AnalysisRequest {
+  excursions?: boolean;
+}
+
+// Round trip: every deal of a position folded into one row
+export interface Trade {
+  position_id: number;
+  symbol: string;
+  magic: number;
+  type: number;
+  open_time: string | null;
+  close_time: string;
+  close_time_msc: number;
+  volume: number;
+  open_price: number | null;
+  close_price: number;
+  profit: number;
+  commission: number;
+  swap: number;
+  fee: number;
+  net_profit: number;
+  deals: number;
+  exits: number;
+  holding_seconds: number | null;
+  mae: number | null;
+  mfe: number | null;
+  excursion_bars: number | null;
+  ea_id: string;
+}
+
+export interface PortfolioRequest extends AnalysisRequest {
+  accounts?: string[];
+}
+
+export type PortfolioGroupBy = 'account' | 'account_ea' | GroupBy;
+
+export interface PortfolioDeal extends Deal {
+  account: string;
+}
+
+export interface AccountStatus {
+  account: string;
+  connected: boolean;
+  terminal_info: Record<string, unknown> | null;
+}
+
+// Live range: `date_to` omitted keeps the subscription open past "now"
+export interface EventsRequest extends Omit<AnalysisRequest, 'date_to'> {
+  date_to?: string;
+}
+
+export interface EventHandlers {
+  onDeals?: (deals: Deal[]) => void;
+  onMetrics?: (metrics: Metrics) => void;
+  onSliceMetrics?: (slices: GroupedMetrics[]) => void;
+  onPositions?: (positions: Position[]) => void;
+  onResync?: () => void;
+  onError?: () => void;
 }
 
 const API_URL = 'http://127.0.0.1:8000/api/v1';
 
+export const COLUMNAR_MEDIA_TYPE = 'application/vnd.ea-analyzer.columnar+json';
+
+type ColumnarColumn = unknown[] | { dictionary: unknown[]; codes: number[] };
+
+export interface ColumnarPayload {
+  length: number;
+  columns: Record<string, ColumnarColumn>;
+}
+
+// Rebuilds row objects from the compact columnar format (dictionary-encoded text columns)
+export const decodeColumnar = <T>(payload: ColumnarPayload): T[] => {
+  const names = Object.keys(payload.columns);
+  const columns = names.map(name => {
+    const column = payload.columns[name];
+    if (Array.isArray(column)) return column;
+    return column.codes.map(code => (code < 0 ? null : column.dictionary[code]));
+  });
+  const rows = new Array<T>(payload.length);
+  for (let i = 0; i < payload.length; i++) {
+    const row: Record<string, unknown> = {};
+    for (let c = 0; c < names.length; c++) {
+      row[names[c]] = columns[c][i];
+    }
+    rows[i] = row as T;
+  }
+  return rows;
+};
+
 export const api = {
   getStatus: async () => {
     const response = await fetch(`${API_URL}/status`);
@@ -77,17 +344,46 @@ export const api = {
   getDeals: async (params: AnalysisRequest) => {
     const response = await fetch(`${API_URL}/deals`, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', 'Accept': COLUMNAR_MEDIA_TYPE },
       body: JSON.stringify(params),
     });
+    if (response.headers.get('Content-Type')?.includes(COLUMNAR_MEDIA_TYPE)) {
+      return decodeColumnar<Deal>(await response.json());
+    }
     return response.json() as Promise<Deal[]>;
   },
 
+  exportDeals: async (params: AnalysisRequest, format: 'ndjson' | 'csv' = 'csv') => {
+    const response = await fetch(`${API_URL}/deals/export?format=${format}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+    if (!response.ok) throw new Error('Failed to export deals');
+    return response.blob();
+  },
+
+  getDealsPage: async (params: DealsPageRequest) => {
+    const response = await fetch(`${API_URL}/deals/page`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+    if (!response.ok) throw new Error('Failed to fetch deals page');
+    return response.json() as Promise<DealsPage>;
+  },
+
   getPositions: async () => {
     const response = await fetch(`${API_URL}/positions`);
     return response.json() as Promise<Position[]>;
   },
 
+  getPositionsSnapshot: async (sinceVersion?: number) => {
+    const query = sinceVersion === undefined ? '' : `?since_version=${sinceVersion}`;
+    const response = await fetch(`${API_URL}/positions/snapshot${query}`);
+    return response.json() as Promise<PositionsDiff>;
+  },
+
   getMetrics: async (params: AnalysisRequest) => {
     const response = await fetch(`${API_URL}/metrics`, {
       method: 'POST',
@@ -95,5 +391,149 @@ export const api = {
       body: JSON.stringify(params),
     });
     return response.json() as Promise<Metrics>;
+  },
+
+  getGroupedMetrics: async (params: AnalysisRequest, groupBy: GroupBy = 'ea') => {
+    const response = await fetch(`${API_URL}/metrics/grouped`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ ...params, group_by: groupBy }),
+    });
+    return response.json() as Promise<GroupedMetrics[]>;
+  },
+
+  getCubeMetrics: async (params: CubeMetricsRequest) => {
+    const response = await fetch(`${API_URL}/metrics/cube`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+    return response.json() as Promise<CubeMetrics>;
+  },
+
+  getCubeGroupedMetrics: async (params: CubeMetricsRequest, groupBy: GroupBy = 'ea') => {
+    const response = await fetch(`${API_URL}/metrics/cube/grouped`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ ...params, group_by: groupBy }),
+    });
+    return response.json() as Promise<GroupedMetrics[]>;
+  },
+
+  getRollingMetrics: async (params: RollingMetricsRequest) => {
+    const response = await fetch(`${API_URL}/metrics/rolling`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+    return response.json() as Promise<RollingSeries[]>;
+  },
+
+  getCorrelation: async (params: AnalysisRequest) => {
+    const response = await fetch(`${API_URL}/metrics/correlation`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+    return response.json() as Promise<CorrelationAnalysis>;
+  },
+
+  optimizeFilters: async (params: FilterSearchRequest) => {
+    const response = await fetch(`${API_URL}/optimize/filters`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+    return response.json() as Promise<FilterSearchResult[]>;
+  },
+
+  getTrades: async (params: TradesRequest) => {
+    const response = await fetch(`${API_URL}/trades`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+    return response.json() as Promise<Trade[]>;
+  },
+
+  getTradeMetrics: async (params: TradesRequest) => {
+    const response = await fetch(`${API_URL}/trades/metrics`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+    return response.json() as Promise<Metrics>;
+  },
+
+  getPortfolioAccounts: async () => {
+    const response = await fetch(`${API_URL}/portfolio/accounts`);
+    return response.json() as Promise<AccountStatus[]>;
+  },
+
+  getPortfolioDeals: async (params: PortfolioRequest) => {
+    const response = await fetch(`${API_URL}/portfolio/deals`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+    return response.json() as Promise<PortfolioDeal[]>;
+  },
+
+  getPortfolioMetrics: async (params: PortfolioRequest) => {
+    const response = await fetch(`${API_URL}/portfolio/metrics`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+    return response.json() as Promise<Metrics>;
+  },
+
+  getPortfolioGroupedMetrics: async (params: PortfolioRequest, groupBy: PortfolioGroupBy = 'account') => {
+    const response = await fetch(`${API_URL}/portfolio/metrics/grouped`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ ...params, group_by: groupBy }),
+    });
+    return response.json() as Promise<GroupedMetrics[]>;
+  },
+
+  getRiskMonteCarlo: async (params: RiskRequest) => {
+    const response = await fetch(`${API_URL}/risk/montecarlo`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+    return response.json() as Promise<RiskSimulation>;
+  },
+
+  getAggregates: async (params: AggregatesRequest) => {
+    const response = await fetch(`${API_URL}/aggregates`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(params),
+    });
+    return response.json() as Promise<Aggregates>;
+  },
+
+  // Server-sent deltas (new deals, metrics, positions); returns the unsubscribe function
+  subscribeEvents: (params: EventsRequest, handlers: EventHandlers) => {
+    const query = new URLSearchParams({ date_from: params.date_from });
+    if (params.date_to) query.set('date_to', params.date_to);
+    params.assets?.forEach(asset => query.append('assets', asset));
+    params.ea_ids?.forEach(ea => query.append('ea_ids', ea));
+    params.weekdays?.forEach(day => query.append('weekdays', String(day)));
+    params.hours?.forEach(hour => query.append('hours', String(hour)));
+
+    const source = new EventSource(`${API_URL}/events?${query}`);
+    source.addEventListener('deals', event => handlers.onDeals?.(JSON.parse((event as MessageEvent).data)));
+    source.addEventListener('metrics', event => handlers.onMetrics?.(JSON.parse((event as MessageEvent).data)));
+    source.addEventListener('slice_metrics', event => handlers.onSliceMetrics?.(JSON.parse((event as MessageEvent).data)));
+    source.addEventListener('positions', event => handlers.onPositions?.(JSON.parse((event as MessageEvent).data)));
+    source.addEventListener('resync', () => handlers.onResync?.());
+    source.onerror = () => {
+      // EventSource reconnects by itself unless the server refused the stream
+      if (source.readyState === EventSource.CLOSED) handlers.onError?.();
+    };
+    return () => source.close();
   }
 };